@@ -0,0 +1,172 @@
+"""
+Move generation for many positions at once with NumPy.
+
+Positions are rows of an (N, 26) int8 array, seen from the side to
+move: columns 0 to 23 hold the points in the mover's own numbering
+(point 0 is the one next to its bearoff tray), with the mover's
+checkers counted positive and the opponent's negative. Column 24 is
+the mover's bar (positive), column 25 the opponent's bar (negative).
+Borne off checkers are not stored, they follow from the checkers in
+play.
+"""
+import numpy as np
+from meowbg.core.board import (Board, WHITE, BLACK, NUM_POINTS, BAR_SLOT,
+                               OFF_SLOT)
+
+NUM_COLUMNS = 26
+BAR = 24
+OPPONENT_BAR = 25
+HOME_SIZE = 6
+
+# Origins of a single checker move: the points and the bar
+ORIGINS = np.arange(NUM_POINTS + 1)
+
+
+def to_mover_perspective(positions, colors):
+    """
+    Turns rows of absolute positions, laid out like the first 26
+    slots of Board.position, into rows seen from the given colors
+    (one per row, or a single one for all rows).
+    """
+    positions = np.asarray(positions, dtype=np.int8)
+    colors = np.broadcast_to(np.asarray(colors), (len(positions),))
+    white = colors == WHITE
+
+    result = positions.copy()
+    result[white, :NUM_POINTS] = -positions[white, NUM_POINTS - 1::-1]
+    result[white, BAR] = -positions[white, BAR_SLOT[WHITE]]
+    result[white, OPPONENT_BAR] = -positions[white, BAR_SLOT[BLACK]]
+    return result
+
+
+def from_mover_perspective(positions, colors):
+    """
+    Inverse of to_mover_perspective. Flipping the board twice gives
+    the original rows, so this is the same transformation.
+    """
+    return to_mover_perspective(positions, colors)
+
+
+def positions_from_boards(boards, colors):
+    absolute = np.array([b.position[:OFF_SLOT[BLACK]] for b in boards],
+                        dtype=np.int8).reshape(-1, NUM_COLUMNS)
+    return to_mover_perspective(absolute, colors)
+
+
+def boards_from_positions(positions, colors):
+    absolute = from_mover_perspective(positions, colors)
+    return [Board.from_position(row.tolist()) for row in absolute]
+
+
+def single_die_children(positions, die):
+    """
+    Plays one checker with the given die in every possible way, in
+    all positions at once. Returns the resulting positions and, for
+    each of them, the index of the row it was derived from.
+    """
+    points = positions[:, :NUM_POINTS]
+    targets = ORIGINS - die
+
+    legal = positions[:, :NUM_POINTS + 1] > 0
+    # checkers on the bar have to enter first
+    legal[positions[:, BAR] > 0, :NUM_POINTS] = False
+
+    # targets on the board must not be blocked by two or more checkers
+    inside = targets >= 0
+    legal[:, inside] &= points[:, targets[inside]] >= -1
+
+    # bearing off requires all checkers home, and with a die higher
+    # than needed only the checker on the highest point may go off
+    outside = ~inside
+    all_home = ~(positions[:, HOME_SIZE:NUM_POINTS + 1] > 0).any(axis=1)
+    highest = NUM_POINTS - 1 - np.argmax(points[:, ::-1] > 0, axis=1)
+    bear_off = all_home[:, None] & ((targets == -1)[None, :]
+                                    | (ORIGINS[None, :] == highest[:, None]))
+    legal[:, outside] &= bear_off[:, outside]
+
+    parents, origins = np.nonzero(legal)
+    children = positions[parents]
+    rows = np.arange(len(parents))
+    children[rows, origins] -= 1
+
+    targets = targets[origins]
+    on_board = targets >= 0
+    rows, targets = rows[on_board], targets[on_board]
+    hit = children[rows, targets] == -1
+    children[rows[hit], targets[hit]] = 0
+    children[rows[hit], OPPONENT_BAR] -= 1
+    children[rows, targets] += 1
+
+    return children, parents
+
+
+def unique_children(children, roots):
+    """
+    Drops the children repeating another child of the same root, and
+    orders the rest by root. Each row is compared as a single string
+    of bytes, the root in big-endian order first.
+    """
+    keys = np.column_stack([roots.astype(">i4").view(np.int8).reshape(-1, 4), children])
+    keys = np.ascontiguousarray(keys).view(np.dtype((np.void, keys.shape[1])))
+    _, first = np.unique(keys.ravel(), return_index=True)
+    return children[first], roots[first]
+
+
+def batch_moves(positions, dice):
+    """
+    Determines the distinct positions reachable with the given dice
+    from each of the positions, applying the usual rules: as many
+    dice as possible must be played, and if only one die of a
+    non-double can be played, it must be the higher one if possible.
+    A position without any legal move is its own only child.
+
+    Returns the stacked child positions and the index of the parent
+    row of each child, ordered by parent.
+    """
+    positions = np.asarray(positions, dtype=np.int8).reshape(-1, NUM_COLUMNS)
+    n = len(positions)
+    d1, d2 = dice[:2]
+    orders = [[d1] * 4] if d1 == d2 else [[d1, d2], [d2, d1]]
+
+    # for every order of the dice, the children reached after each
+    # number of dice played, together with their root positions
+    stages_by_order = []
+    max_depth = np.zeros(n, dtype=np.intp)
+    for order in orders:
+        frontier, roots = positions, np.arange(n)
+        stages = [(frontier, roots)]
+        for depth, die in enumerate(order, 1):
+            frontier, parents = single_die_children(frontier, die)
+            if not len(frontier):
+                break
+            # different orders of the checkers lead to the same
+            # positions, which would multiply with every further die
+            frontier, roots = unique_children(frontier, roots[parents])
+            stages.append((frontier, roots))
+            np.maximum.at(max_depth, roots, depth)
+        stages_by_order.append(stages)
+
+    # roots which can play the higher die of a non-double
+    higher = 0 if d1 > d2 else 1
+    can_play_higher = np.zeros(n, dtype=bool)
+    if d1 != d2 and len(stages_by_order[higher]) > 1:
+        can_play_higher[stages_by_order[higher][1][1]] = True
+
+    selected_children, selected_roots = [], []
+    for order_idx, stages in enumerate(stages_by_order):
+        for depth, (children, roots) in enumerate(stages):
+            if depth == 0 and order_idx > 0:
+                continue
+            keep = max_depth[roots] == depth
+            if depth == 1 and d1 != d2 and order_idx != higher:
+                keep &= ~can_play_higher[roots]
+            selected_children.append(children[keep])
+            selected_roots.append(roots[keep])
+
+    children = np.concatenate(selected_children)
+    roots = np.concatenate(selected_roots)
+    if not len(roots):
+        return children, roots
+
+    # children of different depths or orders of the dice may coincide
+    return unique_children(children, roots)
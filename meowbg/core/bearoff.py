@@ -0,0 +1,252 @@
+"""
+One-sided bearoff database.
+
+For every distribution of up to 15 checkers on the six home points,
+the database holds the expected number of rolls needed to bear off all
+checkers and the probability of needing exactly n rolls, for n from 0
+to 31, when always playing the move with the fewest expected rolls.
+
+Positions are indexed perfectly: the checker counts c_0, ..., c_5 of
+the points (point 0 being the one next to the bearoff tray) map to
+the strictly increasing numbers z_j = c_0 + ... + c_j + j, and the
+index is the sum of the binomial coefficients C(z_j, j + 1). This
+enumerates all C(n + 6, 6) positions of at most n checkers without
+gaps, 54264 for 15 checkers.
+
+The file consists of a short header followed by one record per index,
+each the mean as float32 and the distribution as 32 uint16 values
+scaled to 65535. It is generated once by running this module, and
+memory-mapped when used, so that loading takes no time and worker
+processes share the same pages.
+"""
+import logging
+import mmap
+import os
+import struct
+import sys
+from itertools import product
+from meowbg.core.board import POINT_INDEX, SIGN
+
+logger = logging.getLogger("Bearoff")
+logger.addHandler(logging.StreamHandler())
+
+NUM_HOME_POINTS = 6
+MAX_CHECKERS = 15
+MAX_ROLLS = 32
+DISTRIBUTION_SCALE = 65535
+
+MAGIC = b"MBGBOFF1"
+HEADER = struct.Struct("<8sHH")
+RECORD = struct.Struct("<f%dH" % MAX_ROLLS)
+
+DEFAULT_PATH = os.path.join(os.environ.get("MEOWBG_ROOT", "."), "data", "bearoff.db")
+
+# All 21 distinct rolls with their probabilities out of 36
+ROLLS = [((d1, d2), 1 if d1 == d2 else 2)
+         for d1 in range(1, 7) for d2 in range(d1, 7)]
+
+
+def binomial(n, k):
+    if k < 0 or k > n:
+        return 0
+    result = 1
+    for i in range(1, k + 1):
+        result = result * (n - k + i) // i
+    return result
+
+
+# BINOMIALS[n][k] for all values needed by position_index
+BINOMIALS = [[binomial(n, k) for k in range(NUM_HOME_POINTS + 1)]
+             for n in range(MAX_CHECKERS + NUM_HOME_POINTS + 1)]
+
+
+def num_positions(max_checkers):
+    return BINOMIALS[max_checkers + NUM_HOME_POINTS][NUM_HOME_POINTS]
+
+
+def position_index(counts):
+    """
+    Returns the index of the given checker counts of the six home
+    points in the database.
+    """
+    index = z = 0
+    for j, count in enumerate(counts):
+        z += count
+        index += BINOMIALS[z + j][j + 1]
+    return index
+
+
+def home_counts(board, color):
+    """
+    Returns the checker counts of the given color on its home points,
+    the point next to the bearoff tray first.
+    """
+    position, sign = board.position, SIGN[color]
+    return tuple(position[idx] * sign
+                 for idx in POINT_INDEX[color][:NUM_HOME_POINTS])
+
+
+class BearoffDatabase(object):
+    def __init__(self, path=DEFAULT_PATH):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, num_points, self.max_checkers = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or num_points != NUM_HOME_POINTS:
+            raise ValueError("%s is not a bearoff database" % path)
+
+    def covers(self, counts):
+        return 0 <= sum(counts) <= self.max_checkers
+
+    def _record(self, counts):
+        if not self.covers(counts):
+            raise KeyError("Position %s not in the database" % (counts,))
+        return RECORD.unpack_from(
+            self.data, HEADER.size + RECORD.size * position_index(counts))
+
+    def mean_rolls(self, counts):
+        return self._record(counts)[0]
+
+    def distribution(self, counts):
+        """
+        Probabilities of bearing off all checkers in exactly n rolls,
+        indexed by n.
+        """
+        return [float(p) / DISTRIBUTION_SCALE for p in self._record(counts)[1:]]
+
+    def win_probability(self, on_roll, other):
+        """
+        Probability that the side on roll bears off first, given the
+        home counts of both sides. The side on roll wins if it needs
+        no more rolls than the other side.
+        """
+        mine, theirs = self.distribution(on_roll), self.distribution(other)
+        win = 0.0
+        theirs_at_least = 1.0
+        for n in range(MAX_ROLLS):
+            win += mine[n] * theirs_at_least
+            theirs_at_least -= theirs[n]
+        return win
+
+    def close(self):
+        self.data.close()
+
+
+# the databases by path, None for the paths without one
+_databases = {}
+
+
+def get_database(path=DEFAULT_PATH):
+    """
+    Returns the database at the given path, opened once, or None if
+    it has not been generated. Both are remembered, so the file is
+    only looked for again after reload_database.
+    """
+    if path not in _databases:
+        if os.path.exists(path):
+            _databases[path] = BearoffDatabase(path)
+        else:
+            logger.info("No bearoff database found at %s", path)
+            _databases[path] = None
+    return _databases[path]
+
+
+def reload_database(path=DEFAULT_PATH):
+    """
+    Makes get_database look for the database at the given path again
+    """
+    _databases.pop(path, None)
+
+
+def die_children(counts, die):
+    """
+    All counts resulting from playing one checker with the given die
+    """
+    highest = max(i for i, c in enumerate(counts) if c)
+    children = set()
+    for i, c in enumerate(counts):
+        if not c:
+            continue
+        target = i - die
+        if target < -1 and i != highest:
+            continue
+        child = list(counts)
+        child[i] -= 1
+        if target >= 0:
+            child[target] += 1
+        children.add(tuple(child))
+    return children
+
+
+def roll_children(counts, d1, d2):
+    """
+    All counts resulting from playing the roll d1-d2 in any order
+    """
+    if d1 == d2:
+        return dice_children(counts, [d1] * 4)
+    return dice_children(counts, [d1, d2]) | dice_children(counts, [d2, d1])
+
+
+def dice_children(counts, dice):
+    positions = set([counts])
+    for die in dice:
+        next_positions = set()
+        for p in positions:
+            if any(p):
+                next_positions |= die_children(p, die)
+            else:
+                # all checkers off, the remaining dice are not needed
+                next_positions.add(p)
+        positions = next_positions
+    return positions
+
+
+def generate(path=DEFAULT_PATH, max_checkers=MAX_CHECKERS):
+    """
+    Computes the database for up to max_checkers checkers and writes
+    it to the given path. Positions are processed by increasing pip
+    count, so all positions reachable from one are known before it.
+    """
+    positions = [counts for counts in product(range(max_checkers + 1),
+                                              repeat=NUM_HOME_POINTS)
+                 if sum(counts) <= max_checkers]
+    positions.sort(key=lambda counts: sum(c * (i + 1) for i, c in enumerate(counts)))
+
+    means = {}
+    distributions = {}
+    empty = (0,) * NUM_HOME_POINTS
+    means[empty] = 0.0
+    distributions[empty] = [1.0] + [0.0] * (MAX_ROLLS - 1)
+
+    for counts in positions[1:]:
+        mean = 1.0
+        distribution = [0.0] * MAX_ROLLS
+        for (d1, d2), weight in ROLLS:
+            best = min(roll_children(counts, d1, d2), key=means.__getitem__)
+            mean += weight * means[best] / 36.0
+            for n, p in enumerate(distributions[best][:-1]):
+                distribution[n + 1] += weight * p / 36.0
+        means[counts] = mean
+        distributions[counts] = distribution
+
+    records = [None] * num_positions(max_checkers)
+    for counts in positions:
+        records[position_index(counts)] = RECORD.pack(
+            means[counts],
+            *[int(round(p * DISTRIBUTION_SCALE)) for p in distributions[counts]])
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, NUM_HOME_POINTS, max_checkers))
+        f.write(b"".join(records))
+    reload_database(path)
+
+
+if __name__ == '__main__':
+    max_checkers = int(sys.argv[1]) if len(sys.argv) > 1 else MAX_CHECKERS
+    target = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PATH
+    generate(target, max_checkers)
+    logger.warn("Wrote bearoff database for up to %s checkers to %s",
+                max_checkers, target)
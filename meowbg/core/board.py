@@ -1,7 +1,11 @@
 import logging
+import random
+from array import array
 from meowbg.core.exceptions import MoveNotPossible
 from meowbg.core.move import PartialMove
-from collections import defaultdict
+from meowbg.core.movecache import LRUCache
+from meowbg.core.movetrie import MoveTrie
+from collections import defaultdict, OrderedDict
 from operator import lt, gt
 
 BLACK = 1
@@ -14,6 +18,21 @@ HOME_INDICES = {WHITE: range(18, 24), BLACK: range(0, 6)}
 OUTSIDE_INDICES = {WHITE: range(0, 18), BLACK: range(6, 24)}
 OPPONENT = {BLACK: WHITE, WHITE: BLACK}
 
+# Layout of the compact position array: the 24 points, followed by
+# the bar and the borne-off tray of each color. Checker counts are
+# signed, positive for black and negative for white, just like in
+# the FIBS board state.
+NUM_POINTS = 24
+BAR_SLOT = {BLACK: 24, WHITE: 25}
+OFF_SLOT = {BLACK: 26, WHITE: 27}
+NUM_SLOTS = 28
+SIGN = {BLACK: 1, WHITE: -1}
+
+# Absolute index of each point in a color's own numbering, where point
+# 0 is the one next to the color's bearoff tray. The occupancy masks
+# kept by Board use this numbering.
+POINT_INDEX = {BLACK: tuple(range(24)), WHITE: tuple(range(23, -1, -1))}
+
 
 def index_from_bar(color, distance):
     if color == BLACK:
@@ -27,6 +46,28 @@ def home_indices_behind(color, idx):
     return [i for i in HOME_INDICES[color] if cmp_func(i, idx)]
 
 
+# Keys for the Zobrist hash of a position: one random key per slot and
+# signed checker count, XORed together over all slots. Empty slots do
+# not contribute, and a key for the side to move can be mixed in.
+ZOBRIST_MAX_COUNT = 30
+_zobrist_random = random.Random(0x6d656f77)
+ZOBRIST_KEYS = [[_zobrist_random.getrandbits(63) if count else 0
+                 for count in range(-ZOBRIST_MAX_COUNT, ZOBRIST_MAX_COUNT + 1)]
+                for slot in range(NUM_SLOTS)]
+ZOBRIST_TURN_KEYS = {BLACK: _zobrist_random.getrandbits(63),
+                     WHITE: _zobrist_random.getrandbits(63)}
+
+
+# Partial moves never change after creation, so the move generator
+# hands out shared instances instead of allocating new ones.
+_PARTIAL_MOVES = [[PartialMove(origin, target) for target in range(-1, 25)]
+                  for origin in range(-1, 25)]
+
+
+def partial_move(origin, target):
+    return _PARTIAL_MOVES[origin + 1][target + 1]
+
+
 logger = logging.getLogger("Board")
 handler = logging.StreamHandler()
 handler.setLevel(logging.DEBUG)
@@ -34,20 +75,260 @@ logger.addHandler(handler)
 logger.setLevel(logging.DEBUG)
 
 
+class CheckerList(object):
+    """
+    List-like view on the checkers in one or more slots of a board's
+    position array, for code treating points, bar and bearoff tray
+    as lists of colors. The slots are given as a mapping from color
+    to slot.
+
+    A point can only hold checkers of one color, so appending a
+    checker to a point held by the opponent cancels out one of his
+    checkers. check_board_state reports such a board as invalid.
+    """
+
+    def __init__(self, board, slots):
+        self.board, self.slots = board, slots
+
+    def count(self, color):
+        if color not in SIGN:
+            return 0
+        amount = self.board.position[self.slots[color]] * SIGN[color]
+        return amount if amount > 0 else 0
+
+    def append(self, color):
+        self.board._add_checkers(self.slots[color], color, 1)
+
+    def extend(self, colors):
+        for color in colors:
+            self.append(color)
+
+    def remove(self, color):
+        if not self.count(color):
+            raise ValueError("No checker of color %s found" % color)
+        self.board._add_checkers(self.slots[color], color, -1)
+
+    def pop(self):
+        checkers = list(self)
+        if not checkers:
+            raise IndexError("pop from empty list")
+        color = checkers[-1]
+        self.remove(color)
+        return color
+
+    def __iter__(self):
+        for color in (WHITE, BLACK):
+            for _ in range(self.count(color)):
+                yield color
+
+    def __len__(self):
+        return self.count(WHITE) + self.count(BLACK)
+
+    def __contains__(self, color):
+        return self.count(color) > 0
+
+    def __getitem__(self, item):
+        return list(self)[item]
+
+    def __eq__(self, other):
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class FieldView(object):
+    """
+    Dict-like view mapping the indexes of the points to
+    CheckerList views, replacing the former defaultdict of lists.
+    """
+
+    def __init__(self, board):
+        self.board = board
+
+    def __getitem__(self, idx):
+        if not 0 <= idx < NUM_POINTS:
+            raise KeyError(idx)
+        return CheckerList(self.board, {BLACK: idx, WHITE: idx})
+
+    def __setitem__(self, idx, checkers):
+        if not 0 <= idx < NUM_POINTS:
+            raise KeyError(idx)
+        self.board._set_slot(idx, 0)
+        self[idx].extend(checkers)
+
+    def update(self, other):
+        for idx, checkers in dict(other).items():
+            self[idx] = checkers
+
+    def copy(self):
+        """
+        Returns a snapshot of the field as a defaultdict of lists.
+        """
+        snapshot = defaultdict(list)
+        for idx in range(NUM_POINTS):
+            snapshot[idx] = list(self[idx])
+        return snapshot
+
+    def keys(self):
+        return list(range(NUM_POINTS))
+
+    def values(self):
+        return [self[idx] for idx in range(NUM_POINTS)]
+
+    def items(self):
+        return [(idx, self[idx]) for idx in range(NUM_POINTS)]
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def __iter__(self):
+        return iter(range(NUM_POINTS))
+
+    def __len__(self):
+        return NUM_POINTS
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class _DistinctMoveSearch(object):
+    """
+    Search state of Board.find_distinct_moves for one roll, which
+    may be searched in both orders of the dice.
+    """
+
+    def __init__(self, board, color):
+        self.board, self.color = board, color
+
+        # A player with a single checker left may win the game using
+        # fewer dice than possible, so such moves may not be dropped
+        # for being too short (cf. Board.filter_too_short_moves).
+        self.keep_short_moves = board.count_checkers_in_play(color) <= 1
+
+        self.longest = 0
+        self.expanded = set()
+        self.found = OrderedDict()
+
+    def run(self, dice):
+        self._search(dice, 0, [])
+
+    def moves(self):
+        moves = list(self.found.values())
+        if moves and self.keep_short_moves:
+            moves = self.board.filter_too_short_moves(moves, self.color)
+        return moves
+
+    def _search(self, dice, depth, path):
+        board = self.board
+        if depth:
+            # The moves following a position only depend on the dice
+            # left, so every such pair needs to be expanded just once.
+            key = (board.zobrist, tuple(dice[depth:]))
+            if key in self.expanded:
+                return
+            self.expanded.add(key)
+
+        moved = False
+        if depth + 1 < len(dice):
+            for move in board.iter_partial_moves(dice[depth], self.color):
+                moved = True
+                board.make_partial_move(move)
+                path.append(move)
+                self._search(dice, depth + 1, path)
+                path.pop()
+                board.undo_partial_move()
+        else:
+            # For the last die, the resulting positions are looked up
+            # without actually making the moves
+            for move in board.iter_partial_moves(dice[depth], self.color):
+                moved = True
+                path.append(move)
+                self._add_move(path, board.position_key_after(move))
+                path.pop()
+
+        if depth and not moved:
+            self._add_move(path, board.zobrist)
+
+    def _add_move(self, path, key):
+        """
+        Keeps the move leading to the position with the given key,
+        unless the position was found before or a longer move is
+        already known, which makes shorter ones illegal.
+        """
+        if not self.keep_short_moves:
+            if len(path) < self.longest:
+                return
+            if len(path) > self.longest:
+                self.found.clear()
+        self.longest = max(self.longest, len(path))
+
+        if key not in self.found:
+            self.found[key] = path[:]
+
+
 class Board(object):
 
+    # Results of find_possible_moves, shared by all boards and keyed by
+    # position, dice and color. Resize it with move_cache.resize(n).
+    move_cache = LRUCache(maxsize=5000)
+
     def __init__(self, on_field=None, on_bar=None):
         self.set_board(on_field, on_bar)
 
+    @classmethod
+    def from_position(cls, position):
+        """
+        Creates a board from a sequence of signed checker counts in
+        the layout of the position array (cf. set_position).
+        """
+        board = cls()
+        board.set_position(position)
+        return board
+
+    @staticmethod
+    def position_from(on_field=None, on_bar=None):
+        """
+        The signed checker counts of the points and bars for the
+        given checkers, as taken by set_position
+        """
+        position = [0] * NUM_SLOTS
+        for idx, checkers in (on_field or {}).items():
+            for color in checkers:
+                position[idx] += SIGN[color]
+        for color in on_bar or []:
+            position[BAR_SLOT[color]] += SIGN[color]
+        return position[:OFF_SLOT[BLACK]]
+
     def set_board(self, on_field=None, on_bar=None):
-        self.checkers_on_field = on_field or defaultdict(list)
-        self.checkers_on_bar = on_bar or []
+        self.set_position(self.position_from(on_field, on_bar))
+
+    def set_position(self, position):
+        """
+        Sets up the board from signed checker counts for the points
+        and bars. If the borne-off trays are not given (i.e. only 26
+        values are passed), they are filled according to the checkers
+        in play.
+        """
+        self.position = array('b', [0] * NUM_SLOTS)
+        self.position[:len(position)] = array('b', position)
 
         # Fill homes according to checkers in play
-        num_white = self.count_checkers_in_play(WHITE)
-        num_black = self.count_checkers_in_play(BLACK)
-        self.borne_off = [WHITE] * \
-            (15 - num_white) + [BLACK] * (15 - num_black)
+        if len(position) < NUM_SLOTS:
+            for color in (WHITE, BLACK):
+                self.position[OFF_SLOT[color]] = \
+                    SIGN[color] * (15 - self.count_checkers_in_play(color))
+
+        self._init_summaries()
 
         # temporary moves already made but not yet committed
         self.move_stack = []
@@ -55,6 +336,119 @@ class Board(object):
         # This is recalculated at the beginning of every new move
         self.possible_full_moves_with_initial_dice = []
 
+    @property
+    def checkers_on_field(self):
+        return FieldView(self)
+
+    @checkers_on_field.setter
+    def checkers_on_field(self, on_field):
+        for idx in range(NUM_POINTS):
+            self._set_slot(idx, 0)
+        self.checkers_on_field.update(on_field)
+
+    @property
+    def checkers_on_bar(self):
+        return CheckerList(self, BAR_SLOT)
+
+    @checkers_on_bar.setter
+    def checkers_on_bar(self, on_bar):
+        for color in (WHITE, BLACK):
+            self._set_slot(BAR_SLOT[color], 0)
+        self.checkers_on_bar.extend(on_bar)
+
+    @property
+    def borne_off(self):
+        return CheckerList(self, OFF_SLOT)
+
+    def _init_summaries(self):
+        """
+        Computes the per-color summaries of the position from scratch.
+        Afterwards, they are kept up to date by _set_slot.
+
+        occupied: bit mask of the points holding checkers of a color,
+                  in the color's own point numbering (cf. POINT_INDEX)
+        outside_home: number of checkers outside a color's home,
+                      including the ones on the bar
+        pips: pip count of a color, counting 25 for checkers on the bar
+        zobrist: Zobrist hash of the position (cf. position_key)
+        """
+        self.occupied = {BLACK: 0, WHITE: 0}
+        self.outside_home = {BLACK: 0, WHITE: 0}
+        self.pips = {BLACK: 0, WHITE: 0}
+        self.zobrist = 0
+        position = self.position
+        for slot in range(NUM_SLOTS):
+            value = position[slot]
+            position[slot] = 0
+            self._set_slot(slot, value)
+
+    def _set_slot(self, slot, value):
+        """
+        Sets the signed checker count of a slot, updating the
+        summaries in constant time.
+        """
+        old = self.position[slot]
+        if old == value:
+            return
+        self.position[slot] = value
+
+        keys = ZOBRIST_KEYS[slot]
+        self.zobrist ^= (keys[old + ZOBRIST_MAX_COUNT]
+                         ^ keys[value + ZOBRIST_MAX_COUNT])
+
+        if slot < NUM_POINTS:
+            occupied = self.occupied
+            occupied[BLACK] &= ~(1 << slot)
+            occupied[WHITE] &= ~(1 << (23 - slot))
+            if value > 0:
+                occupied[BLACK] |= 1 << slot
+            elif value < 0:
+                occupied[WHITE] |= 1 << (23 - slot)
+
+            black_delta = (value if value > 0 else 0) - (old if old > 0 else 0)
+            if black_delta:
+                self.pips[BLACK] += black_delta * (slot + 1)
+                if slot > 5:
+                    self.outside_home[BLACK] += black_delta
+            white_delta = (old if old < 0 else 0) - (value if value < 0 else 0)
+            if white_delta:
+                self.pips[WHITE] += white_delta * (NUM_POINTS - slot)
+                if slot < 18:
+                    self.outside_home[WHITE] += white_delta
+        elif slot == BAR_SLOT[BLACK]:
+            self.outside_home[BLACK] += value - old
+            self.pips[BLACK] += (value - old) * (NUM_POINTS + 1)
+        elif slot == BAR_SLOT[WHITE]:
+            self.outside_home[WHITE] += old - value
+            self.pips[WHITE] += (old - value) * (NUM_POINTS + 1)
+
+    def highest_point(self, color):
+        """
+        Returns the point furthest away from home holding a checker
+        of the given color, in the color's own point numbering, or
+        -1 if there is none. Checkers on the bar are not considered.
+        """
+        return self.occupied[color].bit_length() - 1
+
+    def pip_count(self, color):
+        return self.pips[color]
+
+    def has_contact(self):
+        """
+        Checks whether the checkers of both colors can still hit or
+        block each other, i.e. whether some checker has not yet
+        passed all opposing checkers. Otherwise, the game is a race.
+        """
+        black = (NUM_POINTS if self.position[BAR_SLOT[BLACK]]
+                 else self.highest_point(BLACK))
+        white = (NUM_POINTS if self.position[BAR_SLOT[WHITE]]
+                 else self.highest_point(WHITE))
+        # both are in their own numbering, pointing in opposite directions
+        return black + white >= NUM_POINTS
+
+    def _add_checkers(self, slot, color, amount):
+        self._set_slot(slot, self.position[slot] + SIGN[color] * amount)
+
     def digest_move(self, move):
         """
         Method to be invoked from clients wanting to perform moves.
@@ -75,31 +469,52 @@ class Board(object):
         self.move_stack = []
         self.possible_full_moves_with_initial_dice = self.find_possible_moves(
             dice, color)
-        logger.warn("Calculated moves for %s with dice %s: %s"
-                    % (color, dice, self.possible_full_moves_with_initial_dice))
+        logger.warn("Calculated moves for %s with dice %s: %s",
+                    color, dice, self.possible_full_moves_with_initial_dice)
+
+    @property
+    def possible_full_moves_with_initial_dice(self):
+        return self._possible_full_moves
+
+    @possible_full_moves_with_initial_dice.setter
+    def possible_full_moves_with_initial_dice(self, full_moves):
+        # The legality checks during a move follow the move stack
+        # down this trie instead of scanning all full moves.
+        self._possible_full_moves = full_moves
+        self.move_trie = MoveTrie(full_moves)
+
+    def _current_trie_node(self):
+        return self.move_trie.node_for(m[0] for m in self.move_stack)
 
     def get_remaining_possible_moves(self):
-        already_made = [m[0] for m in self.move_stack]
-        possible = set([])
-        for fm in self.possible_full_moves_with_initial_dice:
-            if fm[:len(already_made)] == already_made and len(already_made) != len(fm):
-                possible.add(tuple(fm[len(already_made):]))
-        return possible
+        node = self._current_trie_node()
+        if node is None:
+            return set()
+        return set(node.continuations())
+
+    def next_partial_moves(self):
+        """
+        Returns the partial moves that may legally follow the ones
+        on the move stack.
+        """
+        node = self._current_trie_node()
+        if node is None:
+            return []
+        return list(node.children)
 
     def is_legal_partial_move(self, partial_move):
         """
         Checks whether a partial move is legal by checking whether
         the current move stack plus the given candidate move yields
         a prefix of a legal full move, i.e. one given in
-        self.currently_possible_full_moves.
+        self.possible_full_moves_with_initial_dice.
         """
-        candidate_move_stack = [m[0] for m in self.move_stack] + [partial_move]
-        for fm in self.possible_full_moves_with_initial_dice:
-            if fm[:len(candidate_move_stack)] == candidate_move_stack:
-                return True
+        node = self._current_trie_node()
+        if node is not None and partial_move in node.children:
+            return True
 
-        logger.error("Move %s would result in move_stack %s, which is not the prefix of any of %s"
-                     % (partial_move, candidate_move_stack, self.possible_full_moves_with_initial_dice))
+        logger.error("Move %s does not continue any legal move after %s",
+                     partial_move, self.move_stack)
         return False
 
     def early_commit_possible(self):
@@ -109,12 +524,12 @@ class Board(object):
         dice remaining ...)
         """
 
-        if not self.possible_full_moves_with_initial_dice:
+        if not self.move_trie:
             # Dancing ... with tears in my eyes
             return True
 
-        moves_from_stack = [m[0] for m in self.move_stack]
-        return moves_from_stack in self.possible_full_moves_with_initial_dice
+        node = self._current_trie_node()
+        return node is not None and node.terminal
 
     def flush_move_stack(self):
         """
@@ -142,16 +557,36 @@ class Board(object):
         checkers[23] = [BLACK] * 2
         self.set_board(on_field=checkers)
 
-    def find_possible_moves(self, initial_dice, color):
+    def find_possible_moves(self, initial_dice, color, distinct=False):
         """
         Central method to determine the possible 'full' moves for
         a given dice roll. To be consulted for checking moves for
         applicability.
+
+        By default, every order of partial moves is returned, which
+        the UI needs to accept moves made one by one. If <distinct>
+        is set, only one move per resulting position is returned
+        (cf. find_distinct_moves).
         """
 
         if len(initial_dice) not in (2, 4):
             raise ValueError("invalid dice %s" % initial_dice)
 
+        cache_key = (self.zobrist, tuple(sorted(initial_dice)), color, distinct)
+        moves = self.move_cache.get(cache_key)
+        if moves is None:
+            # stored as tuples, so that no caller can change the cache
+            moves = tuple(tuple(m) for m in self._find_possible_moves(initial_dice, color,
+                                                                     distinct))
+            self.move_cache.put(cache_key, moves)
+
+        # Callers get lists of their own
+        return [list(m) for m in moves]
+
+    def _find_possible_moves(self, initial_dice, color, distinct):
+        if distinct:
+            return self.find_distinct_moves(initial_dice, color)
+
         moves = []
         if initial_dice[0] != initial_dice[1]:
             # a non-pasch consists of two dice,
@@ -164,123 +599,196 @@ class Board(object):
         if moves:
             moves = self.filter_duplicates(moves)
             moves = self.filter_too_short_moves(moves, color)
-            return moves
+            return self.filter_lower_die_moves(moves, initial_dice, color)
         else:
             return []
 
+    def find_distinct_moves(self, initial_dice, color):
+        """
+        Determines one full move per distinct position that can be
+        reached with the given dice, which is all that bots need.
+
+        Instead of building all orderings and filtering them afterwards,
+        the search skips positions already expanded with the same dice
+        remaining, and drops shorter moves as soon as a longer one is
+        known. The first move found for a position is kept.
+        """
+        if len(initial_dice) not in (2, 4):
+            raise ValueError("invalid dice %s" % initial_dice)
+
+        search = _DistinctMoveSearch(self, color)
+        search.run(list(initial_dice))
+        if initial_dice[0] != initial_dice[1]:
+            search.run(list(initial_dice[::-1]))
+        return self.filter_lower_die_moves(search.moves(), initial_dice, color)
+
+    def position_key(self, color=None):
+        """
+        Returns the Zobrist hash of the position as an integer. If the
+        color to move next is given, it is encoded in the key as well.
+        The hash is maintained incrementally, so this is O(1).
+        """
+        if color:
+            return self.zobrist ^ ZOBRIST_TURN_KEYS[color]
+        return self.zobrist
+
+    def position_key_after(self, move, color=None):
+        """
+        Returns the position key (cf. position_key) of the position
+        resulting from the given partial move, without making it.
+        """
+        position = self.position
+        if move.origin in BAR_INDEX.values():
+            moving_color = WHITE if move.target < 6 else BLACK
+            origin = BAR_SLOT[moving_color]
+        else:
+            origin = move.origin
+            moving_color = BLACK if position[origin] > 0 else WHITE
+        sign = SIGN[moving_color]
+
+        if move.target == OFF_INDEX[moving_color]:
+            target = OFF_SLOT[moving_color]
+        else:
+            target = move.target
+
+        keys, offset = ZOBRIST_KEYS, ZOBRIST_MAX_COUNT
+        key = self.position_key(color)
+
+        count = position[origin] + offset
+        key ^= keys[origin][count] ^ keys[origin][count - sign]
+
+        count = position[target] + offset
+        if position[target] == -sign:
+            # the hit checker goes to the bar
+            bar = BAR_SLOT[OPPONENT[moving_color]]
+            key ^= keys[target][count] ^ keys[target][offset + sign]
+            count = position[bar] + offset
+            key ^= keys[bar][count] ^ keys[bar][count - sign]
+        else:
+            key ^= keys[target][count] ^ keys[target][count + sign]
+        return key
+
     def _find_moves_for_dice(self, dice, color):
         """
         Method to recursively determine the number of possible
         full moves for the given dice in the given order.
         """
-
-        if not dice:
-            return []
-
         all_moves = []
-        sub_moves = self._find_legal_moves_for_die(dice[0], color)
-        for sub in sub_moves:
-            self.make_partial_move(sub)
-            continuations = self._find_moves_for_dice(dice[1:], color)
-
-            if continuations:
-                for c in continuations:
-                    all_moves.append([sub] + c)
-            else:
-                all_moves.append([sub])
+        if dice:
+            self._collect_moves_for_dice(dice, 0, color, [], all_moves)
+        return all_moves
 
-            self.undo_partial_move()
+    def _collect_moves_for_dice(self, dice, depth, color, path, all_moves):
+        """
+        Depth-first part of _find_moves_for_dice. The moves made so
+        far are kept in <path>, and a copy of it is appended to
+        <all_moves> whenever the dice are used up or no further
+        move is possible.
+        """
+        moved = False
+        last_die = depth + 1 == len(dice)
+        for move in self.iter_partial_moves(dice[depth], color):
+            moved = True
+            path.append(move)
+            if last_die:
+                all_moves.append(path[:])
+            else:
+                self.make_partial_move(move)
+                self._collect_moves_for_dice(dice, depth + 1, color, path, all_moves)
+                self.undo_partial_move()
+            path.pop()
 
-        return all_moves
+        if not moved and depth:
+            all_moves.append(path[:])
 
     def _find_legal_moves_for_die(self, die, color):
-        moves = []
-        if color in self.checkers_on_bar:
-            mandatory_target_index = index_from_bar(color, die)
-            if self.field_accessible_for_color(mandatory_target_index, color):
-                moves.append(PartialMove(
-                    BAR_INDEX[color], mandatory_target_index))
-        else:
-            cof = self.checkers_on_field.copy()
-            for idx, checkers in cof.items():
-                if color in checkers:
-                    target_idx = idx + die if color == WHITE else idx - die
-                    if -1 < target_idx < 24:
-                        if self.field_accessible_for_color(target_idx, color):
-                            moves.append(PartialMove(idx, target_idx))
-                    else:
-                        # We're checking a move off the board
-                        if self.all_checkers_home(color):
-                            if target_idx == OFF_INDEX[color]:
-                                # non-wasting moves are ok
-                                moves.append(PartialMove(idx, target_idx))
-                            else:
-                                # Look for checkers further behind inside the home than
-                                # the currently examined checker. If there is one, then
-                                # a wasting move is definitely illegal.
-                                move_legal = True
-                                for hidx in home_indices_behind(color, idx):
-                                    if color in self.checkers_on_field[hidx]:
-                                        move_legal = False
-                                        break
-                                if move_legal:
-                                    moves.append(PartialMove(
-                                        idx, OFF_INDEX[color]))
-        return moves
+        return list(self.iter_partial_moves(die, color))
+
+    def iter_partial_moves(self, die, color):
+        """
+        Yields the partial moves possible for a single die, using the
+        occupancy mask of the color to visit only its own points.
+        The board must not be changed while iterating.
+        """
+        position = self.position
+        sign = SIGN[color]
+
+        if position[BAR_SLOT[color]]:
+            target_idx = index_from_bar(color, die)
+            if position[target_idx] * sign > -2:
+                yield partial_move(BAR_INDEX[color], target_idx)
+            return
+
+        point_index = POINT_INDEX[color]
+        off_idx = OFF_INDEX[color]
+        may_bear_off = not self.outside_home[color]
+        mask = self.occupied[color]
+        highest = mask.bit_length() - 1
+
+        while mask:
+            lowest_bit = mask & -mask
+            mask ^= lowest_bit
+            point = lowest_bit.bit_length() - 1
+            idx = point_index[point]
+            target = point - die
+            if target >= 0:
+                target_idx = point_index[target]
+                if position[target_idx] * sign > -2:
+                    yield partial_move(idx, target_idx)
+            elif may_bear_off and (target == -1 or point == highest):
+                # Moves off the board must not waste pips while there
+                # are checkers further behind in the home
+                yield partial_move(idx, off_idx)
 
     def field_accessible_for_color(self, idx, color):
         """
         A field at index <idx> is accessible for <color> iff
         there are less than 2 checkers of the opponent's color.
         """
-        return self.checkers_on_field[idx].count(OPPONENT[color]) < 2
+        return self.position[idx] * SIGN[color] > -2
 
     def all_checkers_home(self, color):
         """
         Returns True iff no checkers of the given color are
         found outside of this color's home.
         """
-        if color in self.checkers_on_bar:
-            return False
-
-        for idx in OUTSIDE_INDICES[color]:
-            if color in self.checkers_on_field[idx]:
-                return False
-        return True
+        return not self.outside_home[color]
 
     def all_checkers_borne_off(self, color):
-        if color in self.checkers_on_bar:
-            return False
-
-        for val in self.checkers_on_field.values():
-            if color in val:
-                return False
-        return True
+        return not (self.occupied[color] or self.position[BAR_SLOT[color]])
 
     def make_partial_move(self, move):
         """
         Move a checker from origin to target.
         """
+        position = self.position
         if move.origin in BAR_INDEX.values():
             color = WHITE if move.target < 6 else BLACK
-            self.checkers_on_bar.remove(color)
+            origin = BAR_SLOT[color]
         else:
-            color = self.checkers_on_field[move.origin].pop()
+            origin = move.origin
+            color = BLACK if position[origin] > 0 else WHITE
+
+        sign = SIGN[color]
+        if position[origin] * sign <= 0:
+            raise MoveNotPossible("No checker to move for %s" % move)
 
         hit = None
         if move.target == OFF_INDEX[color]:
-            self.borne_off.append(color)
+            target = OFF_SLOT[color]
         else:
-            enemy_count = self.checkers_on_field[move.target].count(
-                OPPONENT[color])
+            target = move.target
+            enemy_count = -position[target] * sign
             if enemy_count > 1:
                 raise Exception("Move %s is blocked" % move)
             elif enemy_count == 1:
-                # pop the hit checker off the target field and append to bar
-                hit = self.checkers_on_field[move.target].pop()
-                self.checkers_on_bar.append(hit)
+                # take the hit checker off the target field and put it on the bar
+                hit = OPPONENT[color]
+                self._set_slot(target, 0)
+                self._add_checkers(BAR_SLOT[hit], hit, 1)
 
-            self.checkers_on_field[move.target].append(color)
+        self._add_checkers(origin, color, -1)
+        self._add_checkers(target, color, 1)
 
         self.move_stack.append((move, hit))
 
@@ -294,35 +802,39 @@ class Board(object):
 
         last_move, hit_checker = self.move_stack.pop()
 
-        # pop it off the target again ...
+        # take it off the target again ...
         if last_move.target in OFF_INDEX.values():
             color = WHITE if last_move.origin > 17 else BLACK
-            self.borne_off.remove(color)
+            target = OFF_SLOT[color]
         else:
-            color = self.checkers_on_field[last_move.target].pop()
+            target = last_move.target
+            color = BLACK if self.position[target] > 0 else WHITE
+        self._add_checkers(target, color, -1)
 
         # ... reinsert at origin
         if last_move.origin == BAR_INDEX[color]:
-            self.checkers_on_bar.append(color)
+            self._add_checkers(BAR_SLOT[color], color, 1)
         else:
-            self.checkers_on_field[last_move.origin].append(color)
+            self._add_checkers(last_move.origin, color, 1)
 
         # ... and reinsert a hit checker, if any
         if hit_checker:
-            self.checkers_on_bar.remove(OPPONENT[color])
-            self.checkers_on_field[last_move.target].append(OPPONENT[color])
+            self._add_checkers(BAR_SLOT[hit_checker], hit_checker, -1)
+            self._add_checkers(target, hit_checker, 1)
 
         return last_move, hit_checker
 
     def get_winner(self):
+        position = self.position
         for col in (WHITE, BLACK):
             if self.all_checkers_borne_off(col):
-                if OPPONENT[col] not in self.borne_off:
-                    if OPPONENT[col] in self.checkers_on_bar:
+                opponent = OPPONENT[col]
+                if not position[OFF_SLOT[opponent]]:
+                    if position[BAR_SLOT[opponent]]:
                         return col, 3
                     else:
                         for idx in HOME_INDICES[col]:
-                            if OPPONENT[col] in self.checkers_on_field[idx]:
+                            if position[idx] * SIGN[opponent] > 0:
                                 return col, 3
                         return col, 2
                 else:
@@ -334,19 +846,11 @@ class Board(object):
         Checks the 'sanity' of a board and raises a ValueError
         if it's invalid (e.g. too few checkers on board etc.)
         """
-        all_checkers = []
-        for pos, val in self.checkers_on_field.iteritems():
-            if val.count(BLACK) and val.count(WHITE):
-                raise ValueError("Checkers of both colors at pos %s" % pos)
-            all_checkers.extend(val)
-        all_checkers.extend(self.checkers_on_bar)
-        all_checkers.extend(self.borne_off)
-
-        black = all_checkers.count(BLACK)
+        black = sum(v for v in self.position if v > 0)
         if black != 15:
             raise ValueError(
                 "There are %s black checkers on the board" % black)
-        white = all_checkers.count(WHITE)
+        white = -sum(v for v in self.position if v < 0)
         if white != 15:
             raise ValueError(
                 "There are %s white checkers on the board" % white)
@@ -355,12 +859,21 @@ class Board(object):
         """
         Counts checkers of given color still in the game (i.e. on bar or on field)
         """
-        on_bar = self.checkers_on_bar.count(color)
-        return on_bar + sum([val.count(color) for val in self.checkers_on_field.values()])
+        sign = SIGN[color]
+        on_field = sum(v * sign for v in self.position[:NUM_POINTS] if v * sign > 0)
+        return on_field + self.position[BAR_SLOT[color]] * sign
 
     def filter_duplicates(self, moves):
-        tuples = [tuple(m) for m in moves]
-        return [list(m) for m in set(tuples)]
+        # keep the order the moves were found in, which does not depend
+        # on the hashing of the interpreter
+        seen = set()
+        unique = []
+        for m in moves:
+            key = tuple(m)
+            if key not in seen:
+                seen.add(key)
+                unique.append(list(m))
+        return unique
 
     def filter_too_short_moves(self, moves, color):
         """
@@ -377,24 +890,33 @@ class Board(object):
             return [m for m in moves if len(m) == maxlen
                     or len(m) == 1 and m[0].target == OFF_INDEX[color]]
 
+    def filter_lower_die_moves(self, moves, dice, color):
+        """
+        If only one die of a non-double can be played, it must be the
+        higher one if that is possible. So the moves using only the
+        lower die are dropped then.
+        """
+        if dice[0] == dice[1] or not moves or max(map(len, moves)) != 1:
+            return moves
+        higher = set(self.iter_partial_moves(max(dice), color))
+        if not higher:
+            return moves
+        return [m for m in moves if m[0] in higher]
+
     def __repr__(self):
+        def checker(idx, height):
+            amount = self.position[idx]
+            if abs(amount) > height:
+                return str(BLACK if amount > 0 else WHITE)
+            return "_"
+
         upper_half = []
         for i in range(5):
-            line = []
-            for j in range(12, 24):
-                ch = self.checkers_on_field[j][0] if len(
-                    self.checkers_on_field[j]) > i else "_"
-                line.append(ch)
-            upper_half.append("".join([str(i) for i in line]))
+            upper_half.append("".join(checker(j, i) for j in range(12, 24)))
 
         lower_half = []
         for i in range(4, -1, -1):
-            line = []
-            for j in range(11, -1, -1):
-                ch = self.checkers_on_field[j][0] if len(
-                    self.checkers_on_field[j]) > i else "_"
-                line.append(ch)
-            lower_half.append("".join([str(i) for i in line]))
+            lower_half.append("".join(checker(j, i) for j in range(11, -1, -1)))
 
         return "\n".join(upper_half) + "\n\n" + "\n".join(lower_half)
 
@@ -1,64 +1,209 @@
+import logging
 import random
+from meowbg.core.board import Board
+from meowbg.core.race import best_race_move
+from meowbg.core.search import ExpectiminimaxSearch, HeuristicEvaluator
 from meowbg.core.events import ResignOfferEvent, MatchEvent, CubeEvent
 
-from meowbg.core.messaging import broadcast, register, unregister
+from meowbg.core.messaging import default_dispatcher
 from meowbg.core.player import Player
 from meowbg.gui.guievents import (MoveAttemptEvent, CommitAttemptEvent,
-                                  DoubleAttemptEvent, AcceptAttemptEvent)
+                                  DoubleAttemptEvent, AcceptAttemptEvent,
+                                  RejectAttemptEvent)
+
+try:
+    from meowbg.core.evaluation import get_network, best_move, NetworkEvaluator
+    from meowbg.core.cube import analyze_match, position_probabilities
+except ImportError:
+    # numpy is missing, so there is no network to play with
+    def get_network():
+        return None
+
+    def position_probabilities(board, color):
+        return None
+
+logger = logging.getLogger("Bot")
+logger.addHandler(logging.StreamHandler())
+
+
+def default_evaluator():
+    net = get_network()
+    return NetworkEvaluator(net) if net else HeuristicEvaluator()
+
+
+_process_search = None
+
+
+def search_move(position, color, moves, time_budget, max_depth):
+    """
+    The move a SearchBot chooses, for worker processes of a
+    DecisionExecutor, which keep their own search and table
+    """
+    global _process_search
+    if _process_search is None:
+        _process_search = ExpectiminimaxSearch(default_evaluator())
+
+    board = Board.from_position(position)
+    move = best_race_move(board, color, moves)
+    if move:
+        return move
+    return _process_search.choose_move(board, color, moves, time_budget, max_depth)
 
 
 class Bot(Player):
-    def __init__(self, name, color):
+    def __init__(self, name, color, executor=None, dispatcher=None):
+        """
+        executor: a meowbg.core.decisions.DecisionExecutor to choose
+                  the moves in the background, or None to choose them
+                  right in the event handler
+        dispatcher: the meowbg.core.messaging.Dispatcher of the match
+        """
         Player.__init__(self, name, color)
+        self.executor = executor
+        self.dispatcher = dispatcher or default_dispatcher
+        self.match = None
         self.match_id = None
-        register(self.on_resign, ResignOfferEvent)
-        register(self.react, MatchEvent)
-        register(self.on_cube, CubeEvent)
+        self.dispatcher.register(self.on_resign, ResignOfferEvent)
+        self.dispatcher.register(self.react, MatchEvent)
+        self.dispatcher.register(self.on_cube, CubeEvent)
 
     def react(self, match_event):
         match = match_event.match
 
         if not self.match_id:
             self.match_id = id(match)
+            self.match = match
         elif self.match_id != id(match):
             # There exists a match other than ours ... get out of here
             self.exit()
             return
 
+        if self.executor:
+            # whatever we were thinking about is outdated now
+            self.executor.cancel(self)
+
         if match.color_to_move_next == self.color:
             if match.doubling_possible(self.color):
-                if random.random() > 1.01:
-                    broadcast(DoubleAttemptEvent(self.color))
+                if self.wants_to_double(match):
+                    self.dispatcher.broadcast(DoubleAttemptEvent(self.color))
                     return
 
             match.roll(self.color)
 
             moves = match.board.find_possible_moves(match.remaining_dice,
-                                                    self.color)
+                                                    self.color, distinct=True)
 
             # There may be no possible moves
-            if moves:
-                mymove = random.choice(moves)
-                for m in mymove:
-                    #match.execute_move(m.origin, m.target, self.color)
-                    broadcast(MoveAttemptEvent(m.origin, m.target))
-
-            broadcast(CommitAttemptEvent(self.color))
+            if not moves:
+                self.play_move([])
+            elif self.executor:
+                func, args = self.decision_task(match.board, moves)
+                self.executor.submit(self, func, args, self.play_move,
+                                     lambda error: self.on_decision_error(match.board, moves))
+            else:
+                self.play_move(self.choose_move(match.board, moves))
         else:
             print("Not my turn!")
 
+    def decision_task(self, board, moves):
+        """
+        The function and arguments for the executor to choose a move.
+        It works on a copy of the board, which the match keeps
+        changing in the meantime.
+        """
+        return self.choose_move, (Board.from_position(board.position), moves)
+
+    def on_decision_error(self, board, moves):
+        """
+        Chooses the move right here if the executor failed to, or
+        plays the first one if that fails as well, so that the turn
+        is never left hanging
+        """
+        try:
+            move = self.choose_move(board, moves)
+        except Exception:
+            logger.exception("Bot %s failed to choose a move", self.name)
+            move = moves[0]
+        self.play_move(move)
+
+    def play_move(self, move):
+        for m in move:
+            self.dispatcher.broadcast(MoveAttemptEvent(m.origin, m.target))
+        self.dispatcher.broadcast(CommitAttemptEvent(self.color))
+
+    def wants_to_double(self, match):
+        probabilities = position_probabilities(match.board, self.color)
+        if not probabilities:
+            return False
+        return analyze_match(match, self.color, probabilities).should_double
+
+    def choose_move(self, board, moves):
+        # races are evaluated directly, no need to guess there
+        move = best_race_move(board, self.color, moves)
+        if move:
+            return move
+
+        net = get_network()
+        if net:
+            return best_move(net, board, self.color, moves)
+        return random.choice(moves)
+
     def on_cube(self, cube_event):
         if cube_event.color != self.color:
-            broadcast(AcceptAttemptEvent(self.color))
+            if self.wants_to_take(cube_event.color):
+                self.dispatcher.broadcast(AcceptAttemptEvent(self.color))
+            else:
+                self.dispatcher.broadcast(RejectAttemptEvent(self.color))
+
+    def wants_to_take(self, doubler):
+        probabilities = (self.match and
+                         position_probabilities(self.match.board, doubler))
+        if not probabilities:
+            return True
+        return analyze_match(self.match, doubler, probabilities).should_take
 
     def on_resign(self, event):
         if event.color != self.color:
-            broadcast(AcceptAttemptEvent(self.color))
+            self.dispatcher.broadcast(AcceptAttemptEvent(self.color))
 
     def exit(self):
-        unregister(self.on_resign, ResignOfferEvent)
-        unregister(self.react, MatchEvent)
-        unregister(self.on_cube, CubeEvent)
+        if self.executor:
+            self.executor.cancel(self)
+        self.dispatcher.unregister(self.on_resign, ResignOfferEvent)
+        self.dispatcher.unregister(self.react, MatchEvent)
+        self.dispatcher.unregister(self.on_cube, CubeEvent)
 
     def __repr__(self):
         return "Bot '%s'" % self.name
+
+
+class SearchBot(Bot):
+    """
+    Bot choosing its moves by expectiminimax search (cf.
+    meowbg.core.search) within a time budget per move, using the
+    network as static evaluator if there is one.
+    """
+
+    def __init__(self, name, color, time_budget=1.0, max_depth=2, executor=None,
+                 dispatcher=None):
+        Bot.__init__(self, name, color, executor, dispatcher)
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.search = ExpectiminimaxSearch(default_evaluator())
+
+    def decision_task(self, board, moves):
+        if self.executor.processes:
+            # bound methods cannot be sent to another process
+            return search_move, (list(board.position), self.color, moves,
+                                 self.time_budget, self.max_depth)
+        return Bot.decision_task(self, board, moves)
+
+    def choose_move(self, board, moves):
+        move = best_race_move(board, self.color, moves)
+        if move:
+            return move
+        return self.search.choose_move(board, self.color, moves,
+                                       self.time_budget, self.max_depth)
+
+    def __repr__(self):
+        return "SearchBot '%s'" % self.name
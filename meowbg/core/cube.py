@@ -0,0 +1,302 @@
+"""
+Cube decisions.
+
+The chances of a match are looked up in a match equity table (MET)
+indexed by the points both sides still need, the "away" scores. The
+table is computed from a fixed gammon rate: post-Crawford the trailer
+doubles at once, the Crawford game is played without cube, and the
+games before are approximated as played cubeless. It is stored as a
+float32 NumPy array of shape (2, MAX_AWAY + 1, MAX_AWAY + 1), the
+second plane holding the post-Crawford chances, and memory-mapped
+read-only, so that all processes share the same pages. It is generated
+on first use, or up front by running this module.
+
+A cube decision combines the five probabilities of an evaluator
+(cf. meowbg.core.evaluation) with the table: the match winning
+chances of the doubler are computed without doubling, for double and
+take and for double and pass, treating the cube as dead after the
+decision. In money play (a match length of 0 or less), equities are
+counted in points per current cube instead. All of it is a handful of
+lookups, without any rollout.
+"""
+import logging
+import os
+import sys
+import tempfile
+from collections import namedtuple
+import numpy as np
+from meowbg.core.board import OPPONENT
+from meowbg.core.race import (race_win_probability, effective_pip_count,
+                              get_database as get_race_database)
+from meowbg.core.bearoff import home_counts
+from meowbg.core.selfplay import Policy
+
+logger = logging.getLogger("Cube")
+logger.addHandler(logging.StreamHandler())
+
+MAX_AWAY = 25
+GAMMON_RATE = 0.25
+
+# Planes of the table
+NORMAL, POST_CRAWFORD = 0, 1
+
+# Extra chances of the taker above the take point the doubler waits
+# for, instead of doubling as soon as it gains equity with a dead cube
+MARKET_WINDOW = 0.1
+
+DEFAULT_PATH = os.path.join(os.environ.get("MEOWBG_ROOT", "."), "data", "met.npy")
+
+CubeDecision = namedtuple("CubeDecision", ["no_double", "double_take", "double_pass",
+                                           "take_point", "should_double", "should_take"])
+
+
+def generate(max_away=MAX_AWAY, gammon_rate=GAMMON_RATE):
+    """
+    Computes the match equity table: entry [plane, a, b] holds the
+    chances of the side a points away against the side b points away.
+    Row and column 0 hold the won and lost matches.
+    """
+    size = max_away + 1
+    table = np.zeros((2, size, size))
+    single, gammon = (1 - gammon_rate) / 2, gammon_rate / 2
+
+    def lookup(plane, a, b):
+        if a <= 0:
+            return 1.0
+        if b <= 0:
+            return 0.0
+        return table[plane, a, b]
+
+    # trailer b away against the leader 1 away, doubling at once
+    post_crawford = [1.0] * size
+    post_crawford[1] = 0.5
+    for b in range(2, size):
+        post_crawford[b] = (single * post_crawford[max(b - 2, 0)]
+                            + gammon * post_crawford[max(b - 4, 0)])
+
+    for a in range(1, size):
+        for b in range(1, size):
+            if a == 1 and b == 1:
+                value = 0.5
+            elif a == 1:
+                # Crawford game of the leader
+                value = 1 - (single * post_crawford[b - 1]
+                             + gammon * post_crawford[max(b - 2, 0)])
+            elif b == 1:
+                value = (single * post_crawford[a - 1]
+                         + gammon * post_crawford[max(a - 2, 0)])
+            else:
+                value = (single * lookup(NORMAL, a - 1, b) + gammon * lookup(NORMAL, a - 2, b)
+                         + single * lookup(NORMAL, a, b - 1) + gammon * lookup(NORMAL, a, b - 2))
+            table[NORMAL, a, b] = value
+
+            if a == 1 and b > 1:
+                table[POST_CRAWFORD, a, b] = 1 - post_crawford[b]
+            elif b == 1 and a > 1:
+                table[POST_CRAWFORD, a, b] = post_crawford[a]
+            else:
+                table[POST_CRAWFORD, a, b] = value
+    return table.astype(np.float32)
+
+
+class MatchEquityTable(object):
+    def __init__(self, table):
+        self.table = table
+        self.max_away = table.shape[1] - 1
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        return cls(np.load(path, mmap_mode="r"))
+
+    def save(self, path=DEFAULT_PATH):
+        """
+        Writes the table to a temporary file next to the path and
+        renames it into place, so that processes generating the table
+        at the same time never load a half-written file
+        """
+        directory = os.path.dirname(path) or "."
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # created by another process in the meantime
+                if not os.path.isdir(directory):
+                    raise
+
+        handle, temp_path = tempfile.mkstemp(suffix=".npy", dir=directory)
+        try:
+            with os.fdopen(handle, "wb") as f:
+                np.save(f, self.table)
+            # mkstemp makes the file readable by its owner only
+            os.chmod(temp_path, 0o644)
+            getattr(os, "replace", os.rename)(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    def equity(self, away, opponent_away, post_crawford=False):
+        """
+        Chances to win the match being away points away from winning,
+        against an opponent being opponent_away points away. Scores
+        beyond the table count as its largest one.
+        """
+        if away <= 0:
+            return 1.0
+        if opponent_away <= 0:
+            return 0.0
+        plane = POST_CRAWFORD if post_crawford else NORMAL
+        return float(self.table[plane, min(away, self.max_away),
+                                min(opponent_away, self.max_away)])
+
+
+_table = None
+
+
+def get_table(path=DEFAULT_PATH):
+    """
+    Returns the match equity table stored at the given path, loaded
+    once. It is generated and stored first if there is none.
+    """
+    global _table
+    if _table is None:
+        if not os.path.exists(path):
+            logger.info("Generating match equity table at %s", path)
+            MatchEquityTable(generate()).save(path)
+        _table = MatchEquityTable.load(path)
+    return _table
+
+
+def outcome_probabilities(probabilities):
+    """
+    Splits win, win gammon, win backgammon, lose gammon and lose
+    backgammon probabilities into the probabilities of winning and
+    losing exactly 1, 2 and 3 points.
+    """
+    win, win_gammon, win_backgammon, lose_gammon, lose_backgammon = probabilities
+    return ([win - win_gammon, win_gammon - win_backgammon, win_backgammon],
+            [1 - win - lose_gammon, lose_gammon - lose_backgammon, lose_backgammon])
+
+
+def analyze(probabilities, away, opponent_away, cube=1, crawford=False,
+            post_crawford=False, table=None):
+    """
+    Cube decision for the side on roll with the given probabilities
+    (cf. meowbg.core.evaluation.NUM_OUTPUTS), away and opponent_away
+    points from winning the match, or both 0 or less for money play.
+
+    The equities are the match winning chances of the side on roll,
+    or in money play its points per current cube. The take point is
+    the lowest winning chance of the taker, without gammons, that
+    justifies a take.
+    """
+    wins, losses = outcome_probabilities(probabilities)
+
+    if away <= 0 and opponent_away <= 0:
+        def equity(new_cube):
+            factor = float(new_cube) / cube
+            return factor * sum((points + 1) * (w - l)
+                                for points, (w, l) in enumerate(zip(wins, losses)))
+        no_double, double_take, double_pass = equity(cube), equity(2 * cube), 1.0
+        take_point = 0.25
+    else:
+        table = table or get_table()
+
+        def equity(new_cube):
+            return sum(w * table.equity(away - (points + 1) * new_cube, opponent_away,
+                                        post_crawford)
+                       + l * table.equity(away, opponent_away - (points + 1) * new_cube,
+                                          post_crawford)
+                       for points, (w, l) in enumerate(zip(wins, losses)))
+        no_double, double_take = equity(cube), equity(2 * cube)
+        double_pass = table.equity(away - cube, opponent_away, post_crawford)
+
+        # all seen from the taker
+        taker_pass = 1 - double_pass
+        taker_win = 1 - table.equity(away, opponent_away - 2 * cube, post_crawford)
+        taker_lose = 1 - table.equity(away - 2 * cube, opponent_away, post_crawford)
+        take_point = ((taker_pass - taker_lose) / (taker_win - taker_lose)
+                      if taker_win > taker_lose else 0.0)
+
+    should_take = double_take <= double_pass
+    taker_chances = 1 - probabilities[0]
+    should_double = (not crawford
+                     and min(double_take, double_pass) > no_double
+                     and (not should_take or taker_chances <= take_point + MARKET_WINDOW))
+    return CubeDecision(no_double, double_take, double_pass, take_point,
+                        should_double, should_take)
+
+
+def analyze_match(match, color, probabilities, table=None):
+    """
+    Cube decision for the given color of a meowbg.core.match.Match,
+    about to roll with the given probabilities. Both sides are taken
+    as away from a money game if the match has no length.
+    """
+    if match.length <= 0:
+        away = opponent_away = 0
+    else:
+        away = match.length - match.score[color]
+        opponent_away = match.length - match.score[OPPONENT[color]]
+    return analyze(probabilities, away, opponent_away, match.cube,
+                   crawford=match.is_crawford(),
+                   post_crawford=match.is_post_crawford(), table=table)
+
+
+def position_probabilities(board, color):
+    """
+    Probabilities of the given color about to roll, from the network
+    if there is one and the race evaluation otherwise, or None if
+    neither applies.
+    """
+    try:
+        from meowbg.core.evaluation import get_network, encode_board
+    except ImportError:
+        net = None
+    else:
+        net = get_network()
+    if net:
+        return tuple(float(p) for p in
+                     net.evaluate(encode_board(board, color, on_roll=True))[0])
+
+    if board.has_contact():
+        return None
+
+    opponent = OPPONENT[color]
+    database = get_race_database()
+    mine, theirs = home_counts(board, color), home_counts(board, opponent)
+    if (database and board.all_checkers_home(color) and board.all_checkers_home(opponent)
+            and database.covers(mine) and database.covers(theirs)):
+        win = database.win_probability(mine, theirs)
+    else:
+        win = race_win_probability(effective_pip_count(board, color),
+                                   effective_pip_count(board, opponent))
+    return win, 0.0, 0.0, 0.0, 0.0
+
+
+class CubePolicy(Policy):
+    """
+    Leaves the moves to another policy and takes cube decisions from
+    the probabilities of the position.
+    """
+
+    def __init__(self, move_policy):
+        self.move_policy = move_policy
+
+    def choose_move(self, board, dice, color, moves):
+        return self.move_policy.choose_move(board, dice, color, moves)
+
+    def offer_double(self, board, color, match):
+        probabilities = position_probabilities(board, color)
+        return bool(probabilities) and analyze_match(match, color, probabilities).should_double
+
+    def accept_double(self, board, color, match):
+        doubler = OPPONENT[color]
+        probabilities = position_probabilities(board, doubler)
+        return not probabilities or analyze_match(match, doubler, probabilities).should_take
+
+
+if __name__ == '__main__':
+    max_away = int(sys.argv[1]) if len(sys.argv) > 1 else MAX_AWAY
+    target = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PATH
+    MatchEquityTable(generate(max_away)).save(target)
+    logger.warn("Wrote match equity table up to %s-away to %s", max_away, target)
@@ -0,0 +1,198 @@
+"""
+Asynchronous decisions of bots.
+
+Events are broadcast on the Kivy main loop in offline play and on the
+telnet reading thread in online play, so a bot thinking inside its
+event handler blocks the board animation or the network reader. The
+DecisionExecutor runs the thinking on worker threads, or on worker
+processes for functions that can be pickled, and hands the result
+back to the main loop through the GlobalTaskQueue.
+
+Every request belongs to an owner, usually the bot, which must allow
+weak references. A new request of the same owner, or a call to
+cancel, makes the older ones stale: stale requests waiting for a
+worker are skipped, and results of stale requests that were already
+running are dropped instead of delivered.
+A failed decision is handed to the error callback of its request, so
+that the owner can still resolve its turn.
+"""
+import logging
+import sys
+import threading
+import traceback
+import weakref
+from multiprocessing import Pool
+
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+logger = logging.getLogger("Decisions")
+logger.addHandler(logging.StreamHandler())
+
+
+def attempt(func, args):
+    """
+    Calls func(*args) on a worker process. Returns whether it
+    succeeded and the result or the traceback, as exceptions cannot
+    always be pickled and Python 2 pools have no error callbacks.
+    """
+    try:
+        return True, func(*args)
+    except Exception:
+        return False, traceback.format_exc()
+
+
+def deliver_on_main_thread(func, *args):
+    # imported here, so that decisions can be made without Kivy
+    from meowbg.core.eventqueue import GlobalTaskQueue
+    GlobalTaskQueue.post(func, *args)
+
+
+class DecisionRequest(object):
+    def __init__(self, executor, owner, generation):
+        self.executor = executor
+        self.owner = owner
+        self.generation = generation
+
+    def is_current(self):
+        return self.executor.current_generation(self.owner) == self.generation
+
+    def __repr__(self):
+        return "DecisionRequest(%s, %s)" % (self.owner, self.generation)
+
+
+class DecisionExecutor(object):
+    def __init__(self, workers=1, processes=False, deliver=deliver_on_main_thread):
+        """
+        workers: number of worker threads or processes
+        processes: use a process pool instead of threads, which
+                   requires picklable functions and arguments
+        deliver: called with a callback and its arguments to run it
+                 on the thread the results belong to
+        """
+        self.processes = processes
+        self.deliver = deliver
+        # held weakly, so that the executor does not keep bots alive
+        self.generations = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+
+        if processes:
+            self.pool = Pool(workers)
+        else:
+            self.pool = None
+            self.tasks = Queue()
+            self.threads = [threading.Thread(target=self._work, name="Decisions-%s" % i)
+                            for i in range(workers)]
+            for t in self.threads:
+                t.daemon = True
+                t.start()
+
+    def current_generation(self, owner):
+        with self.lock:
+            return self.generations.get(owner, 0)
+
+    def _next_request(self, owner):
+        with self.lock:
+            generation = self.generations.get(owner, 0) + 1
+            self.generations[owner] = generation
+        return DecisionRequest(self, owner, generation)
+
+    def submit(self, owner, func, args, on_result, on_error=None):
+        """
+        Computes func(*args) in the background and delivers the result
+        to on_result, unless a newer request of the owner was
+        submitted or the owner cancelled in the meantime. Returns the
+        request.
+        on_error: gets the exception, or the traceback from a worker
+                  process, in place of on_result if func fails
+        """
+        request = self._next_request(owner)
+        if self.pool:
+            kwargs = {}
+            if sys.version_info >= (3,):
+                # e.g. arguments that cannot be pickled
+                kwargs["error_callback"] = lambda error: self._fail(request, on_error, error)
+            self.pool.apply_async(
+                attempt, (func, args),
+                callback=lambda outcome: self._complete(request, on_result, on_error, outcome),
+                **kwargs)
+        else:
+            self.tasks.put((request, func, args, on_result, on_error))
+        return request
+
+    def cancel(self, owner):
+        """
+        Makes all pending requests of the owner stale
+        """
+        self._next_request(owner)
+
+    def _work(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                break
+            self._run(*task)
+            # nor does an idle worker keep the owner of its last task
+            del task
+
+    def _run(self, request, func, args, on_result, on_error):
+        if not request.is_current():
+            logger.debug("Skipping stale %s", request)
+            return
+        try:
+            result = func(*args)
+        except Exception as error:
+            logger.exception("Decision %s failed", request)
+            if on_error:
+                self._finish(request, on_error, error)
+            return
+        self._finish(request, on_result, result)
+
+    def _complete(self, request, on_result, on_error, outcome):
+        succeeded, value = outcome
+        if succeeded:
+            self._finish(request, on_result, value)
+        else:
+            self._fail(request, on_error, value)
+
+    def _fail(self, request, on_error, error):
+        logger.error("Decision %s failed: %s", request, error)
+        if on_error:
+            self._finish(request, on_error, error)
+
+    def _finish(self, request, on_result, result):
+        if request.is_current():
+            self.deliver(self._deliver, request, on_result, result)
+        else:
+            logger.debug("Dropping result of stale %s", request)
+
+    def _deliver(self, request, on_result, result):
+        # the owner may have cancelled while the result was on its way
+        if request.is_current():
+            on_result(result)
+
+    def shutdown(self):
+        if self.pool:
+            self.pool.terminate()
+            self.pool.join()
+        else:
+            for _ in self.threads:
+                self.tasks.put(None)
+            for t in self.threads:
+                t.join()
+
+
+_executor = None
+
+
+def get_executor():
+    """
+    Returns the executor shared by the bots of the GUI, with a single
+    worker thread, created on first use.
+    """
+    global _executor
+    if _executor is None:
+        _executor = DecisionExecutor()
+    return _executor
@@ -2,8 +2,13 @@
 import random
 
 class Dice(object):
+    def __init__(self, rng=None):
+        # Any object with a randint method, e.g. a random.Random
+        # instance to get a reproducible stream of rolls
+        self.rng = rng or random
+
     def roll(self):
-        d1, d2 = random.randint(1, 6), random.randint(1, 6)
+        d1, d2 = self.rng.randint(1, 6), self.rng.randint(1, 6)
         if d1 == d2:
             return [d1] * 4
         else:
@@ -11,7 +16,7 @@ class Dice(object):
 
     def rollout(self):
         while True:
-            d1, d2 = random.randint(1, 6), random.randint(1, 6)
+            d1, d2 = self.rng.randint(1, 6), self.rng.randint(1, 6)
             if d1 != d2:
                 return d1, d2
 
@@ -0,0 +1,328 @@
+"""
+Neural network evaluation of positions.
+
+Positions are encoded into the 198 inputs of TD-Gammon, seen from the
+side whose chances are evaluated: four units per point and side for
+the checker count, one per side for the bar and the borne off
+checkers, and two for the side on roll. A perceptron with one hidden
+layer turns them into five probabilities for the evaluated side: win,
+win a gammon, win a backgammon, lose a gammon, lose a backgammon.
+
+All candidate moves of a roll are encoded into one matrix and
+evaluated with a single matrix multiplication per layer. Weights are
+stored in .npz files and can be trained by self-play with TD(lambda).
+"""
+import logging
+import os
+import random
+import numpy as np
+from meowbg.core.batchmoves import to_mover_perspective, NUM_COLUMNS, BAR, OPPONENT_BAR
+from meowbg.core.board import WHITE, BLACK, NUM_POINTS, OFF_SLOT
+from meowbg.core.dice import Dice
+from meowbg.core.selfplay import Policy, SelfPlayEngine
+
+logger = logging.getLogger("Evaluation")
+logger.addHandler(logging.StreamHandler())
+
+NUM_INPUTS = 198
+NUM_OUTPUTS = 5
+WIN, WIN_GAMMON, WIN_BACKGAMMON, LOSE_GAMMON, LOSE_BACKGAMMON = range(NUM_OUTPUTS)
+
+DEFAULT_PATH = os.path.join(os.environ.get("MEOWBG_ROOT", "."), "data", "weights.npz")
+
+
+def encode(positions, on_roll=False):
+    """
+    Encodes rows of positions seen from the evaluated side (cf.
+    meowbg.core.batchmoves) into an (N, 198) input matrix. on_roll
+    tells whether the evaluated side is to roll next, which is not
+    the case right after it moved.
+    """
+    positions = np.asarray(positions, dtype=np.int8).reshape(-1, NUM_COLUMNS)
+    n = len(positions)
+    inputs = np.zeros((n, NUM_INPUTS), dtype=np.float32)
+
+    points = positions[:, :NUM_POINTS].astype(np.float32)
+    bars = (positions[:, BAR].astype(np.float32),
+            -positions[:, OPPONENT_BAR].astype(np.float32))
+    for side, counts in enumerate((np.maximum(points, 0), np.maximum(-points, 0))):
+        units = np.stack([counts >= 1, counts >= 2, counts >= 3,
+                          np.maximum(counts - 3, 0) / 2], axis=2)
+        inputs[:, side * 4 * NUM_POINTS:(side + 1) * 4 * NUM_POINTS] = \
+            units.reshape(n, 4 * NUM_POINTS)
+        offset = 8 * NUM_POINTS + side
+        inputs[:, offset] = bars[side] / 2
+        inputs[:, offset + 2] = (15 - counts.sum(axis=1) - bars[side]) / 15
+
+    inputs[:, NUM_INPUTS - 2 + (0 if on_roll else 1)] = 1
+    return inputs
+
+
+def encode_board(board, color, on_roll=False):
+    return encode(to_mover_perspective([board.position[:OFF_SLOT[BLACK]]], color),
+                  on_roll)
+
+
+def sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+def equity(outputs):
+    """
+    Cubeless equity of the evaluated side for rows of outputs
+    """
+    return (2 * outputs[..., WIN] - 1
+            + outputs[..., WIN_GAMMON] - outputs[..., LOSE_GAMMON]
+            + outputs[..., WIN_BACKGAMMON] - outputs[..., LOSE_BACKGAMMON])
+
+
+def outcome(won, points):
+    """
+    The outputs a perfect evaluator gives for a finished game
+    """
+    result = np.zeros(NUM_OUTPUTS)
+    if won:
+        result[WIN] = 1
+        result[WIN_GAMMON] = points >= 2
+        result[WIN_BACKGAMMON] = points >= 3
+    else:
+        result[LOSE_GAMMON] = points >= 2
+        result[LOSE_BACKGAMMON] = points >= 3
+    return result
+
+
+class NeuralNet(object):
+    def __init__(self, hidden_weights, hidden_bias, output_weights, output_bias):
+        self.hidden_weights = hidden_weights
+        self.hidden_bias = hidden_bias
+        self.output_weights = output_weights
+        self.output_bias = output_bias
+
+    @classmethod
+    def random(cls, hidden=40, seed=None):
+        rng = np.random.RandomState(seed)
+        return cls(rng.uniform(-0.1, 0.1, (NUM_INPUTS, hidden)),
+                   np.zeros(hidden),
+                   rng.uniform(-0.1, 0.1, (hidden, NUM_OUTPUTS)),
+                   np.zeros(NUM_OUTPUTS))
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        weights = np.load(path)
+        return cls(weights["hidden_weights"], weights["hidden_bias"],
+                   weights["output_weights"], weights["output_bias"])
+
+    def save(self, path=DEFAULT_PATH):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        np.savez(path, hidden_weights=self.hidden_weights,
+                 hidden_bias=self.hidden_bias,
+                 output_weights=self.output_weights,
+                 output_bias=self.output_bias)
+        reload_network(path)
+
+    def hidden(self, inputs):
+        return sigmoid(inputs.dot(self.hidden_weights) + self.hidden_bias)
+
+    def evaluate(self, inputs):
+        """
+        Returns an (N, 5) matrix of outputs for an (N, 198) matrix
+        of inputs.
+        """
+        return sigmoid(self.hidden(inputs).dot(self.output_weights) + self.output_bias)
+
+    def gradients(self, inputs):
+        """
+        Outputs for a single input vector and the gradients of each
+        output with respect to all weights, each with a leading axis
+        for the output.
+        """
+        hidden = self.hidden(inputs)
+        outputs = sigmoid(hidden.dot(self.output_weights) + self.output_bias)
+        output_delta = outputs * (1 - outputs)
+
+        # d output_k / d hidden_j, through the hidden activation
+        hidden_delta = (output_delta[:, None] * self.output_weights.T
+                        * (hidden * (1 - hidden))[None, :])
+        return outputs, (hidden_delta[:, None, :] * inputs[None, :, None],
+                         hidden_delta,
+                         output_delta[:, None, None] * np.eye(NUM_OUTPUTS)[:, None, :]
+                         * hidden[None, :, None],
+                         output_delta[:, None] * np.eye(NUM_OUTPUTS))
+
+    def parameters(self):
+        return [self.hidden_weights, self.hidden_bias,
+                self.output_weights, self.output_bias]
+
+
+def evaluate_moves(net, board, color, moves):
+    """
+    Evaluates the positions resulting from the given full moves for
+    the moving color, all at once. Returns an (N, 5) matrix.
+    """
+    positions = []
+    for full_move in moves:
+        for m in full_move:
+            board.make_partial_move(m)
+        positions.append(board.position[:OFF_SLOT[BLACK]])
+        for _ in full_move:
+            board.undo_partial_move()
+    return net.evaluate(encode(to_mover_perspective(positions, color)))
+
+
+def best_move(net, board, color, moves):
+    return moves[int(np.argmax(equity(evaluate_moves(net, board, color, moves))))]
+
+
+class NetworkEvaluator(object):
+    """
+    Static evaluator for meowbg.core.search, scoring all moves with
+    one batched evaluation.
+    """
+
+    def __init__(self, net):
+        self.net = net
+
+    def evaluate_moves(self, board, color, moves):
+        return equity(evaluate_moves(self.net, board, color, moves)).tolist()
+
+
+# the networks by path, None for the paths without weights
+_networks = {}
+
+
+def get_network(path=DEFAULT_PATH):
+    """
+    Returns the network stored at the given path, loaded once, or
+    None if there is none. Both are remembered, so the file is only
+    looked for again after reload_network.
+    """
+    if path not in _networks:
+        if os.path.exists(path):
+            _networks[path] = NeuralNet.load(path)
+        else:
+            logger.info("No network weights found at %s", path)
+            _networks[path] = None
+    return _networks[path]
+
+
+def reload_network(path=DEFAULT_PATH):
+    """
+    Makes get_network look for the weights at the given path again
+    """
+    _networks.pop(path, None)
+
+
+class NeuralNetPolicy(Policy):
+    def __init__(self, net):
+        self.net = net
+
+    def choose_move(self, board, dice, color, moves):
+        return best_move(self.net, board, color, moves)
+
+
+class _TDLearner(object):
+    """
+    TD(lambda) updates along the sequence of positions each color
+    leaves after its moves, with one eligibility trace per output.
+    """
+
+    def __init__(self, net, alpha, lam):
+        self.net, self.alpha, self.lam = net, alpha, lam
+        self.previous = {WHITE: None, BLACK: None}
+        self.traces = {WHITE: None, BLACK: None}
+
+    def _update(self, color, target):
+        delta = target - self.previous[color]
+        for param, trace in zip(self.net.parameters(), self.traces[color]):
+            param += self.alpha * np.tensordot(delta, trace, axes=1)
+
+    def visit(self, color, inputs):
+        outputs, gradients = self.net.gradients(inputs)
+        if self.previous[color] is not None:
+            self._update(color, outputs)
+            outputs, gradients = self.net.gradients(inputs)
+
+        traces = self.traces[color]
+        if traces is None:
+            self.traces[color] = list(gradients)
+        else:
+            self.traces[color] = [self.lam * t + g for t, g in zip(traces, gradients)]
+        self.previous[color] = outputs
+
+    def finish(self, winner, points):
+        for color in (WHITE, BLACK):
+            if self.previous[color] is not None:
+                self._update(color, outcome(color == winner, points))
+
+
+class AbandonedGame(Exception):
+    pass
+
+
+class TDPolicy(NeuralNetPolicy):
+    """
+    Plays the moves the network rates best for both sides of a
+    SelfPlayEngine, and lets the network learn from the positions
+    they leave. Call new_game before and finish after each game.
+    """
+
+    def __init__(self, net, alpha=0.1, lam=0.7, max_moves=1000):
+        NeuralNetPolicy.__init__(self, net)
+        self.alpha, self.lam, self.max_moves = alpha, lam, max_moves
+        self.new_game()
+
+    def new_game(self):
+        self.learner = _TDLearner(self.net, self.alpha, self.lam)
+        self.moves_played = 0
+
+    def choose_move(self, board, dice, color, moves):
+        self.moves_played += 1
+        if self.moves_played > self.max_moves:
+            raise AbandonedGame()
+
+        move = best_move(self.net, board, color, moves)
+        for m in move:
+            board.make_partial_move(m)
+        # the last position is judged by the outcome instead
+        if not board.get_winner()[0]:
+            self.learner.visit(color, encode_board(board, color)[0])
+        for _ in move:
+            board.undo_partial_move()
+        return move
+
+    def finish(self, winner, points):
+        self.learner.finish(winner, points)
+
+
+def train(net, games, alpha=0.1, lam=0.7, seed=None, max_moves=1000):
+    """
+    Trains the network by letting it play the given number of games
+    against itself, always picking the move it rates best.
+
+    An untrained network may keep hitting back and forth forever, so
+    games are abandoned after max_moves moves, without a final update.
+    """
+    policy = TDPolicy(net, alpha, lam, max_moves)
+    engine = SelfPlayEngine({WHITE: policy, BLACK: policy}, Dice(random.Random(seed)))
+    for game in range(games):
+        policy.new_game()
+        try:
+            winner, points = engine.play_game()
+        except AbandonedGame:
+            logger.debug("Abandoned game %s after %s moves", game + 1, max_moves)
+        else:
+            policy.finish(winner, points)
+
+        if (game + 1) % 100 == 0:
+            logger.info("Trained %s games", game + 1)
+    return net
+
+
+if __name__ == '__main__':
+    import sys
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    net = NeuralNet.load() if os.path.exists(DEFAULT_PATH) else NeuralNet.random()
+    train(net, games)
+    net.save()
@@ -1,39 +1,132 @@
-
 import logging
+import time
 from collections import deque
-from kivy.clock import Clock
 
 logger = logging.getLogger("EventQueue")
 logger.addHandler(logging.StreamHandler())
 
-class SynchronizedTaskQueue(object):
+
+def schedule_next_frame(callback):
+    from kivy.clock import Clock
+    Clock.schedule_once(lambda dt: callback(), 0)
+
+
+class QueueMetrics(object):
+    """
+    Counts the tasks run and how long they waited in the queue
+    """
+
     def __init__(self):
+        self.executed = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, depth, wait):
+        self.executed += 1
+        self.max_depth = max(self.max_depth, depth)
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    @property
+    def mean_wait(self):
+        return self.total_wait / self.executed if self.executed else 0.0
+
+    def __repr__(self):
+        return ("%i tasks, %i coalesced, max depth %i, wait %.3fs mean %.3fs max"
+                % (self.executed, self.coalesced, self.max_depth,
+                   self.mean_wait, self.max_wait))
+
+
+class SynchronizedTaskQueue(object):
+    """
+    Runs the queued functions one after the other on the main loop.
+    Each function is called with its event and a callback, which it
+    calls once it is finished, possibly after an animation. The next
+    function follows right away, so only a task queued while the
+    queue is idle waits for the next frame.
+    """
+
+    def __init__(self, schedule=schedule_next_frame, clock=time.time):
+        """
+        schedule: calls the given function on the next frame
+        """
         self.queue = deque([])
         self.running_func = None
         self.next_event = None
+        self.schedule = schedule
+        self.clock = clock
+        self.scheduled = False
+        self.draining = False
+        self.metrics = QueueMetrics()
+
+    @property
+    def depth(self):
+        return len(self.queue)
 
-    def synced_call(self, func):
+    def synced_call(self, func, coalesce=False):
+        """
+        Returns an event handler queueing func for the event.
+        coalesce: if the last task queued is from this kind of handler
+                  for func as well, only its event is replaced, e.g.
+                  to apply only the newest of several match states
+        """
         def func_call(e):
-            self.queue.append((func, e))
-            self.try_next()
+            self.put(func, e, coalesce)
 
         return func_call
 
+    def put(self, func, e, coalesce=False):
+        if coalesce and self.queue and self.queue[-1][0] == func and self.queue[-1][3]:
+            self.queue[-1][1] = e
+            self.metrics.coalesced += 1
+            return
+
+        self.queue.append([func, e, self.clock(), coalesce])
+        if not self.running_func and not self.scheduled:
+            self.scheduled = True
+            self.schedule(self.run_scheduled)
+
+    def run_scheduled(self):
+        self.scheduled = False
+        self.try_next()
+
     def release_and_proceed(self):
         self.running_func = None
-        self.try_next()
+        if not self.draining:
+            self.try_next()
 
     def try_next(self):
         if self.running_func:
-            logger.warn("Queue is currently blocked by %s" % self.running_func)
+            logger.debug("Queue is currently blocked by %s", self.running_func)
             return
 
-        if self.queue:
-            self.running_func, self.next_event = self.queue.popleft()
-            Clock.schedule_once(lambda e: self.do_next(), 0.1)
+        # functions finishing right away release the queue while still
+        # in here, so their successors run in this loop
+        self.draining = True
+        try:
+            while self.queue and not self.running_func:
+                self.running_func, self.next_event, queued_at, _ = self.queue.popleft()
+                self.metrics.record(len(self.queue) + 1, self.clock() - queued_at)
+                self.do_next()
+        finally:
+            self.draining = False
+
+    def post(self, func, *args):
+        """
+        Queues func(*args) like an event of a synced call. Unlike those,
+        it may be called from any thread: it only gets queued on the
+        main loop.
+        """
+        def run(e, on_finish):
+            func(*args)
+            on_finish()
+
+        self.schedule(lambda: self.put(run, None))
 
     def do_next(self):
-        logger.warn("Now executing %s" % self.running_func)
+        logger.debug("Now executing %s", self.running_func)
         self.running_func(self.next_event, self.release_and_proceed)
 
-GlobalTaskQueue = SynchronizedTaskQueue()
\ No newline at end of file
+GlobalTaskQueue = SynchronizedTaskQueue()
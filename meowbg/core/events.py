@@ -128,6 +128,16 @@ class PlayerStatusEvent(object):
         self.status_dicts = status_dicts
 
 
+class PlayerLoginEvent(object):
+    def __init__(self, name):
+        self.name = name
+
+
+class PlayerLogoutEvent(object):
+    def __init__(self, name):
+        self.name = name
+
+
 class GlobalShutdownEvent(object):
     """
     Indicates that the app is about to be shut down.
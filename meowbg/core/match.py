@@ -5,7 +5,7 @@ from meowbg.core.events import (MatchEndEvent, GameEndEvent, RolloutEvent,
                                 MatchEvent, DiceEvent, CommitEvent,
                                 RollRequest, CubeEvent, RejectEvent,
                                 AcceptEvent)
-from meowbg.core.messaging import broadcast
+from meowbg.core.messaging import default_dispatcher
 from meowbg.core.move import PartialMove
 
 logger = logging.getLogger("Match")
@@ -14,10 +14,14 @@ logger.addHandler(logging.StreamHandler())
 
 class Match(object):
 
-    def __init__(self):
+    def __init__(self, dispatcher=None):
+        # the meowbg.core.messaging.Dispatcher to broadcast events with
+        self.dispatcher = dispatcher or default_dispatcher
         self.length = 1
         self.finished = False
         self.score = {WHITE: 0, BLACK: 0}
+        # set once the Crawford game is over
+        self.crawford_played = False
         self.color_to_move_next = None
         self.initial_dice = []
         self.remaining_dice = []
@@ -94,7 +98,11 @@ class Match(object):
         return self.score[WHITE], self.score[BLACK]
 
     def is_crawford(self):
-        return self.score[WHITE] != self.score[BLACK] and self.length - 1 in self.score.values()
+        return (not self.crawford_played and self.score[WHITE] != self.score[BLACK]
+                and self.length - 1 in self.score.values())
+
+    def is_post_crawford(self):
+        return self.crawford_played and self.length - 1 in self.score.values()
 
     def double(self, color):
         if not color:
@@ -102,7 +110,7 @@ class Match(object):
 
         if self.doubling_possible(color):
             self.open_cube_challenge_from_color = color
-            broadcast(CubeEvent(color, self.cube * 2))
+            self.dispatcher.broadcast(CubeEvent(color, self.cube * 2))
         else:
             logger.info("Doubling not allowed")
 
@@ -111,7 +119,7 @@ class Match(object):
         self.may_double[by_color] = True
         self.may_double[OPPONENT[by_color]] = False
         self.cube *= 2
-        broadcast(MatchEvent(self))
+        self.dispatcher.broadcast(MatchEvent(self))
 
     def accept_possible(self, color):
         return color != self.color_to_move_next and (self.open_cube_challenge_from_color
@@ -146,7 +154,7 @@ class Match(object):
         else:
             raise ValueError("Noone's turn ... cannot switch")
 
-        broadcast(MatchEvent(self))
+        self.dispatcher.broadcast(MatchEvent(self))
 
     def register_player(self, player, color):
         """
@@ -161,7 +169,7 @@ class Match(object):
         self.players[color] = player
 
     def get_players_color(self, pname):
-        for col, p in self.players.iteritems():
+        for col, p in self.players.items():
             if p.name == pname:
                 return col
 
@@ -176,25 +184,25 @@ class Match(object):
 
 class OnlineMatch(Match):
     def roll(self, color):
-        broadcast(RollRequest())
+        self.dispatcher.broadcast(RollRequest())
 
     def commit(self, color=None):
         pending_moves = [m[0] for m in self.board.flush_move_stack()]
-        broadcast(CommitEvent(pending_moves))
+        self.dispatcher.broadcast(CommitEvent(pending_moves))
 
     def end_game(self, winner, points):
-        broadcast(MatchEvent(self))
+        self.dispatcher.broadcast(MatchEvent(self))
 
     def accept_open_offer(self, color):
-        broadcast(AcceptEvent(color))
+        self.dispatcher.broadcast(AcceptEvent(color))
 
     def reject_open_offer(self, color):
-        broadcast(RejectEvent(color))
+        self.dispatcher.broadcast(RejectEvent(color))
 
 
 class OfflineMatch(Match):
-    def __init__(self):
-        Match.__init__(self)
+    def __init__(self, dispatcher=None):
+        Match.__init__(self, dispatcher)
         self.dice = Dice()
 
     def roll(self, color):
@@ -208,7 +216,7 @@ class OfflineMatch(Match):
             self.remaining_dice = self.initial_dice[:]
             self.board.store_initial_possibilities(
                 self.initial_dice, self.color_to_move_next)
-            broadcast(DiceEvent(self.remaining_dice))
+            self.dispatcher.broadcast(DiceEvent(self.remaining_dice))
         else:
             logger.warn("Cannot roll, I have unused dice %s" %
                         self.initial_dice)
@@ -237,7 +245,7 @@ class OfflineMatch(Match):
         d1, d2 = self.dice.rollout()
         self.color_to_move_next = WHITE if d1 > d2 else BLACK
 
-        broadcast(RolloutEvent(d1, d2))
+        self.dispatcher.broadcast(RolloutEvent(d1, d2))
 
         self.remaining_dice = [d1, d2]
         self.initial_dice = [d1, d2]
@@ -246,18 +254,20 @@ class OfflineMatch(Match):
         self.board.store_initial_possibilities(
             self.initial_dice, self.color_to_move_next)
 
-        broadcast(MatchEvent(self))
+        self.dispatcher.broadcast(MatchEvent(self))
 
     def end_game(self, winner, points):
+        if self.is_crawford():
+            self.crawford_played = True
         points_gained = points * self.cube
         self.score[winner] += points_gained
         winner_name = self.players[winner].name
 
         if self.score[winner] >= self.length:
             self.finished = True
-            broadcast(MatchEndEvent(winner_name, self.score))
+            self.dispatcher.broadcast(MatchEndEvent(winner_name, self.score))
         else:
-            broadcast(GameEndEvent(winner_name, points_gained))
+            self.dispatcher.broadcast(GameEndEvent(winner_name, points_gained))
             self.new_game()
 
     def accept_open_offer(self, color):
@@ -280,6 +290,6 @@ class OfflineMatch(Match):
             self.open_cube_challenge_from_color = None
         elif self.resignation_points_offered:
             self.resignation_points_offered = ()
-            broadcast(MatchEvent(self))
+            self.dispatcher.broadcast(MatchEvent(self))
         else:
             logger.warn("No open offers")
@@ -1,29 +1,129 @@
+"""
+Event dispatching.
+
+Subscribers register a callback for an event class and receive all
+events of that class and of its subclasses, e.g. all Attempt events
+by registering for Attempt. The subscribers of each event class are
+resolved through its MRO once and cached until the next change.
+
+Bound methods are only referenced weakly, so a player or bot that is
+dropped does not linger as a subscriber; its registrations vanish
+with it. Plain functions and closures, which nobody else may hold on
+to, are referenced strongly.
+
+Each match or session can have its own Dispatcher. The module level
+functions use a default one shared by the whole process.
+"""
 import os
+import inspect
 import logging
+import weakref
+from collections import OrderedDict
 
 logger = logging.getLogger("Messaging")
 log_base = os.path.join(os.environ.get("MEOWBG_ROOT", "."), "logs")
 eventlog = os.path.join(log_base, "events.log")
 logger.addHandler(logging.FileHandler(eventlog))
 
-# mapping from object instances to event classes
-SUBSCRIPTIONS = {}
+
+class _StrongReference(object):
+    __slots__ = ["callback"]
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def __call__(self):
+        return self.callback
+
+
+class _WeakMethod(object):
+    """
+    Weak reference to a bound method, which is recreated from the
+    referenced instance on every call
+    """
+    __slots__ = ["instance", "function"]
+
+    def __init__(self, method, on_delete):
+        self.instance = weakref.ref(method.__self__, on_delete)
+        self.function = method.__func__
+
+    def __call__(self):
+        instance = self.instance()
+        if instance is None:
+            return None
+        return self.function.__get__(instance, type(instance))
+
+
+def _key(callback):
+    if inspect.ismethod(callback) and callback.__self__ is not None:
+        return id(callback.__self__), callback.__func__
+    return callback
+
+
+class Dispatcher(object):
+    def __init__(self):
+        # event class => OrderedDict of subscriber keys => references
+        self.subscriptions = {}
+        # event class => tuple of references, resolved through the MRO
+        self.dispatch_cache = {}
+
+    def register(self, callback, event_class):
+        key = _key(callback)
+        if key is callback:
+            reference = _StrongReference(callback)
+        else:
+            reference = _WeakMethod(
+                callback, lambda ref: self._drop(key, event_class))
+        self.subscriptions.setdefault(event_class, OrderedDict())[key] = reference
+        self.dispatch_cache.clear()
+
+    def unregister(self, callback, event_class):
+        self._drop(_key(callback), event_class)
+
+    def _drop(self, key, event_class):
+        subscribers = self.subscriptions.get(event_class)
+        if subscribers and subscribers.pop(key, None) is not None:
+            if not subscribers:
+                del self.subscriptions[event_class]
+            self.dispatch_cache.clear()
+
+    def subscribers(self, event_class):
+        try:
+            return self.dispatch_cache[event_class]
+        except KeyError:
+            pass
+
+        references = []
+        for cls in inspect.getmro(event_class):
+            references.extend(self.subscriptions.get(cls, {}).values())
+        references = tuple(references)
+        self.dispatch_cache[event_class] = references
+        return references
+
+    def broadcast(self, event):
+        tracing = logger.isEnabledFor(logging.DEBUG)
+        if tracing:
+            logger.debug("***** EVENT: %s", event)
+
+        for reference in self.subscribers(event.__class__):
+            callback = reference()
+            if callback is None:
+                continue
+            if tracing:
+                logger.debug("Sending %s to %s", event, callback)
+            callback(event)
+
+
+default_dispatcher = Dispatcher()
 
 
 def register(callback, event_class):
-    SUBSCRIPTIONS.setdefault(event_class, []).append(callback)
-    #logger.warn("New registration. Now having {} subscriptions: {}".format(len(SUBSCRIPTIONS),
-    #                                                                       "\n\t".join("{}=>{}".format(e, rec) for e, rec in SUBSCRIPTIONS.iteritems())))
+    default_dispatcher.register(callback, event_class)
 
 
 def unregister(callback, event_class):
-    if callback in SUBSCRIPTIONS[event_class]:
-        SUBSCRIPTIONS[event_class].remove(callback)
+    default_dispatcher.unregister(callback, event_class)
 
 
 def broadcast(event):
-    logger.warn("***** EVENT: %s" % event)
-    subscribers = SUBSCRIPTIONS.get(event.__class__, [])
-    for s in subscribers:
-        logger.warn("Sending %s to %s" % (event, s))
-        s(event)
+    default_dispatcher.broadcast(event)
@@ -0,0 +1,67 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    A mapping of bounded size, dropping the least recently used
+    entries first. Counts hits and misses of lookups, cf. stats().
+    A maximum size of 0 disables caching. Safe to share between
+    threads.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            # reinsert to mark it as most recently used
+            self.entries[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = value
+            self._shrink()
+
+    def resize(self, maxsize):
+        with self.lock:
+            self.maxsize = maxsize
+            self._shrink()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": float(self.hits) / lookups if lookups else 0.0,
+                "size": len(self.entries),
+                "maxsize": self.maxsize}
+
+    def _shrink(self):
+        while len(self.entries) > max(self.maxsize, 0):
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __repr__(self):
+        return "LRUCache(%(size)s/%(maxsize)s entries, %(hits)s hits, %(misses)s misses)" % self.stats()
@@ -0,0 +1,67 @@
+class MoveTrieNode(object):
+    """
+    A node of a MoveTrie. Its children are keyed by the partial move
+    leading to them, and it is terminal if the partial moves on the
+    path from the root form a complete legal move.
+    """
+    __slots__ = ("children", "terminal")
+
+    def __init__(self):
+        self.children = {}
+        self.terminal = False
+
+    def continuations(self):
+        """
+        Yields the remaining partial moves of every legal move passing
+        through this node, as tuples, without the empty continuation
+        of the node itself.
+        """
+        for move, child in self.children.items():
+            if child.terminal:
+                yield (move,)
+            for rest in child.continuations():
+                yield (move,) + rest
+
+
+class MoveTrie(object):
+    """
+    Prefix tree over a list of full moves, each a sequence of partial
+    moves. Checking a prefix of partial moves costs one lookup per
+    partial move, no matter how many full moves are stored.
+    """
+
+    def __init__(self, full_moves=()):
+        self.root = MoveTrieNode()
+        for full_move in full_moves:
+            self.add(full_move)
+
+    def add(self, full_move):
+        node = self.root
+        for move in full_move:
+            child = node.children.get(move)
+            if child is None:
+                child = node.children[move] = MoveTrieNode()
+            node = child
+        node.terminal = True
+
+    def node_for(self, moves):
+        """
+        Returns the node reached by following the given partial moves
+        from the root, or None if they are not the prefix of any
+        stored full move.
+        """
+        node = self.root
+        for move in moves:
+            node = node.children.get(move)
+            if node is None:
+                return None
+        return node
+
+    def __contains__(self, full_move):
+        node = self.node_for(full_move)
+        return node is not None and node.terminal
+
+    def __nonzero__(self):
+        return bool(self.root.children)
+
+    __bool__ = __nonzero__
@@ -1,9 +1,8 @@
 
 import logging
 from meowbg.core.events import (MoveEvent, CommitEvent, RollRequest,
-                                RejectEvent, AcceptEvent, ResignOfferEvent,
-                                DiceEvent)
-from meowbg.core.messaging import register, unregister
+                                RejectEvent, AcceptEvent, ResignOfferEvent)
+from meowbg.core.messaging import default_dispatcher
 from meowbg.gui.guievents import DoubleAttemptEvent
 from meowbg.network.connectionpool import get_connection
 
@@ -29,21 +28,19 @@ class HumanPlayer(Player):
 
 
 class OnlinePlayerProxy(object):
-    def __init__(self, name, color, event_translator):
+    def __init__(self, name, color, event_translator, dispatcher=None, connection=None):
         self.name, self.color = name, color
         self.event_translator = event_translator
+        self.dispatcher = dispatcher or default_dispatcher
 
-        register(self.on_commit, CommitEvent)
-        register(self.on_default, RollRequest)
-        register(self.on_default, AcceptEvent)
-        register(self.on_default, RejectEvent)
-        register(self.on_default, ResignOfferEvent)
-        register(self.on_default, DoubleAttemptEvent)
+        self.dispatcher.register(self.on_commit, CommitEvent)
+        self.dispatcher.register(self.on_default, RollRequest)
+        self.dispatcher.register(self.on_default, AcceptEvent)
+        self.dispatcher.register(self.on_default, RejectEvent)
+        self.dispatcher.register(self.on_default, ResignOfferEvent)
+        self.dispatcher.register(self.on_default, DoubleAttemptEvent)
 
-        # Do not interpret dice events, just refresh the board state
-        register(self.refresh_board, DiceEvent)
-
-        self.connection = get_connection()
+        self.connection = connection or get_connection()
 
     def on_commit(self, ce):
         fibs_full_move = self.event_translator.encode(MoveEvent(ce.moves))
@@ -57,31 +54,53 @@ class OnlinePlayerProxy(object):
         cmd = self.event_translator.encode(r)
         self.connection.send(cmd)
 
-    def refresh_board(self, de):
-        self.connection.send(self.event_translator.encode_refresh())
-
     def exit(self):
-        unregister(self.on_commit, CommitEvent)
-        unregister(self.on_default, RollRequest)
-        unregister(self.on_default, AcceptEvent)
-        unregister(self.on_default, RejectEvent)
-        unregister(self.on_default, ResignOfferEvent)
-        unregister(self.on_default, DoubleAttemptEvent)
+        self.dispatcher.unregister(self.on_commit, CommitEvent)
+        self.dispatcher.unregister(self.on_default, RollRequest)
+        self.dispatcher.unregister(self.on_default, AcceptEvent)
+        self.dispatcher.unregister(self.on_default, RejectEvent)
+        self.dispatcher.unregister(self.on_default, ResignOfferEvent)
+        self.dispatcher.unregister(self.on_default, DoubleAttemptEvent)
         self.connection = None
 
     def __repr__(self):
         return "Proxy for '%s'" % self.name
 
-"""
-This dictionary maps player names to existing Player instances, to avoid the repeated
-instatiation of instances (which has the nasty side-effect of registering subscribers
-for events repeatedly).
-"""
+class PlayerRegistry(object):
+    """
+    Maps player names to existing OnlinePlayerProxy instances of one
+    server session, to avoid the repeated instantiation of proxies
+    (which has the nasty side-effect of registering subscribers for
+    events repeatedly).
+    """
+
+    def __init__(self, connection=None, dispatcher=None):
+        """
+        connection: what the proxies send their commands to, by
+                    default the shared connection at the time a proxy
+                    is created
+        """
+        self.connection = connection
+        self.dispatcher = dispatcher
+        self.players = {}
+
+    def get_or_create(self, name, color, translator):
+        if name not in self.players:
+            self.players[name] = OnlinePlayerProxy(name, color, translator,
+                                                   self.dispatcher, self.connection)
+        return self.players[name]
+
+    def clear(self):
+        for player in self.players.values():
+            player.exit()
+        self.players.clear()
+
+
+default_registry = PlayerRegistry()
+
+# kept for code looking up the proxies of the default registry
+KNOWN_PLAYERS = default_registry.players
 
-KNOWN_PLAYERS = {}
 
-def get_or_create_player_proxy(name, color, translator):
-    if name not in KNOWN_PLAYERS:
-        player = OnlinePlayerProxy(name, color, translator)
-        KNOWN_PLAYERS[name] = player
-    return KNOWN_PLAYERS[name]
+def get_or_create_player_proxy(name, color, translator, registry=None):
+    return (registry or default_registry).get_or_create(name, color, translator)
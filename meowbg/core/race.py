@@ -0,0 +1,237 @@
+"""
+Evaluation of races, i.e. positions without contact (cf.
+Board.has_contact).
+
+Small races with all checkers home are looked up in a two-sided
+database holding the exact probability that the side on roll bears
+off first, for up to a few checkers per side. Its file is generated
+once by running this module and memory-mapped on first use.
+
+Larger races are estimated from effective pip counts (EPC): the
+average number of pips a side needs to bear off, including the pips
+wasted on the way. Where the one-sided bearoff database applies, the
+EPC is exact, otherwise it is approximated from the pip count.
+"""
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+from itertools import product
+from meowbg.core.bearoff import (NUM_HOME_POINTS, ROLLS, position_index,
+                                 num_positions, home_counts, roll_children)
+from meowbg.core import bearoff
+from meowbg.core.board import OPPONENT
+
+logger = logging.getLogger("Race")
+logger.addHandler(logging.StreamHandler())
+
+MAX_CHECKERS = 6
+PROBABILITY_SCALE = 65535
+
+MAGIC = b"MBGRACE1"
+HEADER = struct.Struct("<8sHH")
+ENTRY = struct.Struct("<H")
+
+DEFAULT_PATH = os.path.join(os.environ.get("MEOWBG_ROOT", "."), "data", "race.db")
+
+# Mean and variance of the pips moved by a single roll
+_roll_pips = [(4 * d1 if d1 == d2 else d1 + d2, weight) for (d1, d2), weight in ROLLS]
+PIPS_PER_ROLL = sum(p * w for p, w in _roll_pips) / 36.0
+PIPS_PER_ROLL_VARIANCE = sum(p * p * w for p, w in _roll_pips) / 36.0 - PIPS_PER_ROLL ** 2
+
+# Average wastage of a side in a race, according to Walter Trice
+AVERAGE_WASTAGE = 7
+
+
+def home_pips(counts):
+    return sum(c * (i + 1) for i, c in enumerate(counts))
+
+
+class RaceDatabase(object):
+    def __init__(self, path=DEFAULT_PATH):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, num_points, self.max_checkers = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or num_points != NUM_HOME_POINTS:
+            raise ValueError("%s is not a race database" % path)
+        self.size = num_positions(self.max_checkers)
+
+    def covers(self, counts):
+        return 0 <= sum(counts) <= self.max_checkers
+
+    def win_probability(self, on_roll, other):
+        """
+        Probability that the side on roll bears off first, given the
+        home counts of both sides.
+        """
+        if not (self.covers(on_roll) and self.covers(other)):
+            raise KeyError("Positions %s, %s not in the database" % (on_roll, other))
+        index = position_index(on_roll) * self.size + position_index(other)
+        value, = ENTRY.unpack_from(self.data, HEADER.size + ENTRY.size * index)
+        return float(value) / PROBABILITY_SCALE
+
+    def close(self):
+        self.data.close()
+
+
+# the databases by path, None for the paths without one
+_databases = {}
+
+
+def get_database(path=DEFAULT_PATH):
+    """
+    Returns the database at the given path, opened once, or None if
+    it has not been generated. Both are remembered, so the file is
+    only looked for again after reload_database.
+    """
+    if path not in _databases:
+        if os.path.exists(path):
+            _databases[path] = RaceDatabase(path)
+        else:
+            logger.info("No race database found at %s", path)
+            _databases[path] = None
+    return _databases[path]
+
+
+def reload_database(path=DEFAULT_PATH):
+    """
+    Makes get_database look for the database at the given path again
+    """
+    _databases.pop(path, None)
+
+
+def effective_pip_count(board, color):
+    """
+    Exact EPC from the one-sided bearoff database if all checkers
+    are home and covered by it, i.e. the expected number of rolls
+    times the average pips per roll. Otherwise the pip count plus
+    the average wastage.
+    """
+    if board.all_checkers_home(color):
+        counts = home_counts(board, color)
+        database = bearoff.get_database()
+        if database and database.covers(counts):
+            return database.mean_rolls(counts) * PIPS_PER_ROLL
+    return board.pip_count(color) + AVERAGE_WASTAGE
+
+
+def race_win_probability(on_roll_epc, other_epc):
+    """
+    Normal approximation of the probability that the side on roll
+    wins a race. The number of rolls a side needs for a given EPC has
+    mean EPC / m and variance EPC * v / m^3 for the mean m and
+    variance v of the pips per roll. The side on roll wins if it
+    needs no more rolls than the other side.
+    """
+    mean = (other_epc - on_roll_epc) / PIPS_PER_ROLL
+    variance = ((on_roll_epc + other_epc) * PIPS_PER_ROLL_VARIANCE
+                / PIPS_PER_ROLL ** 3)
+    if variance <= 0:
+        return 1.0 if mean >= 0 else 0.0
+    z = (mean + 0.5) / math.sqrt(variance)
+    return 0.5 * (1 + math.erf(z / math.sqrt(2)))
+
+
+def race_win_probability_after(board, color):
+    """
+    Probability that the given color, having just moved, wins the
+    race against the opponent on roll.
+    """
+    opponent = OPPONENT[color]
+    if board.all_checkers_borne_off(color):
+        return 1.0
+
+    database = get_database()
+    if database and board.all_checkers_home(color) and board.all_checkers_home(opponent):
+        mine, theirs = home_counts(board, color), home_counts(board, opponent)
+        if database.covers(mine) and database.covers(theirs):
+            return 1 - database.win_probability(theirs, mine)
+
+    one_sided = bearoff.get_database()
+    if one_sided and board.all_checkers_home(color) and board.all_checkers_home(opponent):
+        mine, theirs = home_counts(board, color), home_counts(board, opponent)
+        if one_sided.covers(mine) and one_sided.covers(theirs):
+            return 1 - one_sided.win_probability(theirs, mine)
+
+    return 1 - race_win_probability(effective_pip_count(board, opponent),
+                                    effective_pip_count(board, color))
+
+
+def best_race_move(board, color, moves):
+    """
+    Returns the move with the best chances of winning the race, or
+    None if the position is not a race.
+    """
+    if not moves or board.has_contact():
+        return None
+
+    def winning_chances(full_move):
+        for m in full_move:
+            board.make_partial_move(m)
+        chances = race_win_probability_after(board, color)
+        for _ in full_move:
+            board.undo_partial_move()
+        return chances
+
+    return max(moves, key=winning_chances)
+
+
+def generate(path=DEFAULT_PATH, max_checkers=MAX_CHECKERS):
+    """
+    Computes the two-sided database for up to max_checkers checkers
+    per side and writes it to the given path. The pairs of positions
+    are processed by increasing total pip count, so that the chances
+    after every roll are known before they are needed.
+    """
+    positions = [counts for counts in product(range(max_checkers + 1),
+                                              repeat=NUM_HOME_POINTS)
+                 if sum(counts) <= max_checkers]
+    size = num_positions(max_checkers)
+    index = dict((counts, position_index(counts)) for counts in positions)
+    pips = [0] * size
+    for counts in positions:
+        pips[index[counts]] = home_pips(counts)
+
+    # for every position and roll, the indexes of the resulting positions
+    children = [None] * size
+    for counts in positions:
+        children[index[counts]] = [
+            (weight, [index[c] for c in roll_children(counts, d1, d2)])
+            for (d1, d2), weight in ROLLS] if any(counts) else []
+
+    # wins[i][j]: chances of the side on roll with position i against j
+    empty = index[(0,) * NUM_HOME_POINTS]
+    wins = [[0.0] * size for _ in range(size)]
+    pairs = sorted(product(range(size), repeat=2),
+                   key=lambda pair: pips[pair[0]] + pips[pair[1]])
+    for i, j in pairs:
+        if i == empty:
+            # the side on roll has already borne off
+            wins[i][j] = 1.0
+        elif j != empty:
+            chances = 0.0
+            for weight, roll_children_indexes in children[i]:
+                chances += weight * (1 - min(wins[j][c] for c in roll_children_indexes))
+            wins[i][j] = chances / 36.0
+
+    values = [int(round(wins[i][j] * PROBABILITY_SCALE))
+              for i in range(size) for j in range(size)]
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, NUM_HOME_POINTS, max_checkers))
+        f.write(struct.pack("<%dH" % len(values), *values))
+    reload_database(path)
+
+
+if __name__ == '__main__':
+    max_checkers = int(sys.argv[1]) if len(sys.argv) > 1 else MAX_CHECKERS
+    target = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PATH
+    generate(target, max_checkers)
+    logger.warn("Wrote race database for up to %s checkers per side to %s",
+                max_checkers, target)
@@ -0,0 +1,135 @@
+import math
+import random
+from multiprocessing import Pool
+from meowbg.core.board import WHITE, BLACK, OPPONENT
+from meowbg.core.dice import Dice
+from meowbg.core.selfplay import SelfPlayEngine, RandomPolicy
+
+
+class RolloutResult(object):
+    """
+    Outcome counts of a number of cubeless games, seen from the color
+    rolling first. Results of separate runs can be merged.
+    """
+
+    def __init__(self, color):
+        self.color = color
+        self.games = 0
+        # counts per color, gammons include backgammons
+        self.wins = {WHITE: 0, BLACK: 0}
+        self.gammons = {WHITE: 0, BLACK: 0}
+        self.backgammons = {WHITE: 0, BLACK: 0}
+        # sums of the points won by self.color and of their squares
+        self.points = 0
+        self.squared_points = 0
+
+    def add_game(self, winner, points):
+        self.games += 1
+        self.wins[winner] += 1
+        if points > 1:
+            self.gammons[winner] += 1
+        if points > 2:
+            self.backgammons[winner] += 1
+
+        value = points if winner == self.color else -points
+        self.points += value
+        self.squared_points += value * value
+
+    def merge(self, other):
+        self.games += other.games
+        for color in (WHITE, BLACK):
+            self.wins[color] += other.wins[color]
+            self.gammons[color] += other.gammons[color]
+            self.backgammons[color] += other.backgammons[color]
+        self.points += other.points
+        self.squared_points += other.squared_points
+
+    def rate(self, counts, color=None):
+        return float(counts[color or self.color]) / self.games if self.games else 0.0
+
+    def rate_variance(self, counts, color=None):
+        """
+        Variance of the estimated rate, i.e. p * (1 - p) / games
+        """
+        p = self.rate(counts, color)
+        return p * (1 - p) / self.games if self.games else 0.0
+
+    def equity(self):
+        return float(self.points) / self.games if self.games else 0.0
+
+    def equity_variance(self):
+        """
+        Variance of the estimated equity, i.e. the sample variance of
+        the points won per game divided by the number of games.
+        """
+        if self.games < 2:
+            return 0.0
+        mean = self.equity()
+        sample_variance = ((self.squared_points - self.games * mean * mean)
+                           / (self.games - 1))
+        return sample_variance / self.games
+
+    def standard_error(self):
+        return math.sqrt(self.equity_variance())
+
+    def __repr__(self):
+        opponent = OPPONENT[self.color]
+        return ("%s games: wins %.4f, gammons %.4f, backgammons %.4f, "
+                "losses %.4f, gammons lost %.4f, backgammons lost %.4f, "
+                "equity %.4f +- %.4f"
+                % (self.games, self.rate(self.wins), self.rate(self.gammons),
+                   self.rate(self.backgammons), self.rate(self.wins, opponent),
+                   self.rate(self.gammons, opponent),
+                   self.rate(self.backgammons, opponent),
+                   self.equity(), self.standard_error()))
+
+
+def play_chunk(args):
+    """
+    Plays a number of games with their own random number generator.
+    Runs in the worker processes, hence the single argument tuple.
+    """
+    position, color, games, seed, policy_class = args
+    rng = random.Random(seed)
+    engine = SelfPlayEngine({WHITE: policy_class(rng), BLACK: policy_class(rng)},
+                            Dice(rng))
+
+    result = RolloutResult(color)
+    for _ in range(games):
+        winner, points = engine.play_game(position=position, color=color)
+        result.add_game(winner, points)
+    return result
+
+
+def rollout(position, color, trials, seed=0, processes=None,
+            chunk_size=500, policy_class=RandomPolicy):
+    """
+    Plays out the given position (cf. Board.set_position) with the
+    given color to roll first, spreading the trials across a pool of
+    worker processes (one per core unless given). The games are dealt
+    out in chunks of fixed size, each seeded from the given seed, so
+    that the result only depends on the seed and not on the number
+    of processes.
+    """
+    seeds = random.Random(seed)
+    position = list(position)
+    chunks = []
+    for start in range(0, trials, chunk_size):
+        games = min(chunk_size, trials - start)
+        chunks.append((position, color, games, seeds.getrandbits(64),
+                       policy_class))
+
+    result = RolloutResult(color)
+    if processes == 1:
+        for chunk_result in map(play_chunk, chunks):
+            result.merge(chunk_result)
+        return result
+
+    pool = Pool(processes)
+    try:
+        for chunk_result in pool.imap_unordered(play_chunk, chunks):
+            result.merge(chunk_result)
+    finally:
+        pool.close()
+        pool.join()
+    return result
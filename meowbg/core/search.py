@@ -0,0 +1,176 @@
+"""
+Expectiminimax search over dice rolls.
+
+The value of a position is the equity of the side that just moved,
+with the opponent to roll. One ply averages, over all 21 distinct
+rolls of the opponent, the best value the opponent can reach, seen
+from the other side. Only the moves a static evaluator rates best are
+searched further, values are kept in a transposition table keyed by
+the position hash, and the depth is increased as long as the time
+budget allows.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from meowbg.core.board import OPPONENT, SIGN, POINT_INDEX, NUM_POINTS, BAR_SLOT
+from meowbg.core.movecache import LRUCache
+from meowbg.core.race import race_win_probability, race_win_probability_after
+
+logger = logging.getLogger("Search")
+logger.addHandler(logging.StreamHandler())
+
+# All 21 distinct rolls with their probabilities out of 36
+ROLLS = [([d1] * 4 if d1 == d2 else [d1, d2], 1 if d1 == d2 else 2)
+         for d1 in range(1, 7) for d2 in range(d1, 7)]
+
+BLOT_PENALTY = 0.04
+HOME_POINT_BONUS = 0.02
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+@contextmanager
+def applied(board, full_move):
+    """
+    Makes a full move on the board for the duration of a with block
+    """
+    for m in full_move:
+        board.make_partial_move(m)
+    try:
+        yield board
+    finally:
+        for _ in full_move:
+            board.undo_partial_move()
+
+
+class HeuristicEvaluator(object):
+    """
+    Cheap static evaluation without a network: races are evaluated
+    by meowbg.core.race, other positions like a race of the pip
+    counts, corrected for blots in direct range of opposing checkers
+    and for points made in the home board.
+    """
+
+    def evaluate_moves(self, board, color, moves):
+        values = []
+        for full_move in moves:
+            with applied(board, full_move):
+                values.append(self.evaluate(board, color))
+        return values
+
+    def evaluate(self, board, color):
+        if not board.has_contact():
+            return 2 * race_win_probability_after(board, color) - 1
+
+        opponent = OPPONENT[color]
+        chances = 1 - race_win_probability(board.pip_count(opponent),
+                                           board.pip_count(color))
+
+        position, sign = board.position, SIGN[color]
+        # own checkers per point, and opposing ones, in the own numbering
+        own = [position[idx] * sign for idx in POINT_INDEX[color]]
+        enemy = [-position[idx] * sign for idx in POINT_INDEX[color]]
+        # opposing checkers enter from below the own point 0
+        enemy_on_bar = -position[BAR_SLOT[opponent]] * sign
+
+        for i in range(NUM_POINTS):
+            if own[i] == 1:
+                shooters = sum(enemy[max(i - 6, 0):i])
+                if i < 6:
+                    shooters += enemy_on_bar
+                if shooters:
+                    chances -= BLOT_PENALTY
+            elif own[i] > 1 and i < 6:
+                chances += HOME_POINT_BONUS
+
+        chances = min(max(chances, 0.0), 1.0)
+        return 2 * chances - 1
+
+
+class ExpectiminimaxSearch(object):
+    def __init__(self, evaluator, candidates=5, table_size=100000):
+        """
+        evaluator: has a method evaluate_moves(board, color, moves)
+                   returning the equities of the positions after the
+                   moves for the moving color, with the other side on
+                   roll (cf. HeuristicEvaluator)
+        candidates: number of moves per roll searched deeper, chosen
+                    by the static evaluation
+        """
+        self.evaluator = evaluator
+        self.candidates = candidates
+        self.table = LRUCache(maxsize=table_size)
+        # value() can be used without a time limit outside of choose_move
+        self.deadline = float("inf")
+
+    def choose_move(self, board, color, moves, time_budget=1.0, max_depth=3):
+        """
+        Searches the given moves with increasing depth until the time
+        budget (in seconds) is used up or max_depth plies are done,
+        and returns the best move of the last completed depth.
+        """
+        self.deadline = time.time() + time_budget
+        values = self.evaluator.evaluate_moves(board, color, moves)
+        ranked = sorted(zip(values, range(len(moves))), reverse=True)
+        candidates = [moves[idx] for _, idx in ranked[:self.candidates]]
+        best = candidates[0]
+
+        for depth in range(1, max_depth + 1):
+            if len(candidates) == 1:
+                break
+            try:
+                scored = [(self.value_after(board, color, m, depth), idx)
+                          for idx, m in enumerate(candidates)]
+            except SearchTimeout:
+                logger.debug("Search of depth %s timed out", depth)
+                break
+            scored.sort(reverse=True)
+            candidates = [candidates[idx] for _, idx in scored]
+            best = candidates[0]
+            logger.debug("Best move at depth %s: %s (%.3f)", depth, best, scored[0][0])
+        return best
+
+    def value_after(self, board, color, full_move, depth):
+        with applied(board, full_move):
+            return self.value(board, color, depth)
+
+    def value(self, board, color, depth):
+        """
+        Equity of the given color, which just moved, looking the given
+        number of plies (rolls of alternating sides) ahead.
+        """
+        winner, points = board.get_winner()
+        if winner:
+            return points if winner == color else -points
+        if depth == 0:
+            return self.evaluator.evaluate_moves(board, color, [[]])[0]
+
+        key = (board.position_key(OPPONENT[color]), depth)
+        value = self.table.get(key)
+        if value is not None:
+            return value
+
+        if time.time() > self.deadline:
+            raise SearchTimeout()
+
+        opponent = OPPONENT[color]
+        value = 0.0
+        for dice, weight in ROLLS:
+            moves = board.find_possible_moves(dice, opponent, distinct=True)
+            if not moves:
+                # the opponent dances, which leaves us on roll
+                best = -self.value(board, opponent, depth - 1)
+            else:
+                values = self.evaluator.evaluate_moves(board, opponent, moves)
+                if depth > 1:
+                    ranked = sorted(zip(values, range(len(moves))), reverse=True)
+                    values = [self.value_after(board, opponent, moves[idx], depth - 1)
+                              for _, idx in ranked[:self.candidates]]
+                best = -max(values)
+            value += weight * best
+        value /= 36.0
+
+        self.table.put(key, value)
+        return value
@@ -0,0 +1,156 @@
+import random
+from meowbg.core.board import Board, WHITE, BLACK, OPPONENT
+from meowbg.core.dice import Dice
+from meowbg.core.match import Match
+from meowbg.core.race import best_race_move
+
+
+class Policy(object):
+    """
+    Decides the moves and cube actions of one side in self-play.
+    Subclasses must implement choose_move, the default cube actions
+    are to never double and to always take.
+    """
+
+    def choose_move(self, board, dice, color, moves):
+        """
+        Returns one of the given full moves, each a list of partial
+        moves. The list is never empty.
+        """
+        raise NotImplementedError()
+
+    def offer_double(self, board, color, match):
+        return False
+
+    def accept_double(self, board, color, match):
+        return True
+
+
+class RandomPolicy(Policy):
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+
+    def choose_move(self, board, dice, color, moves):
+        return self.rng.choice(moves)
+
+
+class RacePolicy(Policy):
+    """
+    Plays races by their evaluation (cf. meowbg.core.race) and leaves
+    all other positions to the given policy.
+    """
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+
+    def choose_move(self, board, dice, color, moves):
+        return (best_race_move(board, color, moves)
+                or self.fallback.choose_move(board, dice, color, moves))
+
+    def offer_double(self, board, color, match):
+        return self.fallback.offer_double(board, color, match)
+
+    def accept_double(self, board, color, match):
+        return self.fallback.accept_double(board, color, match)
+
+
+class SelfPlayEngine(object):
+    """
+    Plays games and matches between two policies on a Board of its
+    own, without going through the event system, so that large
+    numbers of games can be simulated quickly.
+    """
+
+    def __init__(self, policies, dice=None):
+        self.policies = policies
+        self.dice = dice or Dice()
+        self.board = Board()
+
+    def play_game(self, match=None, position=None, color=None):
+        """
+        Plays a single game and returns the winning color and the
+        points won, i.e. the value of the game times the cube. If a
+        match is given, its cube and Crawford state apply and its
+        score is updated.
+
+        The game starts from the initial position with an opening
+        roll, unless a position (cf. Board.set_position) and the
+        color to roll first are given.
+        """
+        if match is None:
+            match = Match()
+
+        board = self.board
+        match.cube = 1
+        match.may_double = {WHITE: not match.is_crawford(),
+                            BLACK: not match.is_crawford()}
+        match.initial_dice = match.remaining_dice = []
+
+        if position is None:
+            board.setup_initial_position()
+            d1, d2 = self.dice.rollout()
+            color = WHITE if d1 > d2 else BLACK
+            dice = [d1, d2]
+        else:
+            board.set_position(position)
+            dice = None
+
+        while True:
+            if dice is None:
+                dropped = self._cube_action(match, color)
+                if dropped:
+                    return self._end_game(match, color, 1)
+                dice = self.dice.roll()
+
+            moves = board.find_possible_moves(dice, color, distinct=True)
+            if moves:
+                move = self.policies[color].choose_move(board, dice, color, moves)
+                for m in move:
+                    board.make_partial_move(m)
+                board.flush_move_stack()
+
+            winner, points = board.get_winner()
+            if winner:
+                return self._end_game(match, winner, points)
+
+            color = OPPONENT[color]
+            dice = None
+
+    def play_match(self, length):
+        """
+        Plays games until one side reaches the given match length and
+        returns the finished match.
+        """
+        match = Match()
+        match.length = length
+        while not match.finished:
+            self.play_game(match)
+        return match
+
+    def _cube_action(self, match, color):
+        """
+        Lets the policy of the given color decide whether to double
+        before rolling. Returns True if the opponent drops the cube.
+        """
+        match.color_to_move_next = color
+        if not (match.doubling_possible(color)
+                and self.policies[color].offer_double(self.board, color, match)):
+            return False
+
+        opponent = OPPONENT[color]
+        if not self.policies[opponent].accept_double(self.board, opponent, match):
+            return True
+
+        match.cube *= 2
+        match.may_double[color] = False
+        match.may_double[opponent] = True
+        return False
+
+    def _end_game(self, match, winner, points):
+        if match.is_crawford():
+            match.crawford_played = True
+        points_gained = points * match.cube
+        match.score[winner] += points_gained
+        if match.score[winner] >= match.length:
+            match.finished = True
+        return winner, points_gained
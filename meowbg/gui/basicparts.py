@@ -6,7 +6,8 @@ from kivy.uix.gridlayout import GridLayout
 from kivy.uix.image import Image
 from kivy.uix.widget import Widget
 from meowbg.core.board import WHITE, BLACK
-from meowbg.core.bot import Bot
+from meowbg.core.bot import SearchBot
+from meowbg.core.decisions import get_executor
 from meowbg.core.match import OfflineMatch
 from meowbg.core.events import MatchEvent
 from meowbg.core.messaging import broadcast, register
@@ -14,7 +15,7 @@ from meowbg.core.player import HumanPlayer
 from meowbg.gui.guievents import (CommitAttemptEvent, UndoAttemptEvent,
                                   RollAttemptEvent, DoubleAttemptEvent,
                                   ResignAttemptEvent, AcceptAttemptEvent,
-                                  RejectAttemptEvent)
+                                  RejectAttemptEvent, PlaybackEvent)
 
 
 class Checker(Image):
@@ -25,6 +26,28 @@ class Checker(Image):
         Image.__init__(self, **kwargs)
 
 
+class CheckerPool(object):
+    """
+    Keeps the Checker widgets currently not on the board, so that
+    redrawing the board reuses them instead of creating new ones.
+    """
+
+    def __init__(self):
+        self.free = {WHITE: [], BLACK: []}
+
+    def acquire(self, color):
+        free = self.free[color]
+        return free.pop() if free else Checker(color)
+
+    def release(self, checker):
+        if checker.parent:
+            checker.parent.remove_widget(checker)
+        self.free[checker.model_color].append(checker)
+
+
+CHECKER_POOL = CheckerPool()
+
+
 class IndexRow(BoxLayout):
     idx_start = NumericProperty(0)
     idx_direction = NumericProperty(1)
@@ -42,7 +65,34 @@ class CheckerContainer(FloatLayout):
         for _ in range(amount):
             self.add_checker(color)
 
-    def add_checker(self, color):
+    def remove_checkers(self, amount):
+        """
+        Puts the given number of checkers from the top of the stack
+        back into the pool.
+        """
+        for c in self.children[:amount]:
+            CHECKER_POOL.release(c)
+
+    def clear_checkers(self):
+        self.remove_checkers(len(self.children))
+
+    def shown_checkers(self):
+        """
+        Returns the color and number of the checkers displayed, or
+        None if there are checkers of both colors.
+        """
+        if not self.children:
+            return None, 0
+        color = self.children[0].model_color
+        if any(c.model_color != color for c in self.children):
+            return None
+        return color, len(self.children)
+
+    def add_checker(self, color, checker=None):
+        """
+        Stacks a checker of the given color on top, either the given
+        widget or one from the pool.
+        """
         if self.direction == 1:
             if not self.children or self.children[0].model_color != color:
                 amount = 1
@@ -55,8 +105,9 @@ class CheckerContainer(FloatLayout):
             else:
                 amount = self._get_y_displacement(len(self.children))
             top_hint = 1 - self.CHECKER_PERCENTAGE * amount
-        c = Checker(color, size_hint_y=self.CHECKER_PERCENTAGE,
-                    pos_hint={'center_x': 0.5, 'top': top_hint})
+        c = checker or CHECKER_POOL.acquire(color)
+        c.size_hint = (1, self.CHECKER_PERCENTAGE)
+        c.pos_hint = {'center_x': 0.5, 'top': top_hint}
         self.add_widget(c)
 
     def _get_y_displacement(self, num):
@@ -137,9 +188,14 @@ class Cube(BoxLayout):
 
 
 class ButtonPanel(BoxLayout):
+    # the playback speeds to choose from, 0 meaning no animation
+    PLAYBACK_SPEEDS = (1, 2, 4, 0)
+
     def __init__(self, **kwargs):
         BoxLayout.__init__(self, **kwargs)
         self.represented_color = WHITE
+        self.playback_speed = 1
+        self.turbo = False
         register(self.adjust_color, MatchEvent)
 
     def adjust_color(self, me):
@@ -153,13 +209,32 @@ class ButtonPanel(BoxLayout):
                     match.players.items())
         self.represented_color = WHITE
 
-    def start_new_ai_game(self):
+    def start_new_ai_game(self, bots_only=False):
+        """
+        Starts a match against the bot, or between two bots to be
+        watched in turbo mode.
+        """
         match = OfflineMatch()
         match.length = 3
-        match.register_player(HumanPlayer("Johannes", WHITE), WHITE)
-        match.register_player(Bot("Annette", BLACK), BLACK)
+        if bots_only:
+            match.register_player(SearchBot("Bertram", WHITE, executor=get_executor()), WHITE)
+        else:
+            match.register_player(HumanPlayer("Johannes", WHITE), WHITE)
+        match.register_player(SearchBot("Annette", BLACK, executor=get_executor()), BLACK)
+
+        self.turbo = bots_only
+        broadcast(PlaybackEvent(self.playback_speed, self.turbo))
         match.new_game()
 
+    def change_playback_speed(self):
+        """
+        Switches to the next playback speed and returns its label
+        """
+        speeds = self.PLAYBACK_SPEEDS
+        self.playback_speed = speeds[(speeds.index(self.playback_speed) + 1) % len(speeds)]
+        broadcast(PlaybackEvent(self.playback_speed, self.turbo))
+        return "Speed x%i" % self.playback_speed if self.playback_speed else "No animation"
+
     def commit_move(self):
         broadcast(CommitAttemptEvent(self.represented_color))
 
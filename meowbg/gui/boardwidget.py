@@ -2,7 +2,7 @@ from kivy.logger import Logger
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.widget import Widget
-from meowbg.core.board import WHITE, BLACK, BAR_INDEX, OFF_INDEX
+from meowbg.core.board import WHITE, BLACK, BAR_INDEX, OFF_INDEX, NUM_POINTS
 from meowbg.core.eventqueue import GlobalTaskQueue
 from meowbg.core.events import DiceEvent, CubeEvent
 from meowbg.core.messaging import broadcast, register
@@ -121,9 +121,9 @@ class BoardWidget(GridLayout):
             return
 
         if self.active_spike is None:
-            moves = self.match.board.get_remaining_possible_moves()
-            target_indexes = list(set([m[0].target for m in moves
-                                       if m[0].origin == spike.board_idx]))
+            moves = self.match.board.next_partial_moves()
+            target_indexes = list(set([m.target for m in moves
+                                       if m.origin == spike.board_idx]))
 
             if len(target_indexes) == 1:
                 # only one possibility => move immediately
@@ -153,33 +153,54 @@ class BoardWidget(GridLayout):
         self.match = match
         # Logger.info("Sync with %s" % self.match)
 
-        self.clear_board()
+        self.redraw_checkers(match.board)
 
-        on_field = match.board.checkers_on_field
+        dice = self.match.remaining_dice
+        self.show_dice(dice)
 
-        for idx, checkers in on_field.items():
+        if not match.open_cube_challenge_from_color:
+            self.set_cube_to_owning_color()
+
+    def checker_targets(self, board):
+        """
+        Yields each checker container with the color and number of
+        checkers it should display for the given board
+        """
+        on_field = board.checkers_on_field
+        for idx in range(NUM_POINTS):
+            checkers = on_field[idx]
             amount = len(checkers)
-            if amount:
-                col = checkers[0]
-                self.add_checkers(idx, col, amount)
+            yield self._get_spike_by_index(idx), checkers[0] if amount else None, amount
 
-        on_bar = match.board.checkers_on_bar
+        on_bar = board.checkers_on_bar
         for col, target in ((WHITE, self.lower_bar), (BLACK, self.upper_bar)):
-            col_on_bar = on_bar.count(col)
-            if col_on_bar:
-                target.add_checkers(col, col_on_bar)
+            yield target, col, on_bar.count(col)
 
-        borne_off = match.board.borne_off
+        borne_off = board.borne_off
         for col, target in ((WHITE, self.upper_bearoff), (BLACK, self.lower_bearoff)):
-            col_borne_off = borne_off.count(col)
-            if col_borne_off:
-                target.add_checkers(col, col_borne_off)
+            yield target, col, borne_off.count(col)
 
-        dice = self.match.remaining_dice
-        self.show_dice(dice)
-
-        if not match.open_cube_challenge_from_color:
-            self.set_cube_to_owning_color()
+    def redraw_checkers(self, board):
+        """
+        Changes only the containers whose checkers differ from the
+        board. Surplus checkers are removed first, so that the
+        checkers added afterwards are taken from the pool.
+        """
+        additions = []
+        for container, color, amount in self.checker_targets(board):
+            shown = container.shown_checkers()
+            if shown is None or (amount and shown[1] and shown[0] != color):
+                container.clear_checkers()
+                shown = color, 0
+
+            difference = amount - shown[1]
+            if difference < 0:
+                container.remove_checkers(-difference)
+            elif difference > 0:
+                additions.append((container, color, difference))
+
+        for container, color, amount in additions:
+            container.add_checkers(color, amount)
 
     def set_cube_to_owning_color(self):
         if self.match.may_double[WHITE] and not self.match.may_double[BLACK]:
@@ -305,7 +326,7 @@ class BoardWidget(GridLayout):
 
     def clear_board(self):
         for spike in self.spikes():
-            spike.clear_widgets()
+            spike.clear_checkers()
 
     def _get_spike_by_index(self, idx):
         quadrant = {0: self.lower_right_quad,
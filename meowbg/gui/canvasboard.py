@@ -0,0 +1,315 @@
+"""
+A board drawn as canvas instructions of a single widget.
+
+BoardWidget lays out a widget for every spike, checker and die. The
+CanvasBoard draws the spikes as two meshes and all checkers and dice
+as one textured mesh, with the images of the checkers, dice and cube
+rendered into one atlas texture when the board is created. Touches are
+mapped to board indexes by the geometry alone.
+
+Like BoardWidget, it shows the cube next to the side that may double
+it, in the middle while both may, and between the dice while a double
+is offered. The offer is answered with the buttons of the match.
+
+The CanvasBoard has no checker widgets to animate, so moves on it are
+applied without animation. MatchWidget uses it instead of BoardWidget
+if MEOWBG_CANVAS_BOARD is set to 1.
+"""
+from kivy.core.image import Image as CoreImage
+from kivy.graphics import ClearBuffers, ClearColor, Color, Fbo, Mesh, Rectangle
+from kivy.logger import Logger
+from kivy.resources import resource_find
+from kivy.uix.widget import Widget
+from meowbg.core.board import WHITE, BLACK, NUM_POINTS
+from meowbg.core.eventqueue import GlobalTaskQueue
+from meowbg.core.events import DiceEvent, CubeEvent
+from meowbg.core.messaging import broadcast, register
+from meowbg.gui.guievents import MoveAttemptEvent
+
+CHECKER_SOURCES = {BLACK: "checker.png", WHITE: "checker_white.png"}
+DIE_SOURCES = dict((i, "die%i.png" % i) for i in range(1, 7))
+CUBE_SOURCES = dict((2 ** i, "cube%i.png" % 2 ** i) for i in range(7))
+BLANK_CUBE = "cube_blank.png"
+ATLAS_CELL = 64
+
+# the board is 17 columns wide: border, six points, bar, six points,
+# border, bearoff and border, and 13 rows high: index row, five rows
+# of checkers per half, the middle row in between and another index row
+COLUMNS = 17
+ROWS = 13
+BAR_COLUMN = 7
+BEAROFF_COLUMN = 15
+CHECKERS_PER_COLUMN = 5
+
+DARK_SPIKE = (0.45, 0.25, 0.1, 1)
+LIGHT_SPIKE = (0.9, 0.8, 0.6, 1)
+HIGHLIGHT = (1, 1, 0.4, 0.4)
+
+
+def build_atlas(sources, cell=ATLAS_CELL):
+    """
+    Renders the given images side by side into one texture. Returns the
+    Fbo holding the texture and the texture coordinates
+    (u0, v0, u1, v1) of each image.
+    """
+    fbo = Fbo(size=(cell * len(sources), cell))
+    regions = {}
+    with fbo:
+        ClearColor(0, 0, 0, 0)
+        ClearBuffers()
+        Color(1, 1, 1, 1)
+        for i, source in enumerate(sources):
+            texture = CoreImage(resource_find(source)).texture
+            Rectangle(texture=texture, pos=(i * cell, 0), size=(cell, cell))
+            regions[source] = (float(i) / len(sources), 0.0,
+                               float(i + 1) / len(sources), 1.0)
+    fbo.draw()
+    return fbo, regions
+
+
+def column_of(idx):
+    """
+    The column and half (True for the upper one) of a point
+    """
+    if idx >= 12:
+        offset = idx - 12
+        return 1 + offset + (offset >= 6), True
+    offset = 11 - idx
+    return 1 + offset + (offset >= 6), False
+
+
+def index_of(column, upper):
+    """
+    The board index at the given column and half, as used by
+    BoardWidget: bar and bearoff are 24 in the upper half and -1 in
+    the lower one. None outside the points, bar and bearoff.
+    """
+    if column in (BAR_COLUMN, BEAROFF_COLUMN):
+        return 24 if upper else -1
+    if not 1 <= column <= 13:
+        return None
+    offset = column - 1 - (column > BAR_COLUMN)
+    return 12 + offset if upper else 11 - offset
+
+
+def add_quad(vertices, indices, x, y, w, h, region=(0, 0, 0, 0)):
+    u0, v0, u1, v1 = region
+    start = len(vertices) // 4
+    vertices.extend((x, y, u0, v0, x + w, y, u1, v0,
+                     x + w, y + h, u1, v1, x, y + h, u0, v1))
+    indices.extend((start, start + 1, start + 2, start + 2, start + 3, start))
+
+
+def add_triangle(vertices, indices, points):
+    start = len(vertices) // 4
+    for x, y in points:
+        vertices.extend((x, y, 0, 0))
+    indices.extend((start, start + 1, start + 2))
+
+
+class CanvasBoard(Widget):
+    def __init__(self, **kwargs):
+        Widget.__init__(self, **kwargs)
+        self.match = None
+        self.active_idx = None
+        self.highlighted = []
+        # the value of the cube offered, None without an open offer
+        self.offered_cube = None
+
+        sources = (list(CHECKER_SOURCES.values()) + list(DIE_SOURCES.values())
+                   + list(CUBE_SOURCES.values()) + [BLANK_CUBE])
+        self.atlas, self.regions = build_atlas(sources)
+
+        with self.canvas:
+            Color(*DARK_SPIKE)
+            self.dark_spikes = Mesh(mode='triangles')
+            Color(*LIGHT_SPIKE)
+            self.light_spikes = Mesh(mode='triangles')
+            Color(*HIGHLIGHT)
+            self.highlights = Mesh(mode='triangles')
+            Color(1, 1, 1, 1)
+            self.pieces = Mesh(mode='triangles', texture=self.atlas.texture)
+
+        self.bind(pos=self.redraw, size=self.redraw)
+        register(GlobalTaskQueue.synced_call(self.on_dice_event), DiceEvent)
+        register(GlobalTaskQueue.synced_call(self.cube_challenge), CubeEvent)
+
+    @property
+    def column_width(self):
+        return self.width / float(COLUMNS)
+
+    @property
+    def half_height(self):
+        return self.height * CHECKERS_PER_COLUMN / float(ROWS)
+
+    def synchronize(self, match):
+        """
+        Update display according to what's in the given match
+        """
+        self.match = match
+        if not match.open_cube_challenge_from_color:
+            self.offered_cube = None
+        self.redraw()
+
+    def on_dice_event(self, dice_event, on_finish):
+        self.draw_pieces()
+        on_finish()
+
+    def cube_challenge(self, cube_event, on_finish):
+        self.offered_cube = cube_event.cube_number
+        self.draw_pieces()
+        on_finish()
+
+    def redraw(self, *args):
+        self.draw_spikes()
+        self.draw_highlights()
+        self.draw_pieces()
+
+    def draw_spikes(self):
+        w, half = self.column_width, self.half_height
+        meshes = {0: ([], []), 1: ([], [])}
+        for idx in range(NUM_POINTS):
+            column, upper = column_of(idx)
+            x = self.x + column * w
+            if upper:
+                base = self.top - self.height / float(ROWS)
+                tip = base - half
+            else:
+                base = self.y + self.height / float(ROWS)
+                tip = base + half
+            vertices, indices = meshes[idx % 2]
+            add_triangle(vertices, indices, ((x, base), (x + w, base), (x + w / 2.0, tip)))
+
+        for mesh, (vertices, indices) in ((self.dark_spikes, meshes[0]),
+                                          (self.light_spikes, meshes[1])):
+            mesh.vertices, mesh.indices = vertices, indices
+
+    def draw_highlights(self):
+        vertices, indices = [], []
+        for idx in self.highlighted + [self.active_idx]:
+            if idx is None or not 0 <= idx < NUM_POINTS:
+                continue
+            column, upper = column_of(idx)
+            y = self.top - self.height / float(ROWS) - self.half_height if upper \
+                else self.y + self.height / float(ROWS)
+            add_quad(vertices, indices, self.x + column * self.column_width, y,
+                     self.column_width, self.half_height)
+        self.highlights.vertices, self.highlights.indices = vertices, indices
+
+    def stacks(self, board):
+        """
+        Yields the column, half, color and number of each stack of
+        checkers on the given board
+        """
+        on_field = board.checkers_on_field
+        for idx in range(NUM_POINTS):
+            checkers = on_field[idx]
+            if checkers:
+                column, upper = column_of(idx)
+                yield column, upper, checkers[0], len(checkers)
+
+        on_bar = board.checkers_on_bar
+        for col, upper in ((WHITE, False), (BLACK, True)):
+            yield BAR_COLUMN, upper, col, on_bar.count(col)
+
+        borne_off = board.borne_off
+        for col, upper in ((WHITE, True), (BLACK, False)):
+            yield BEAROFF_COLUMN, upper, col, borne_off.count(col)
+
+    def draw_pieces(self):
+        vertices, indices = [], []
+        if self.match:
+            self.add_checkers(vertices, indices)
+            self.add_dice(vertices, indices)
+            self.add_cube(vertices, indices)
+        self.pieces.vertices, self.pieces.indices = vertices, indices
+
+    def add_checkers(self, vertices, indices):
+        w, half = self.column_width, self.half_height
+        size = min(w, half / CHECKERS_PER_COLUMN)
+        inner_top = self.top - self.height / float(ROWS)
+        inner_bottom = self.y + self.height / float(ROWS)
+        for column, upper, color, amount in self.stacks(self.match.board):
+            if not amount:
+                continue
+            # squeeze the stack into its half of the board
+            step = size if amount <= CHECKERS_PER_COLUMN else (half - size) / (amount - 1)
+            region = self.regions[CHECKER_SOURCES[color]]
+            x = self.x + column * w + (w - size) / 2.0
+            for i in range(amount):
+                y = inner_top - size - i * step if upper else inner_bottom + i * step
+                add_quad(vertices, indices, x, y, size, size, region)
+
+    def add_dice(self, vertices, indices):
+        dice = self.match.remaining_dice
+        if not dice:
+            return
+        w = self.column_width
+        size = min(w, self.height / float(ROWS))
+        # black's dice on the left half, white's on the right one
+        first_column = 2 if self.match.color_to_move_next == BLACK else 9
+        y = self.center_y - size / 2.0
+        for i, die in enumerate(dice):
+            add_quad(vertices, indices, self.x + (first_column + i) * w, y, size, size,
+                     self.regions[DIE_SOURCES[die]])
+
+    def cube_column_and_row(self):
+        """
+        Where the cube is drawn: the column and the row, counted from
+        the bottom
+        """
+        middle_row = ROWS // 2
+        if self.offered_cube:
+            return BAR_COLUMN, middle_row
+        may_double = self.match.may_double
+        if may_double[WHITE] and not may_double[BLACK]:
+            return 0, ROWS - 1
+        if may_double[BLACK] and not may_double[WHITE]:
+            return 0, 0
+        return 0, middle_row
+
+    def add_cube(self, vertices, indices):
+        value = self.offered_cube or self.match.cube
+        column, row = self.cube_column_and_row()
+        w, h = self.column_width, self.height / float(ROWS)
+        size = min(w, h)
+        add_quad(vertices, indices, self.x + column * w + (w - size) / 2.0,
+                 self.y + row * h + (h - size) / 2.0, size, size,
+                 self.regions[CUBE_SOURCES.get(value, BLANK_CUBE)])
+
+    def index_at(self, x, y):
+        """
+        The board index at the given window coordinates, or None
+        """
+        if not self.collide_point(x, y):
+            return None
+        column = int((x - self.x) / self.column_width)
+        return index_of(column, y > self.center_y)
+
+    def on_touch_down(self, touch):
+        idx = self.index_at(*touch.pos)
+        if idx is not None:
+            self.activate_index(idx)
+            return True
+
+    def activate_index(self, idx):
+        self.highlighted = []
+        if not self.match:
+            return
+
+        if self.active_idx is None:
+            moves = self.match.board.next_partial_moves()
+            target_indexes = list(set([m.target for m in moves if m.origin == idx]))
+
+            if len(target_indexes) == 1:
+                # only one possibility => move immediately
+                broadcast(MoveAttemptEvent(idx, target_indexes[0]))
+            elif len(target_indexes) > 0:
+                self.active_idx = idx
+                self.highlighted = target_indexes
+            else:
+                Logger.info("No possible moves from %s" % idx)
+        else:
+            broadcast(MoveAttemptEvent(self.active_idx, idx))
+            self.active_idx = None
+        self.draw_highlights()
@@ -72,6 +72,19 @@ class PauseEvent(object):
         self.ms = ms
 
 
+class PlaybackEvent(object):
+    """
+    Sets how fast moves are played on the board. A speed of 0 applies
+    the moves without animation. In turbo mode the board is only
+    redrawn once per turn, and nothing waits for the user.
+    """
+    def __init__(self, speed=1, turbo=False):
+        self.speed, self.turbo = speed, turbo
+
+    def __repr__(self):
+        return "PlaybackEvent: speed %s, turbo %s" % (self.speed, self.turbo)
+
+
 class MatchFocusEvent(object):
     """
     Bring the match window into the foreground, i.e. focus it
@@ -21,10 +21,11 @@ from meowbg.core.board import WHITE, BLACK
 from meowbg.gui.basicparts import (Spike, SpikePanel, IndexRow, ButtonPanel, BarPanel,
                                    BearoffPanel, Checker, Cube)
 from meowbg.gui.boardwidget import BoardWidget
+from meowbg.gui.canvasboard import CanvasBoard
 from meowbg.gui.guievents import (MoveAttemptEvent, PauseEvent,
                                   MatchFocusEvent, CommitAttemptEvent, UndoAttemptEvent,
                                   RollAttemptEvent, DoubleAttemptEvent, ResignAttemptEvent,
-                                  AcceptAttemptEvent, RejectAttemptEvent)
+                                  AcceptAttemptEvent, RejectAttemptEvent, PlaybackEvent)
 from meowbg.core.events import (MatchEvent, MatchEndEvent, GameEndEvent,
                                 JoinChallengeEvent, ResignOfferEvent, GlobalShutdownEvent,
                                 AcceptJoinEvent)
@@ -36,6 +37,8 @@ from meowbg.gui.networkwidget import NetworkWidget
 
 resource_add_path(os.path.dirname(__file__) + "/resources")
 
+CANVAS_BOARD = os.environ.get("MEOWBG_CANVAS_BOARD") == "1"
+
 
 class MainWidget(GridLayout):
     def __init__(self, **kwargs):
@@ -109,12 +112,17 @@ class MatchWidget(FloatLayout):
 
         self.add_widget(Image(source='wood_texture.jpg', pos_hint={'x': 0, 'y': 0},
                               allow_stretch=True, keep_ratio=False))
-        self.board = BoardWidget(pos_hint={'x': 0, 'y': 0})
+        board_class = CanvasBoard if CANVAS_BOARD else BoardWidget
+        self.board = board_class(pos_hint={'x': 0, 'y': 0})
         self.add_widget(self.board)
         self.match = None
+        self.playback_speed = 1
+        self.turbo = False
+
+        register(self.set_playback, PlaybackEvent)
 
         sync_call = GlobalTaskQueue.synced_call
-        register(sync_call(self.sync_match), MatchEvent)
+        register(sync_call(self.sync_match, coalesce=True), MatchEvent)
         register(sync_call(self.attempt_roll), RollAttemptEvent)
         register(sync_call(self.attempt_commit), CommitAttemptEvent)
         register(sync_call(self.attempt_move), MoveAttemptEvent)
@@ -135,6 +143,14 @@ class MatchWidget(FloatLayout):
         broadcast(MatchFocusEvent())
         on_finish()
 
+    def set_playback(self, e):
+        self.playback_speed, self.turbo = e.speed, e.turbo
+
+    @property
+    def animated(self):
+        return (self.playback_speed > 0 and not self.turbo
+                and isinstance(self.board, BoardWidget))
+
     def end_match(self, e, on_finish):
         self.match = None
         on_finish()
@@ -144,9 +160,17 @@ class MatchWidget(FloatLayout):
         Attempts to execute a move from origin to target.
         If the match allows it, an animation is started independently of the
         event queue. If the move hits a checker, a hit is animated as well.
+        Without animations the board is updated right away, in turbo
+        mode not until the turn is complete.
         """
         origin, target = move_attempt_event.origin, move_attempt_event.target
         if self.match and self.match.is_move_possible(origin, target, self.match.color_to_move_next):
+            if not self.animated:
+                self.match.execute_move(origin, target)
+                if not self.turbo:
+                    self.board.synchronize(self.match)
+                on_finish()
+                return
 
             moving_checker, target_spike = self.board.get_animation_data(
                 origin, target)
@@ -172,6 +196,11 @@ class MatchWidget(FloatLayout):
             return
 
         move, hit_color = self.match.undo_move()
+        if not self.animated:
+            self.board.synchronize(self.match)
+            on_finish()
+            return
+
         moving_checker, target_spike = self.board.get_undo_animation_data(
             move.origin, move.target)
 
@@ -223,7 +252,10 @@ class MatchWidget(FloatLayout):
         on_finish()
 
     def pause(self, pe, on_finish):
-        Clock.schedule_once(lambda e: on_finish(), pe.ms / 1000.0)
+        if not self.animated:
+            on_finish()
+            return
+        Clock.schedule_once(lambda e: on_finish(), pe.ms / 1000.0 / self.playback_speed)
 
     def execute_undo_move(self, undo_move_event, on_finish):
         move = undo_move_event.move
@@ -236,6 +268,12 @@ class MatchWidget(FloatLayout):
         verb = "wins" if e.winner.lower() != "you" else "win"
         point_str = "points" if e.points != 1 else "point"
         score = self.match.get_score()
+        if self.turbo:
+            Logger.info("%s %s %s %s, the score is now %s : %s"
+                        % ((e.winner, verb, e.points, point_str) + score))
+            on_finish()
+            return
+
         ok_dialog = OKDialog(text='The score is now %s : %s' % score)
         popup = Popup(title='%s %s %s %s' % (e.winner, verb, e.points, point_str),
                       content=ok_dialog,
@@ -298,24 +336,27 @@ class MatchWidget(FloatLayout):
         Logger.warn("Starting animation at %s, queue activity is %s"
                     % (moving_checker.pos, GlobalTaskQueue.running_func))
 
-        new_checker = Checker(moving_checker.model_color,
-                              size=size, size_hint=(None, None),
-                              pos=moving_checker.pos, pos_hint={})
-
+        # the checker itself flies across the board and is stacked onto
+        # the target spike afterwards, so no widgets are created
+        pos = moving_checker.pos
         if moving_checker.parent:
             moving_checker.parent.remove_widget(moving_checker)
 
-        self.add_widget(new_checker)
+        moving_checker.size_hint = (None, None)
+        moving_checker.size = size
+        moving_checker.pos = pos
+        self.add_widget(moving_checker)
 
         def on_animation_complete(e):
-            target_spike.add_checker(moving_checker.model_color)
-            self.remove_widget(new_checker)
+            self.remove_widget(moving_checker)
+            target_spike.add_checker(moving_checker.model_color, moving_checker)
             on_finish()
 
-        duration = Vector(moving_checker.pos).distance(target_pos) / 1000.0
+        duration = (Vector(moving_checker.pos).distance(target_pos)
+                    / 1000.0 / self.playback_speed)
         animation = Animation(pos=target_pos, duration=duration)
         animation.on_complete = on_animation_complete
-        animation.start(new_checker)
+        animation.start(moving_checker)
 
 
 class BoardApp(App):
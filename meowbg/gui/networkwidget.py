@@ -1,66 +1,160 @@
 
 from meowbg.core.messaging import register, broadcast
 from meowbg.network.connectionpool import share_connection
-from meowbg.network.telnetconn import TelnetConnection
+try:
+    from meowbg.network.asyncclient import FIBSClient as Connection
+except (ImportError, SyntaxError):
+    # no asyncio before Python 3
+    from meowbg.network.telnetconn import TelnetConnection as Connection
+from meowbg.network.playerindex import PlayerIndex
 from meowbg.network.translation import FIBSTranslator
 from meowbg.core.events import (PlayerStatusEvent, GlobalShutdownEvent,
                                 OutgoingInvitationEvent, OpponentJoinedEvent,
-                                IncompleteInvitationEvent, MessageEvent)
+                                IncompleteInvitationEvent, MessageEvent,
+                                PlayerLoginEvent, PlayerLogoutEvent)
 from meowbg.gui.popups import ChooseMatchLengthDialog, ConnectionDialog
 
 
+from kivy.clock import Clock
+from kivy.properties import ObjectProperty
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.label import Label
 from kivy.uix.textinput import TextInput
 from kivy.uix.button import Button
+from kivy.uix.spinner import Spinner
+from kivy.uix.togglebutton import ToggleButton
 from kivy.logger import Logger
 from kivy.uix.popup import Popup
 
 
-class PlayerListWidget(ScrollView):
-    def __init__(self, **kwargs):
-        ScrollView.__init__(self, **kwargs)
-        self.grid = GridLayout(cols=1, spacing=10,
-                               size=(self.width, self.height),
-                               size_hint=(None, None))
-        self.grid.bind(minimum_height=self.grid.setter('height'))
+class PlayerListWidget(RecycleView):
+    """
+    Shows the players of the PlayerIndex. Only the rows currently
+    visible are widgets, and they are reused while scrolling.
+    """
 
-        self.add_widget(self.grid)
+    def __init__(self, **kwargs):
+        RecycleView.__init__(self, **kwargs)
+        self.index = PlayerIndex()
+        self.sort_by, self.descending = "rating", True
+        self.filters = {}
+
+        self.viewclass = PlayerRow
+        layout = RecycleBoxLayout(orientation='vertical', spacing=10,
+                                  default_size=(None, 25),
+                                  default_size_hint=(1, None),
+                                  size_hint_y=None)
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+
+        # the updates arriving until the next frame are shown at once
+        self.refresh = Clock.create_trigger(self.refresh_display)
 
     def update_display(self, status_dicts):
-        for item in status_dicts:
-            existing_rows = [r for r in self.grid.children
-                             if r.player_info["name"] == item["name"]]
-
-            if existing_rows:
-                existing_rows[0].player_info = item
-                existing_rows[0].render()
-            else:
-                self.grid.add_widget(PlayerRow(size=(self.width, 25),
-                                               size_hint=(None, None),
-                                               player_info=item))
-
-
-class PlayerRow(BoxLayout):
-    def __init__(self, *args, **kwargs):
-        BoxLayout.__init__(self, *args, **kwargs)
-        self.player_info = kwargs.get("player_info")
-        self.render()
-
-    def render(self):
-        self.clear_widgets()
-        self.add_widget(Label(text=self.player_info["name"]))
-        self.add_widget(Label(text=self.player_info["rating"]))
-        self.add_widget(Label(text=self.player_info["experience"]))
-        self.add_widget(Label(text=self.player_info["client"]))
+        self.index.update(status_dicts)
+        self.refresh()
+
+    def add_player(self, name):
+        self.index.login(name)
+        self.refresh()
+
+    def remove_player(self, name):
+        self.index.logout(name)
+        self.refresh()
+
+    def sort(self, sort_by, descending=True):
+        self.sort_by, self.descending = sort_by, descending
+        self.refresh()
+
+    def filter(self, **filters):
+        """
+        Shows only the players matching the given filters of
+        PlayerIndex.query, all players if there are none
+        """
+        self.filters = filters
+        self.refresh()
+
+    def refresh_display(self, *args):
+        players = self.index.query(self.sort_by, self.descending, **self.filters)
+        self.data = [{"player_info": info} for info in players]
+
+
+class PlayerRow(RecycleDataViewBehavior, BoxLayout):
+    player_info = ObjectProperty(None, allownone=True)
+
+    def __init__(self, **kwargs):
+        BoxLayout.__init__(self, **kwargs)
+        self.labels = {}
+        for field in ("name", "rating", "experience", "client"):
+            self.labels[field] = Label()
+            self.add_widget(self.labels[field])
+
+    def on_player_info(self, row, player_info):
+        for field, label in self.labels.items():
+            label.text = player_info[field] if player_info else ""
 
     def on_touch_down(self, touch):
-        if self.collide_point(*touch.pos):
+        if self.collide_point(*touch.pos) and self.player_info:
             broadcast(OutgoingInvitationEvent(self.player_info["name"]))
 
 
+def threshold(text):
+    """
+    The number of a filter value like "1500+", None for "Any ..."
+    """
+    return float(text[:-1]) if text.endswith("+") else None
+
+
+class LobbyControls(BoxLayout):
+    """
+    Sorts and filters the players of a PlayerListWidget. Pressing the
+    sort button of the current order reverses it.
+    """
+    SORT_BUTTONS = (("rating", "Rating"), ("experience", "Experience"), ("name", "Name"))
+    MIN_RATINGS = ("Any rating", "1500+", "1600+", "1700+", "1800+")
+    MIN_EXPERIENCES = ("Any experience", "100+", "500+", "1000+")
+
+    def __init__(self, player_list, **kwargs):
+        BoxLayout.__init__(self, **kwargs)
+        self.player_list = player_list
+
+        for sort_by, text in self.SORT_BUTTONS:
+            button = Button(text=text)
+            button.bind(on_press=lambda b, sort_by=sort_by: self.sort(sort_by))
+            self.add_widget(button)
+
+        self.ready_only = ToggleButton(text="Ready only")
+        self.ready_only.bind(state=self.apply_filters)
+        self.add_widget(self.ready_only)
+
+        self.min_rating = Spinner(text=self.MIN_RATINGS[0], values=self.MIN_RATINGS)
+        self.min_rating.bind(text=self.apply_filters)
+        self.add_widget(self.min_rating)
+
+        self.min_experience = Spinner(text=self.MIN_EXPERIENCES[0],
+                                      values=self.MIN_EXPERIENCES)
+        self.min_experience.bind(text=self.apply_filters)
+        self.add_widget(self.min_experience)
+
+    def sort(self, sort_by):
+        if sort_by == self.player_list.sort_by:
+            descending = not self.player_list.descending
+        else:
+            # best players first, but names from A to Z
+            descending = sort_by != "name"
+        self.player_list.sort(sort_by, descending)
+
+    def apply_filters(self, *args):
+        self.player_list.filter(ready_only=self.ready_only.state == "down",
+                                min_rating=threshold(self.min_rating.text),
+                                min_experience=threshold(self.min_experience.text))
+
+
 class ChatWindow(ScrollView):
     def __init__(self, **kwargs):
         # kwargs.update({"cols": 1})
@@ -78,8 +172,11 @@ class NetworkWidget(GridLayout):
         kwargs.update({"rows": 2})
         GridLayout.__init__(self, **kwargs)
 
-        self.player_list = PlayerListWidget(size_hint_x=7, size_hint_y=9)
-        self.add_widget(self.player_list)
+        lobby = BoxLayout(orientation='vertical', size_hint=(7, 9))
+        self.player_list = PlayerListWidget(size_hint_y=9)
+        lobby.add_widget(LobbyControls(self.player_list, size_hint_y=1))
+        lobby.add_widget(self.player_list)
+        self.add_widget(lobby)
 
         self.chat_window = ChatWindow(size_hint=(3, 9))
         self.add_widget(self.chat_window)
@@ -100,6 +197,8 @@ class NetworkWidget(GridLayout):
         self.active = False
 
         register(self.handle, PlayerStatusEvent)
+        register(self.handle, PlayerLoginEvent)
+        register(self.handle, PlayerLogoutEvent)
         register(self.handle, MessageEvent)
         register(self.tear_down, GlobalShutdownEvent)
         register(self.on_invite, OutgoingInvitationEvent)
@@ -109,6 +208,10 @@ class NetworkWidget(GridLayout):
     def handle(self, event):
         if isinstance(event, PlayerStatusEvent):
             self.player_list.update_display(event.status_dicts)
+        elif isinstance(event, PlayerLoginEvent):
+            self.player_list.add_player(event.name)
+        elif isinstance(event, PlayerLogoutEvent):
+            self.player_list.remove_player(event.name)
         elif isinstance(event, MessageEvent):
             self.chat_window.append_text(event)
         else:
@@ -161,13 +264,15 @@ class NetworkWidget(GridLayout):
 
     def connect(self, login_data):
         if not self.connection:
-            self.connection = TelnetConnection(login_data["server"],
-                                               login_data["user"],
-                                               login_data["password"])
+            self.connection = Connection(login_data["server"],
+                                         login_data["user"],
+                                         login_data["password"])
             share_connection(login_data["server"], self.connection)
 
-            self.connection.connect(self.handle_input)
+            # the text may arrive before connect returns, and on the
+            # thread of the connection
             self.parser = FIBSTranslator()
+            self.connection.connect(self.receive)
         else:
             Logger.info("Already connected to %s" % self.connection)
 
@@ -176,9 +281,12 @@ class NetworkWidget(GridLayout):
         if self.connection:
             self.connection.shutdown()
 
+    def receive(self, data):
+        Clock.schedule_once(lambda dt: self.handle_input(data))
+
     def handle_input(self, data):
         Logger.warn(data)
-        events = self.parser.parse_events(data)
+        events = self.parser.feed(data)
         for e in events:
             broadcast(e)
 
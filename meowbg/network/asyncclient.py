@@ -0,0 +1,182 @@
+"""
+Asyncio client for FIBS and Tigergammon (Python 3 only).
+
+Unlike TelnetConnection, which polls the server twice a second on a
+thread of its own, the client reads whatever the server sends as soon
+as it arrives and passes on the complete lines right away. Outgoing
+commands are queued and written by a task of their own.
+
+The client is driven by an asyncio event loop, either directly (open
+and close are coroutines) or through connect, send and shutdown like a
+TelnetConnection, in which case all clients share one event loop on a
+background thread.
+"""
+import asyncio
+import logging
+import os
+import threading
+
+logger = logging.getLogger("FIBSClient")
+log_base = os.path.join(os.environ.get("MEOWBG_ROOT", "."), "logs")
+networklog = os.path.join(log_base, "network.log")
+logger.addHandler(logging.FileHandler(networklog))
+
+logger.setLevel(logging.INFO)
+
+LOGIN_PROMPT = b"login: "
+LINE_END = "\r\n"
+READ_SIZE = 65536
+LOGIN_TIMEOUT = 10
+
+
+def translating(translator, on_events):
+    """
+    Returns a callback for received text, which feeds it to the given
+    FIBSTranslator and hands the events found to on_events.
+    """
+    def on_text(text):
+        events = translator.feed(text)
+        if events:
+            on_events(events)
+    return on_text
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def background_loop():
+    """
+    Returns the event loop running on a background thread, which is
+    started on first use and shared by all clients.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="FIBSClient")
+            thread.daemon = True
+            thread.start()
+    return _loop
+
+
+class FIBSClient(object):
+    HOSTS = {'Tigergammon': ('tigergammon.com', 4321),
+             'FIBS': ('fibs.com', 4321)}
+
+    def __init__(self, host_key=None, username="", password="", address=None):
+        """
+        address: (host, port) to connect to instead of the server
+                 given by host_key
+        """
+        self.host, self.port = address or self.HOSTS[host_key or 'Tigergammon']
+        self.username, self.password = username or 'meowbg_joe', password or 'qwertz'
+        self.loop = None
+        self.reader = self.writer = None
+        self.outgoing = None
+        self.tasks = []
+        self.pending = ""
+        self.alive = False
+        self.closed = None
+
+    async def open(self, on_text):
+        """
+        Connects, logs in and starts passing the complete lines the
+        server sends to on_text, as one string per chunk received.
+        Being logged in is considered part of the connection.
+        """
+        logger.info("Establishing connection to %s:%s", self.host, self.port)
+        self.loop = asyncio.get_event_loop()
+        self.closed = asyncio.Event()
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        await asyncio.wait_for(self.reader.readuntil(LOGIN_PROMPT), LOGIN_TIMEOUT)
+
+        self.outgoing = asyncio.Queue()
+        self.alive = True
+        for command in ("login meowBG 1008 %s %s" % (self.username, self.password),
+                        "set boardstyle 3",
+                        "toggle moreboards"):
+            self.outgoing.put_nowait(command)
+
+        self.tasks = [self.loop.create_task(self._read_forever(on_text)),
+                      self.loop.create_task(self._write_forever())]
+
+    async def _read_forever(self, on_text):
+        while self.alive:
+            try:
+                data = await self.reader.read(READ_SIZE)
+            except ConnectionError as e:
+                logger.info("Reading from %s failed: %s", self.host, e)
+                data = b""
+            if not data:
+                logger.info("Connection closed by %s", self.host)
+                self.alive = False
+                self.closed.set()
+                break
+
+            # hold back an incomplete last line until the rest arrives
+            text = self.pending + data.decode("ascii", "ignore")
+            complete, _, self.pending = text.rpartition(LINE_END)
+            if complete.strip():
+                # a file write per chunk would hold up the event loop
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(complete)
+                try:
+                    on_text(complete + LINE_END)
+                except Exception:
+                    logger.exception("Handling %r failed", complete)
+
+    async def _write_forever(self):
+        while True:
+            commands = [await self.outgoing.get()]
+            while not self.outgoing.empty():
+                commands.append(self.outgoing.get_nowait())
+            self.writer.write("".join(c + LINE_END for c in commands)
+                              .encode("ascii", "ignore"))
+            await self.writer.drain()
+
+    def send(self, msg):
+        """
+        Queues a command for the server. May be called from any thread.
+        """
+        if not self.alive:
+            logger.warning("Not connected, dropping %r", msg)
+            return
+        self.loop.call_soon_threadsafe(self.outgoing.put_nowait, msg)
+
+    async def wait_closed(self):
+        """
+        Waits until the server closes the connection or close is called
+        """
+        await self.closed.wait()
+
+    async def close(self):
+        self.alive = False
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+        if self.closed:
+            self.closed.set()
+
+    def connect(self, callback_func):
+        """
+        Connects on the shared background loop like
+        TelnetConnection.connect. callback_func is called on the loop
+        thread with the text received.
+        """
+        future = asyncio.run_coroutine_threadsafe(self.open(callback_func),
+                                                  background_loop())
+        future.result(LOGIN_TIMEOUT)
+
+    def shutdown(self):
+        if self.loop:
+            asyncio.run_coroutine_threadsafe(self.close(), self.loop).result(LOGIN_TIMEOUT)
+
+    def __repr__(self):
+        return "FIBSClient(%s:%s)" % (self.host, self.port)
@@ -9,7 +9,13 @@ def share_connection(key, conn):
 
 
 def get_connection(key=None):
-    return connections.get(key) if key else connections.values()[0]
+    """
+    Returns the connection shared under the given key, or any shared
+    connection without a key, or None if there is none.
+    """
+    if key:
+        return connections.get(key)
+    return next(iter(connections.values()), None)
 
 
 class DummyConnection(object):
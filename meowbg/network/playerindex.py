@@ -0,0 +1,84 @@
+"""
+The players on the server, as reported by who-info.
+
+The server sends the status of every player logged in right after the
+login, and updates for single players afterwards. The PlayerIndex keeps
+them by name, so that each update only replaces one entry, and the
+lobby sorts and filters the players from here instead of from widgets.
+"""
+import threading
+
+STATUS_FIELDS = ("name", "opponent", "watching", "ready", "away", "rating",
+                 "experience", "idle", "login", "hostname", "client", "email")
+
+
+def number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class PlayerIndex(object):
+    SORT_KEYS = {"name": lambda info: info["name"].lower(),
+                 "rating": lambda info: number(info["rating"]),
+                 "experience": lambda info: number(info["experience"])}
+
+    def __init__(self):
+        # updated on the network thread, read on the main loop
+        self.lock = threading.Lock()
+        self.players = {}
+
+    def update(self, status_dicts):
+        """
+        Stores the given who-info, replacing what was known about the
+        players before. Malformed entries without a name are ignored.
+        """
+        with self.lock:
+            for item in status_dicts:
+                if item.get("name"):
+                    self.players[item["name"]] = item
+
+    def login(self, name):
+        """
+        Adds a player that has just logged in, with no status known
+        until the server sends it
+        """
+        with self.lock:
+            if name not in self.players:
+                info = dict((field, "") for field in STATUS_FIELDS)
+                info["name"] = name
+                self.players[name] = info
+
+    def logout(self, name):
+        with self.lock:
+            self.players.pop(name, None)
+
+    def clear(self):
+        with self.lock:
+            self.players.clear()
+
+    def __len__(self):
+        return len(self.players)
+
+    def __contains__(self, name):
+        return name in self.players
+
+    def query(self, sort_by="rating", descending=True, ready_only=False,
+              min_rating=None, min_experience=None):
+        """
+        Returns the status dicts of the players matching the filters,
+        sorted by one of the SORT_KEYS
+        """
+        with self.lock:
+            players = list(self.players.values())
+
+        if ready_only:
+            players = [p for p in players if p["ready"] == "1"]
+        if min_rating is not None:
+            players = [p for p in players if number(p["rating"]) >= min_rating]
+        if min_experience is not None:
+            players = [p for p in players if number(p["experience"]) >= min_experience]
+
+        players.sort(key=self.SORT_KEYS[sort_by], reverse=descending)
+        return players
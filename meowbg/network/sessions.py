@@ -0,0 +1,210 @@
+"""
+Many server sessions in one process (Python 3 only).
+
+A Session is one account logged in to a FIBS-style server with a
+FIBSClient. It has a translator, and thus a current match, a registry
+of opponent proxies and a dispatcher of its own, so that sessions
+never see each other's events, even when they play opponents of the
+same name. Commands are sent no faster than a token bucket allows,
+and lost connections are reestablished with exponential backoff.
+
+The ConnectionManager runs any number of sessions on one event loop.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import OrderedDict
+from meowbg.core.messaging import Dispatcher
+from meowbg.core.player import PlayerRegistry
+from meowbg.network.asyncclient import FIBSClient, translating, background_loop, LOGIN_TIMEOUT
+from meowbg.network.translation import FIBSTranslator
+
+logger = logging.getLogger("Sessions")
+logger.addHandler(logging.StreamHandler())
+
+
+class TokenBucket(object):
+    """
+    Allows rate actions per second on average, and bursts of up to
+    capacity actions.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate, self.capacity, self.clock = rate, capacity, clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+
+    def delay(self):
+        """
+        Takes a token and returns the seconds to wait until it is
+        actually available, 0 if it is available right away.
+        """
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class Backoff(object):
+    """
+    Exponentially growing delays between reconnection attempts, with
+    random jitter so that many sessions do not reconnect in lockstep.
+    """
+
+    def __init__(self, initial=1.0, maximum=60.0, factor=2.0, rng=None):
+        self.initial, self.maximum, self.factor = initial, maximum, factor
+        self.rng = rng or random
+        self.attempts = 0
+
+    def next_delay(self):
+        delay = min(self.initial * self.factor ** self.attempts, self.maximum)
+        self.attempts += 1
+        return self.rng.uniform(delay / 2, delay)
+
+    def reset(self):
+        self.attempts = 0
+
+
+class Session(object):
+    def __init__(self, name, username, password, host_key=None, address=None,
+                 rate=2.0, burst=5, backoff=None):
+        """
+        name: key of the session in its ConnectionManager
+        rate, burst: commands per second on average and at most in a row
+        """
+        self.name = name
+        self.username, self.password = username, password
+        self.host_key, self.address = host_key, address
+
+        self.dispatcher = Dispatcher()
+        self.players = PlayerRegistry(connection=self, dispatcher=self.dispatcher)
+        self.translator = FIBSTranslator(self.players, self.dispatcher)
+        self.limiter = TokenBucket(rate, burst)
+        self.backoff = backoff or Backoff()
+
+        self.client = None
+        self.loop = None
+        self.outgoing = None
+        self.stopping = None
+        self.connections = 0
+
+    async def run(self):
+        """
+        Keeps the session connected until stop is called
+        """
+        self.loop = asyncio.get_event_loop()
+        self.outgoing = asyncio.Queue()
+        self.stopping = asyncio.Event()
+        sender = self.loop.create_task(self._send_forever())
+        try:
+            while not self.stopping.is_set():
+                client = FIBSClient(self.host_key, self.username, self.password, self.address)
+                try:
+                    await client.open(translating(self.translator, self.dispatch))
+                except (OSError, EOFError, asyncio.TimeoutError) as e:
+                    logger.warning("Session %s cannot connect: %s", self.name, e)
+                    await client.close()
+                    await self._pause()
+                    continue
+
+                self.client = client
+                self.connections += 1
+                self.backoff.reset()
+                await client.wait_closed()
+                await client.close()
+                self.client = None
+                # the match of the lost connection ends with its proxies
+                self.players.clear()
+                self.translator.reset()
+                await self._pause()
+        finally:
+            sender.cancel()
+
+    async def _pause(self):
+        if self.stopping.is_set():
+            return
+        delay = self.backoff.next_delay()
+        logger.info("Session %s reconnects in %.1fs", self.name, delay)
+        try:
+            await asyncio.wait_for(self.stopping.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    def dispatch(self, events):
+        for e in events:
+            self.dispatcher.broadcast(e)
+
+    def send(self, msg):
+        """
+        Queues a command for the server. May be called from any thread.
+        """
+        if not self.loop:
+            logger.warning("Session %s is not running, dropping %r", self.name, msg)
+            return
+        self.loop.call_soon_threadsafe(self.outgoing.put_nowait, msg)
+
+    async def _send_forever(self):
+        while True:
+            msg = await self.outgoing.get()
+            delay = self.limiter.delay()
+            if delay:
+                await asyncio.sleep(delay)
+            if self.client and self.client.alive:
+                self.client.send(msg)
+            else:
+                logger.warning("Session %s is disconnected, dropping %r", self.name, msg)
+
+    async def stop(self):
+        self.stopping.set()
+        if self.client:
+            await self.client.close()
+
+    def __repr__(self):
+        return "Session '%s' of %s" % (self.name, self.username)
+
+
+class ConnectionManager(object):
+    def __init__(self):
+        self.sessions = OrderedDict()
+        self.tasks = {}
+
+    def add(self, session):
+        if session.name in self.sessions:
+            raise ValueError("There is a session named %s already" % session.name)
+        self.sessions[session.name] = session
+        return session
+
+    def __getitem__(self, name):
+        return self.sessions[name]
+
+    def __len__(self):
+        return len(self.sessions)
+
+    async def start(self):
+        """
+        Starts all sessions not running yet on the current event loop
+        """
+        loop = asyncio.get_event_loop()
+        for name, session in self.sessions.items():
+            if name not in self.tasks:
+                self.tasks[name] = loop.create_task(session.run())
+
+    async def stop(self):
+        for name, task in self.tasks.items():
+            session = self.sessions[name]
+            if session.stopping:
+                await session.stop()
+            else:
+                # not even started running yet
+                task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self.tasks = {}
+
+    def start_in_background(self):
+        """
+        Starts the sessions on the event loop shared with the
+        FIBSClient instances of synchronous code
+        """
+        asyncio.run_coroutine_threadsafe(self.start(), background_loop()).result(LOGIN_TIMEOUT)
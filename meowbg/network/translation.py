@@ -6,8 +6,10 @@ from meowbg.core.match import OnlineMatch, OfflineMatch
 from meowbg.core.events import (IncomingInvitationEvent, MoveEvent, MatchEvent, PlayerStatusEvent, DiceEvent,
                                 RollRequest, AcceptEvent, RejectEvent, MatchEndEvent, AcceptJoinEvent,
                                 ResignOfferEvent, JoinChallengeEvent, OpponentJoinedEvent,
-                                GameEndEvent, IncompleteInvitationEvent, MessageEvent)
-from meowbg.core.player import HumanPlayer, get_or_create_player_proxy
+                                GameEndEvent, IncompleteInvitationEvent, MessageEvent,
+                                PlayerLoginEvent, PlayerLogoutEvent)
+from meowbg.core.player import (HumanPlayer, OnlinePlayerProxy, default_registry,
+                                get_or_create_player_proxy)
 from meowbg.gui.guievents import DoubleAttemptEvent, MoveAttemptEvent
 
 logger = logging.getLogger("EventParser")
@@ -15,6 +17,18 @@ logger.addHandler(logging.FileHandler("parsing.log"))
 logger.addHandler(logging.StreamHandler())
 
 
+# Number of fields of a board line in boardstyle 3
+BOARD_FIELDS = 53
+
+MOVE = re.compile(r"\S+-\S+")
+PLAYER_STATUS_FIELDS = (r"(?P<name>\S+) (?P<opponent>\S+) (?P<watching>\S+) (?P<ready>\S+) "
+                        r"(?P<away>\S+) (?P<rating>\S+) (?P<experience>\S+) (?P<idle>\S+) "
+                        r"(?P<login>\S+) (?P<hostname>\S+) (?P<client>\S+) (?P<email>\S+)")
+PLAYER_STATUS = re.compile("5 " + PLAYER_STATUS_FIELDS)
+# the fields of a status line after the message number
+PLAYER_STATUS_ARGS = re.compile(PLAYER_STATUS_FIELDS)
+
+
 def translate_move_to_indexes(move_str):
     origin, target = move_str.lower().split("-")
     if origin != 'bar':
@@ -53,8 +67,29 @@ class FIBSTranslator(object):
 
     PLAYER_STATUS_EVENT = 5
 
-    def __init__(self):
+    def __init__(self, players=None, dispatcher=None):
+        """
+        players: the meowbg.core.player.PlayerRegistry of the session
+        dispatcher: the meowbg.core.messaging.Dispatcher the parsed
+                    matches broadcast their events with
+        """
         self.current_match = None
+        # the fields of the last board line, split up
+        self.current_fields = None
+        self.pending = ""
+        self.status_dicts = []
+        self.players = players
+        self.dispatcher = dispatcher
+
+    def reset(self):
+        """
+        Forgets the current match and any incomplete line, e.g. when
+        the connection was lost, so that the next board line starts
+        a new match with the players of the new connection
+        """
+        self.current_match = None
+        self.current_fields = None
+        self.pending = ""
 
     def encode_refresh(self):
         return "board"
@@ -83,160 +118,239 @@ class FIBSTranslator(object):
         logger.error("Cannot encode event type %s" % event)
         return ""
 
-    def parse_events(self, text):
-        lines = filter(bool, [str(li.strip(" >")) for li in text.split("\r\n")])
-        found_events = []
-        multiline_buffer = []
+    def feed(self, text):
+        """
+        Parses the complete lines of the given chunk of server output
+        and returns the events found. An incomplete last line is kept
+        until the rest of it arrives with the next chunk.
+        """
+        lines = (self.pending + text).split("\r\n")
+        self.pending = lines.pop()
 
+        found_events = []
         for line in lines:
-            if line.startswith("board:"):
-            #if re.search("board:\S+:\S+:([-\d]+){50}", line):
-                match = self.parse_match(line)
+            self.parse_line(line, found_events)
+        return found_events
+
+    def flush(self):
+        """
+        Parses what is left of the output as a line of its own
+        """
+        found_events = []
+        if self.pending:
+            line, self.pending = self.pending, ""
+            self.parse_line(line, found_events)
+        return found_events
+
+    def parse_events(self, text):
+        """
+        Parses a self-contained piece of server output
+        """
+        return self.feed(text) + self.flush()
+
+    def parse_line(self, line, found_events):
+        line = str(line.strip(" >"))
+        if not line:
+            return
+
+        if line.startswith("board:"):
+            match = self.update_match(line)
+            if match:
                 found_events.append(MatchEvent(match))
-                self.current_match = match
-            elif line.startswith("5 "):
-                multiline_buffer.append(line)
-                continue
-            elif line.startswith("6"):
-                if not multiline_buffer:
-                    logger.info("Orphaned '6'")
-                    continue
-
-                dicts = []
-                for l in multiline_buffer:
-                    dicts.append(self.parse_line_to_args(l, line_type=self.PLAYER_STATUS_EVENT))
-                multiline_buffer = []
-                found_events.append(PlayerStatusEvent(status_dicts=dicts))
-            elif line.startswith("7 "):
-                # Player logs in
-                pass
-            elif line.startswith("8 "):
-                # Player logs out
-                pass
-            elif line.startswith("9 "):
-                # from time message
-                pass
-            elif line.startswith("10 "):
-                # message delivered
-                pass
-            elif line.startswith("11 "):
-                # message saved
-                pass
-            elif line.startswith("12 "):
-                # Says
-                found_events.append(MessageEvent(line.split(" ", 1)[1]))
-            elif line.startswith("13 "):
-                # player shouts
-                found_events.append(MessageEvent(line.split(" ", 1)[1]))
-            elif line.startswith("14 "):
-                # whispers
-                found_events.append(MessageEvent(line.split(" ", 1)[1]))
-            elif line.startswith("15 "):
-                # kibitzes
-                pass
-            elif line.startswith("16 "):
-                # You say
-                found_events.append(MessageEvent("YOU SAY: " + line.split(" ", 1)[1]))
-            elif line.startswith("17 "):
-                # You shout
-                found_events.append(MessageEvent("YOU SHOUT: " + line.split(" ", 1)[1]))
-            elif line.startswith("18 "):
-                # you whisper
-                found_events.append(MessageEvent("You whisper: " + line.split(" ", 1)[1]))
-            elif line.startswith("19 "):
-                # you kibitz
-                pass
-            elif re.search("^\S+ rolls? [1-6] and [1-6]", line):
-                player_name, die1, die2 = re.search("^(\S+) rolls? ([1-6]) and ([1-6])", line).groups()
-                found_events.append(DiceEvent(map(int, [die1, die2])))
-            elif re.search("^[a-zA-Z0-9_]+ moves ", line):
-
-                if not self.current_match:
-                    logger.error("Found a move event without having a match in my hands ...")
-                    return
-
-                # move event
-                pname = re.search("^([a-zA-Z0-9_]+) moves ", line).groups()[0]
-                pcol = self.current_match.get_players_color(pname)
-
-                if not pcol:
-                    logger.error("Player %s does not participate in match %s" % (pname, self.current_match))
-                    return
-
-                moves_raw = line.split("moves ")[1]
-                moves = re.findall("\S+-\S+", moves_raw)
-                for m in moves:
-                    origin, target = translate_move_to_indexes(m)
-                    found_events.append(MoveAttemptEvent(origin, target))
-
-            elif line.find(" wants to play ") != -1:
-                if "unlimited match" in line:
-                    args = re.search("(?P<user>\S+) wants to play an unlimited point match with you", line).groupdict()
-                    found_events.append(IncomingInvitationEvent(player_name=args['user']))
-                else:
-                    args = re.search("(?P<user>\S+) wants to play a (?P<length>\d+) point match with you", line).groupdict()
-                    found_events.append(IncomingInvitationEvent(player_name=args['user'], length=args['length']))
-                logger.warn("Invite event: Got args %s" % args)
-            elif line.find(" wants to resume ") != -1:
-                # user wants to resume a saved match with you.
-                args = re.search("(?P<user>\S+) wants to resume a saved match with you", line).groupdict()
-                found_events.append(IncomingInvitationEvent(player_name=args['user']))
-            elif re.search("\S+ has doubled you. Type 'accept' or 'reject'.", line):
-                if not self.current_match:
-                    continue
-                pname = re.search("(\S+) has doubled you", line).groups()[0]
-                color = self.current_match.get_players_color(pname)
-
-                if not color:
-                    logger.error("Doubling by player %s found, who does not participate in match" % pname)
-
-                found_events.append(DoubleAttemptEvent(color))
-            elif re.search("\S+ doubles. Type 'accept' or 'reject'.", line):
-                if not self.current_match:
-                    continue
-                pname = re.search("(\S+) doubles. Type", line).groups()[0]
-                color = self.current_match.get_players_color(pname)
-
-                if not color:
-                    logger.error("Doubling by player %s found, who does not participate in match" % pname)
-
-                found_events.append(DoubleAttemptEvent(color))
-            elif re.search("There's no saved match with \S+. Please give a match length.", line):
-                pname = re.search("There's no saved match with (\S+). Please give a match length.", line).groups()[0]
-                found_events.append(IncompleteInvitationEvent(pname))
-            elif re.search("(\S+) (accepts and)? wins? (\d+) points", line):
-                if not self.current_match:
-                    continue
-                pname, _, points = re.search("(\S+) (accepts and)? wins? (\d+) points", line).groups()
-
-                if not self.current_match.get_players_color(pname):
-                    logger.info("Dismissing notification about %s" % pname)
-                    continue
-
-                found_events.append(GameEndEvent(pname, points))
-            elif line.find(" has joined you. Your running match was loaded.") != -1:
-                found_events.append(OpponentJoinedEvent())
-            elif line.find("Type 'join' if you want to play the next game") != -1:
-                if self.current_match:
-                    found_events.append(JoinChallengeEvent(self.current_match))
-            elif re.match("\S+ wins? the \d+ point match \d+-\d+", line):
-                winner, score1, score2 = re.search("(\S+) wins? the \d+ point match (\d+)-(\d+)", line).groups()
-                pcol = self.current_match.get_players_color(winner)
-
-                if not pcol:
-                    logger.info("Player %s does not participate in match %s" % (winner, self.current_match))
-                    return
-
-                score = {BLACK: score1, WHITE: score2}
-                found_events.append(MatchEndEvent(winner, score))
-            else:
-                logger.warn("Not parseable: %r" % line)
+            return
 
-        for e in found_events:
-            pass
-            #logger.warn("Found event %s with dict %s" % (e, e.__dict__))
+        number, _, rest = line.partition(" ")
+        if number in self.CLIP_HANDLERS:
+            handler = self.CLIP_HANDLERS[number]
+            if handler:
+                handler(self, rest, found_events)
+            return
 
-        return found_events
+        for pattern, handler in self.TEXT_HANDLERS:
+            match = pattern.match(line)
+            if match:
+                handler(self, match, found_events)
+                return
+
+        logger.warn("Not parseable: %r", line)
+
+    def _on_status(self, rest, found_events):
+        match = PLAYER_STATUS_ARGS.match(rest)
+        if match:
+            self.status_dicts.append(match.groupdict())
+        else:
+            logger.error("Malformed status event: 5 %s", rest)
+            self.status_dicts.append({})
+
+    def _on_status_end(self, rest, found_events):
+        if not self.status_dicts:
+            logger.info("Orphaned '6'")
+            return
+        found_events.append(PlayerStatusEvent(status_dicts=self.status_dicts))
+        self.status_dicts = []
+
+    def _on_login(self, rest, found_events):
+        found_events.append(PlayerLoginEvent(rest.partition(" ")[0]))
+
+    def _on_logout(self, rest, found_events):
+        found_events.append(PlayerLogoutEvent(rest.partition(" ")[0]))
+
+    def _on_message(prefix):
+        def on_message(self, rest, found_events):
+            found_events.append(MessageEvent(prefix + rest))
+        return on_message
+
+    def _on_roll(self, match, found_events):
+        dice = [int(match.group("die1")), int(match.group("die2"))]
+        if self.current_match:
+            # no need to ask the server for the board to learn the dice
+            self.set_dice(self.current_match, dice)
+        found_events.append(DiceEvent(dice))
+
+    def _on_moves(self, match, found_events):
+        if not self.current_match:
+            logger.error("Found a move event without having a match in my hands ...")
+            return
+
+        pname = match.group("user")
+        if not self.current_match.get_players_color(pname):
+            logger.error("Player %s does not participate in match %s", pname, self.current_match)
+            return
+
+        for m in MOVE.findall(match.group("moves")):
+            origin, target = translate_move_to_indexes(m)
+            found_events.append(MoveAttemptEvent(origin, target))
+
+    def _on_invitation(self, match, found_events):
+        args = match.groupdict()
+        if args["length"]:
+            found_events.append(IncomingInvitationEvent(player_name=args['user'],
+                                                        length=args['length']))
+        else:
+            found_events.append(IncomingInvitationEvent(player_name=args['user']))
+        logger.warn("Invite event: Got args %s", args)
+
+    def _on_resume(self, match, found_events):
+        found_events.append(IncomingInvitationEvent(player_name=match.group("user")))
+
+    def _on_double(self, match, found_events):
+        if not self.current_match:
+            return
+        pname = match.group("user")
+        color = self.current_match.get_players_color(pname)
+
+        if not color:
+            logger.error("Doubling by player %s found, who does not participate in match", pname)
+
+        found_events.append(DoubleAttemptEvent(color))
+
+    def _on_incomplete_invitation(self, match, found_events):
+        found_events.append(IncompleteInvitationEvent(match.group("user")))
+
+    def _on_game_end(self, match, found_events):
+        if not self.current_match:
+            return
+        pname, points = match.group("user", "points")
+
+        if not self.current_match.get_players_color(pname):
+            logger.info("Dismissing notification about %s", pname)
+            return
+
+        found_events.append(GameEndEvent(pname, points))
+
+    def _on_opponent_joined(self, match, found_events):
+        found_events.append(OpponentJoinedEvent())
+
+    def _on_join_challenge(self, match, found_events):
+        if self.current_match:
+            found_events.append(JoinChallengeEvent(self.current_match))
+
+    def _on_match_end(self, match, found_events):
+        winner, score1, score2 = match.group("user", "score1", "score2")
+        if not (self.current_match and self.current_match.get_players_color(winner)):
+            logger.info("Player %s does not participate in match %s", winner, self.current_match)
+            return
+
+        score = {BLACK: score1, WHITE: score2}
+        found_events.append(MatchEndEvent(winner, score))
+
+    # Handlers of the lines starting with a CLIP message number, None
+    # for those that are ignored (cf. http://www.fibs.com/fibs_interface.html)
+    CLIP_HANDLERS = {
+        "5": _on_status,
+        "6": _on_status_end,
+        "7": _on_login,
+        "8": _on_logout,
+        "9": None,   # from time message
+        "10": None,  # message delivered
+        "11": None,  # message saved
+        "12": _on_message(""),  # says
+        "13": _on_message(""),  # shouts
+        "14": _on_message(""),  # whispers
+        "15": None,  # kibitzes
+        "16": _on_message("YOU SAY: "),
+        "17": _on_message("YOU SHOUT: "),
+        "18": _on_message("You whisper: "),
+        "19": None,  # you kibitz
+    }
+
+    # Handlers of the other lines, tried in order with the match of
+    # their pattern at the start of the line
+    TEXT_HANDLERS = [
+        (re.compile(r"(?P<user>\S+) rolls? (?P<die1>[1-6]) and (?P<die2>[1-6])"), _on_roll),
+        (re.compile(r"(?P<user>[a-zA-Z0-9_]+) moves (?P<moves>.*)"), _on_moves),
+        (re.compile(r".*?(?P<user>\S+) wants to play "
+                    r"(?:an unlimited|a (?P<length>\d+) point) match with you"), _on_invitation),
+        (re.compile(r".*?(?P<user>\S+) wants to resume a saved match with you"), _on_resume),
+        (re.compile(r".*?(?P<user>\S+) has doubled you. Type 'accept' or 'reject'."), _on_double),
+        (re.compile(r".*?(?P<user>\S+) doubles. Type 'accept' or 'reject'."), _on_double),
+        (re.compile(r".*?There's no saved match with (?P<user>\S+). Please give a match length."),
+         _on_incomplete_invitation),
+        (re.compile(r".*?(?P<user>\S+) (accepts and)? wins? (?P<points>\d+) points"), _on_game_end),
+        (re.compile(r".* has joined you. Your running match was loaded."), _on_opponent_joined),
+        (re.compile(r".*Type 'join' if you want to play the next game"), _on_join_challenge),
+        (re.compile(r"(?P<user>\S+) wins? the \d+ point match (?P<score1>\d+)-(?P<score2>\d+)"),
+         _on_match_end),
+    ]
+
+    del _on_message
+
+    def update_match(self, match_str):
+        """
+        Brings the current match up to date with a board line. The
+        line is compared with the state of the match, which may have
+        changed locally by moves not committed yet. The position and
+        the possible moves are only set again if the position, the
+        dice or the turn differ. A new match is parsed if there is
+        none yet, the players changed or their proxies are gone.
+        """
+        parts = match_str.split(":")
+        if len(parts) != BOARD_FIELDS:
+            logger.error("Illegal board state: %s", match_str)
+            return None
+
+        previous = self.current_fields
+        if (self.current_match and previous and previous[1:3] == parts[1:3]
+                and previous[41] == parts[41] and self._has_live_players(self.current_match)):
+            self._apply_fields(self.current_match, parts)
+        else:
+            self.current_match = self.parse_match(match_str)
+        self.current_fields = parts
+        return self.current_match
+
+    def _has_live_players(self, match):
+        """
+        Whether the proxies of the match are the ones the player
+        registry currently hands out, sending to its connection
+        """
+        registry = self.players or default_registry
+        for player in match.players.values():
+            if isinstance(player, OnlinePlayerProxy):
+                if registry.players.get(player.name) is not player:
+                    return False
+                if registry.connection and player.connection is not registry.connection:
+                    return False
+        return True
 
     def parse_match(self, match_str, online=True):
         """
@@ -245,66 +359,95 @@ class FIBSTranslator(object):
         http://www.fibs.com/fibs_interface.html#board_state
         """
 
-        match = OnlineMatch() if online else OfflineMatch()
-
         parts = match_str.split(":")
-        if len(parts) != 53:
+        if len(parts) != BOARD_FIELDS:
             logger.error("Illegal board state: %s" % match_str)
             return
 
-        your_color, opponents_color = (WHITE, BLACK) if parts[41] == -1 else (BLACK, WHITE)
+        match = OnlineMatch(self.dispatcher) if online else OfflineMatch(self.dispatcher)
+
+        your_color, opponents_color = self._colors(parts)
         # TODO: simplify
         if parts[1].lower() == "you":
             match.register_player(HumanPlayer(parts[1], your_color), your_color)
-            player_proxy = get_or_create_player_proxy(parts[2], opponents_color, self)
+            player_proxy = get_or_create_player_proxy(parts[2], opponents_color, self,
+                                                      self.players)
             match.register_player(player_proxy, opponents_color)
         else:
             logger.error("Kiebitzing not supported yet")
             match.register_player(HumanPlayer(parts[1], your_color), your_color)
             match.register_player(HumanPlayer(parts[2], opponents_color), opponents_color)
 
-        parts[3:] = map(int, parts[3:])
+        self._apply_fields(match, parts)
+        return match
+
+    def _colors(self, parts):
+        return (WHITE, BLACK) if parts[41] == -1 else (BLACK, WHITE)
+
+    def _apply_fields(self, match, parts):
+        """
+        Sets the fields of a board line on the match, the position
+        and the possible moves only where they differ from the match.
+        """
+        fields = [int(p) for p in parts[3:]]
+
+        def field(idx):
+            return fields[idx - 3]
 
-        match.length = parts[3]
-        match.score = {BLACK: parts[4], WHITE: parts[5]}
-        board_str = parts[6:32]
+        match.length = field(3)
+        match.score = {BLACK: field(4), WHITE: field(5)}
+        match.crawford_played = bool(field(51))
 
-        if parts[32] > 0:
-            match.color_to_move_next = BLACK
-        elif parts[32] < 0:
-            match.color_to_move_next = WHITE
+        on_field, on_bar = self.parse_board_str(fields[3:29])
+        position = Board.position_from(on_field, on_bar)
+        position_changed = list(match.board.position[:len(position)]) != position
+        if position_changed:
+            match.board.set_position(position)
+
+        if field(32) > 0:
+            color = BLACK
+        elif field(32) < 0:
+            color = WHITE
         else:
-            match.color_to_move_next = None
+            color = None
+        turn_changed = color != match.color_to_move_next
+        match.color_to_move_next = color
+
+        match.cube = field(37)
+        match.may_double = {BLACK: field(38), WHITE: field(39)}
+        just_doubled = field(40)
+        match.open_cube_challenge_from_color = (
+            self._colors(parts)[1] if just_doubled else None)
 
         # Pick the dice that contain non-zero values
-        whites_dice = parts[33], parts[34]
-        blacks_dice = parts[35], parts[36]
+        whites_dice = field(33), field(34)
+        blacks_dice = field(35), field(36)
         if whites_dice[0]:
-            match.initial_dice = list(whites_dice)
+            dice = list(whites_dice)
         elif blacks_dice[0]:
-            match.initial_dice = list(blacks_dice)
+            dice = list(blacks_dice)
         else:
-            # no dice given, so don't set anything
-            pass
-
-        match.remaining_dice = list(match.initial_dice)
-        if match.initial_dice and match.initial_dice[0] == match.initial_dice[1]:
-            match.initial_dice.extend(match.initial_dice)
-            match.remaining_dice.extend(match.remaining_dice)
-
-        match.cube = parts[37]
-        match.may_double = {BLACK: parts[38], WHITE: parts[39]}
-
-        just_doubled = parts[40]
-        if just_doubled:
-            match.open_cube_challenge_from_color = opponents_color
+            dice = []
+        self.set_dice(match, dice, force=position_changed or turn_changed)
 
-        on_field, on_bar = self.parse_board_str(board_str)
-        match.board = Board(on_field=on_field, on_bar=on_bar)
-        if match.initial_dice:
-            match.board.store_initial_possibilities(match.initial_dice, match.color_to_move_next)
+    def set_dice(self, match, dice, force=False):
+        """
+        Sets the dice of the side to move and computes its possible
+        moves, unless these dice are set already and none of them has
+        been used.
+        """
+        dice = list(dice)
+        if dice and dice[0] == dice[1]:
+            dice.extend(dice)
+        if dice == match.initial_dice == match.remaining_dice and not force:
+            return
 
-        return match
+        match.initial_dice = dice
+        match.remaining_dice = list(dice)
+        if dice and match.color_to_move_next:
+            match.board.store_initial_possibilities(dice, match.color_to_move_next)
+        else:
+            match.board.possible_full_moves_with_initial_dice = []
 
     def parse_board_str(self, input_list):
         """
@@ -330,9 +473,7 @@ class FIBSTranslator(object):
         Universal parsing method, accepting a line and an event type.
         """
         if line_type == self.PLAYER_STATUS_EVENT:
-            match = re.search(("5 (?P<name>\S+) (?P<opponent>\S+) (?P<watching>\S+) (?P<ready>\S+) "
-                               "(?P<away>\S+) (?P<rating>\S+) (?P<experience>\S+) (?P<idle>\S+) (?P<login>\S+) "
-                               "(?P<hostname>\S+) (?P<client>\S+) (?P<email>\S+)"), line)
+            match = PLAYER_STATUS.match(line)
             if match:
                 return match.groupdict()
             else:
@@ -0,0 +1,38 @@
+#!/usr/bin/python
+
+import argparse
+import time
+
+from meowbg.core.board import Board, WHITE, BLACK
+from meowbg.core.rollout import rollout
+
+parser = argparse.ArgumentParser(description="Roll out a backgammon position "
+                                             "on all cores")
+parser.add_argument("-n", "--trials", type=int, default=10000)
+parser.add_argument("-s", "--seed", type=int, default=0)
+parser.add_argument("-p", "--processes", type=int, default=None,
+                    help="number of worker processes (default: one per core)")
+parser.add_argument("--chunk-size", type=int, default=500)
+parser.add_argument("--position", default=None,
+                    help="comma separated signed checker counts for the 24 "
+                         "points and both bars (default: initial position)")
+parser.add_argument("--color", choices=["white", "black"], default="white",
+                    help="color to roll first")
+args = parser.parse_args()
+
+if args.position:
+    position = [int(p) for p in args.position.split(",")]
+else:
+    board = Board()
+    board.setup_initial_position()
+    position = board.position
+
+color = WHITE if args.color == "white" else BLACK
+
+start = time.time()
+result = rollout(position, color, args.trials, seed=args.seed,
+                 processes=args.processes, chunk_size=args.chunk_size)
+elapsed = time.time() - start
+
+print(result)
+print("%.1f games per second" % (result.games / elapsed))
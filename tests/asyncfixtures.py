@@ -0,0 +1,146 @@
+"""
+Fake servers and coroutines for the tests of the asyncio client and
+sessions. They are kept apart from the test modules, which need to be
+importable by Python 2 as well in order to be skipped there.
+"""
+import asyncio
+from meowbg.network.asyncclient import FIBSClient, translating
+from meowbg.network.sessions import ConnectionManager
+from meowbg.network.translation import FIBSTranslator
+
+
+class FakeServer(object):
+    """
+    Asks for the login, records the commands received and sends the
+    given chunks of text afterwards.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.received = []
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def handle(self, reader, writer):
+        writer.write(b"FIBS\r\nlogin: ")
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            self.received.append(line.decode("ascii").rstrip("\r\n"))
+            if line.startswith(b"toggle moreboards"):
+                for chunk in self.chunks:
+                    writer.write(chunk)
+                    await writer.drain()
+                    await asyncio.sleep(0.01)
+
+    async def stop(self):
+        # let the handler see the client leave
+        await asyncio.sleep(0.05)
+        self.server.close()
+        await self.server.wait_closed()
+
+
+class DroppingServer(FakeServer):
+    """
+    Lets every client log in, greets it and hangs up
+    """
+
+    def __init__(self):
+        FakeServer.__init__(self, [])
+        self.logins = []
+
+    async def handle(self, reader, writer):
+        writer.write(b"login: ")
+        await writer.drain()
+        self.logins.append((await reader.readline()).decode("ascii").strip())
+        writer.write(b"12 joe Welcome\r\n")
+        await writer.drain()
+        writer.close()
+
+
+class ScriptedServer(FakeServer):
+    """
+    Lets one client log in and sends it the given lines
+    """
+
+    def __init__(self, lines):
+        FakeServer.__init__(self, [])
+        self.lines = lines
+
+    async def handle(self, reader, writer):
+        writer.write(b"login: ")
+        await writer.drain()
+        await reader.readline()
+        writer.write("".join(line + "\r\n" for line in self.lines).encode("ascii"))
+        await writer.drain()
+        while await reader.readline():
+            pass
+
+
+class FlakyServer(FakeServer):
+    """
+    Sends the given lines to every client logging in. Hangs up on the
+    first one and records the commands of the others.
+    """
+
+    def __init__(self, lines):
+        FakeServer.__init__(self, [])
+        self.lines = lines
+        self.logins = 0
+
+    async def handle(self, reader, writer):
+        writer.write(b"login: ")
+        await writer.drain()
+        await reader.readline()
+        self.logins += 1
+        writer.write("".join(line + "\r\n" for line in self.lines).encode("ascii"))
+        await writer.drain()
+        if self.logins == 1:
+            writer.close()
+            return
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            self.received.append(line.decode("ascii").rstrip("\r\n"))
+
+
+async def exchange(server, on_events, done, command):
+    """
+    Logs a client in to the server, waits until done returns True and
+    sends the command before leaving
+    """
+    address = await server.start()
+    client = FIBSClient(username="joe", password="secret", address=address)
+    await client.open(translating(FIBSTranslator(), on_events))
+    for _ in range(100):
+        if done():
+            break
+        await asyncio.sleep(0.02)
+    client.send(command)
+    await asyncio.sleep(0.1)
+    await client.close()
+    await server.stop()
+
+
+async def run_session(server, make_session, done):
+    """
+    Runs the session make_session returns for the address of the
+    server, until done returns True for it or two seconds have passed
+    """
+    address = await server.start()
+    manager = ConnectionManager()
+    session = manager.add(make_session(address))
+    await manager.start()
+    for _ in range(100):
+        if done(session):
+            break
+        await asyncio.sleep(0.02)
+    await manager.stop()
+    await server.stop()
+    return session
@@ -0,0 +1,64 @@
+import sys
+import threading
+import unittest
+from meowbg.core.events import MessageEvent, PlayerStatusEvent
+
+if sys.version_info >= (3,):
+    # the client is built on asyncio
+    import asyncio
+    from asyncfixtures import FakeServer, exchange
+    from meowbg.network.asyncclient import FIBSClient
+
+
+@unittest.skipIf(sys.version_info < (3,), "asyncio is not available before Python 3")
+class FIBSClientTestCase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_login_and_events(self):
+        # lines split across chunks are put together again
+        server = FakeServer([b"12 joe Hel", b"lo there\r\n5 joe - - 1 0 1500.00 20 1 ",
+                             b"1 localhost client -\r\n6\r\n"])
+        events = []
+
+        def received():
+            return any(isinstance(e, PlayerStatusEvent) for e in events)
+
+        self.loop.run_until_complete(exchange(server, events.extend, received, "who"))
+
+        self.assertEqual(server.received, ["login meowBG 1008 joe secret",
+                                           "set boardstyle 3",
+                                           "toggle moreboards",
+                                           "who"])
+        self.assertEqual([e.__class__ for e in events], [MessageEvent, PlayerStatusEvent])
+        self.assertEqual(events[0].msg, "joe Hello there")
+        self.assertEqual(events[1].status_dicts[0]["name"], "joe")
+
+    def test_connect_on_background_loop(self):
+        server = FakeServer([b"12 joe Hi\r\n"])
+        texts = []
+        received = threading.Event()
+
+        def on_text(text):
+            texts.append(text)
+            received.set()
+
+        address = self.loop.run_until_complete(server.start())
+        serving = threading.Thread(target=self.loop.run_forever)
+        serving.start()
+        try:
+            client = FIBSClient(address=address)
+            client.connect(on_text)
+            self.assertTrue(received.wait(5))
+            client.shutdown()
+            asyncio.run_coroutine_threadsafe(server.stop(), self.loop).result(5)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            serving.join()
+        self.assertEqual(texts, ["12 joe Hi\r\n"])
+
+if __name__ == '__main__':
+    unittest.main()
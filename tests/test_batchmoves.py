@@ -0,0 +1,89 @@
+import random
+import unittest
+from itertools import product
+from meowbg.core.board import Board, BLACK, WHITE, OFF_SLOT
+
+try:
+    import numpy
+    from meowbg.core.batchmoves import (batch_moves, positions_from_boards,
+                                        boards_from_positions, single_die_children,
+                                        unique_children)
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class BatchMovesTestCase(unittest.TestCase):
+    def setUp(self):
+        random.seed(11)
+        self.boards = []
+        for _ in range(20):
+            board = Board()
+            board.setup_initial_position()
+            for _ in range(random.randint(0, 30)):
+                color = random.choice((WHITE, BLACK))
+                moves = board.find_distinct_moves(
+                    [random.randint(1, 6), random.randint(1, 6)], color)
+                for m in random.choice(moves or [[]]):
+                    board.make_partial_move(m)
+                if board.get_winner()[0]:
+                    break
+            board.flush_move_stack()
+            self.boards.append(board)
+
+        # only one die of a 5-3 can be played here, which must be the 5
+        board = Board()
+        board.set_board({12: [BLACK], 4: [WHITE, WHITE], 0: [WHITE]})
+        self.boards.append(board)
+
+    def _expected_children(self, board, dice, color):
+        children = set()
+        for full_move in board.find_distinct_moves(dice, color) or [[]]:
+            for m in full_move:
+                board.make_partial_move(m)
+            children.add(tuple(board.position[:OFF_SLOT[BLACK]]))
+            for _ in full_move:
+                board.undo_partial_move()
+        return children
+
+    def test_conversion(self):
+        for color in (WHITE, BLACK):
+            positions = positions_from_boards(self.boards, color)
+            self.assertEqual(positions.shape, (len(self.boards), 26))
+            converted = boards_from_positions(positions, color)
+            for board, other in zip(self.boards, converted):
+                self.assertEqual(list(board.position), list(other.position))
+
+    def test_matches_board(self):
+        for color, (d1, d2) in product((WHITE, BLACK), product(range(1, 7), repeat=2)):
+            dice = [d1] * 4 if d1 == d2 else [d1, d2]
+            positions = positions_from_boards(self.boards, color)
+            children, parents = batch_moves(positions, dice)
+            absolute = [tuple(b.position[:OFF_SLOT[BLACK]])
+                        for b in boards_from_positions(children, color)]
+
+            for idx, board in enumerate(self.boards):
+                found = [absolute[i] for i in numpy.nonzero(parents == idx)[0]]
+                self.assertEqual(len(found), len(set(found)))
+                self.assertEqual(set(found), self._expected_children(board, dice, color))
+
+    def test_doubles_frontier(self):
+        board = Board()
+        board.setup_initial_position()
+        distinct = len(board.find_distinct_moves([2] * 4, WHITE))
+        positions = positions_from_boards([board] * 200, WHITE)
+
+        # the orders of the checkers must not multiply the rows
+        frontier, roots = positions, numpy.arange(len(positions))
+        for _ in range(4):
+            children, parents = single_die_children(frontier, 2)
+            frontier, roots = unique_children(children, roots[parents])
+            self.assertTrue(len(frontier) <= 200 * distinct)
+        self.assertEqual(len(frontier), 200 * distinct)
+
+        children, parents = batch_moves(positions, [2] * 4)
+        self.assertEqual(len(children), 200 * distinct)
+        self.assertEqual(list(numpy.bincount(parents)), [distinct] * 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+from itertools import product
+from meowbg.core.bearoff import (BearoffDatabase, generate, position_index,
+                                 num_positions, home_counts,
+                                 get_database, reload_database)
+from meowbg.core.board import Board, BLACK, WHITE
+
+
+class BearoffTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        path = os.path.join(cls.directory, "bearoff.db")
+        generate(path, max_checkers=4)
+        cls.database = BearoffDatabase(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.database.close()
+        shutil.rmtree(cls.directory)
+
+    def test_get_database(self):
+        path = os.path.join(self.directory, "later.db")
+        self.assertEqual(get_database(path), None)
+
+        # the missing database is not looked for again until reloaded
+        shutil.copy(os.path.join(self.directory, "bearoff.db"), path)
+        self.assertEqual(get_database(path), None)
+        reload_database(path)
+        database = get_database(path)
+        self.assertTrue(isinstance(database, BearoffDatabase))
+        self.assertTrue(get_database(path) is database)
+        database.close()
+        reload_database(path)
+
+    def test_position_index(self):
+        indexes = [position_index(counts) for counts in product(range(6), repeat=6)
+                   if sum(counts) <= 5]
+        self.assertEqual(sorted(indexes), list(range(num_positions(5))))
+        self.assertEqual(num_positions(15), 54264)
+
+    def test_lookup(self):
+        self.assertEqual(self.database.mean_rolls((0, 0, 0, 0, 0, 0)), 0)
+        self.assertEqual(self.database.mean_rolls((2, 0, 0, 0, 0, 0)), 1)
+        self.assertEqual(self.database.distribution((1, 0, 0, 0, 0, 0))[1], 1)
+
+        # One checker on the six point needs a second roll after 1-1,
+        # 1-2, 1-3, 1-4 and 2-3
+        distribution = self.database.distribution((0, 0, 0, 0, 0, 1))
+        self.assertAlmostEqual(distribution[1], 27 / 36.0, 4)
+        self.assertAlmostEqual(distribution[2], 9 / 36.0, 4)
+
+        for counts in [(0, 0, 0, 0, 0, 4), (1, 1, 1, 1, 0, 0), (0, 2, 0, 1, 0, 1)]:
+            distribution = self.database.distribution(counts)
+            self.assertAlmostEqual(sum(distribution), 1, 3)
+            self.assertAlmostEqual(sum(n * p for n, p in enumerate(distribution)),
+                                   self.database.mean_rolls(counts), 3)
+
+        self.assertFalse(self.database.covers((5, 0, 0, 0, 0, 0)))
+        self.assertRaises(KeyError, self.database.mean_rolls, (5, 0, 0, 0, 0, 0))
+
+    def test_win_probability(self):
+        self.assertEqual(self.database.win_probability((1, 0, 0, 0, 0, 0),
+                                                       (0, 0, 0, 0, 0, 4)), 1)
+        self.assertAlmostEqual(self.database.win_probability((0, 0, 0, 0, 0, 1),
+                                                             (1, 0, 0, 0, 0, 0)),
+                               27 / 36.0, 4)
+
+    def test_home_counts(self):
+        board = Board()
+        board.set_board({0: [BLACK], 1: [BLACK], 22: [WHITE, WHITE]})
+        self.assertEqual(home_counts(board, BLACK), (1, 1, 0, 0, 0, 0))
+        self.assertEqual(home_counts(board, WHITE), (0, 2, 0, 0, 0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,11 @@
 
 import unittest
 from itertools import product
-from meowbg.core.board import Board, BLACK, WHITE
+from meowbg.core.board import Board, BLACK, WHITE, BAR_SLOT, OFF_SLOT
 from meowbg.core.exceptions import MoveNotPossible
 from meowbg.core.move import PartialMove
+from meowbg.core.movecache import LRUCache
+from meowbg.core.movetrie import MoveTrie
 from collections import defaultdict
 
 
@@ -16,7 +18,7 @@ class BoardTestCase(unittest.TestCase):
 
         try:
             self.board.check_board_state()
-        except ValueError, msg:
+        except ValueError as msg:
             assert False, "Board should be ok initially, got: %s" % msg
 
         # Take away a checker from the white ones
@@ -41,7 +43,7 @@ class BoardTestCase(unittest.TestCase):
         self.board.checkers_on_field[0].pop()
         try:
             self.board.check_board_state()
-        except ValueError, msg:
+        except ValueError as msg:
             assert False, "Board should be ok again, got: %s" % msg
 
         # Mix stones
@@ -249,6 +251,212 @@ class BoardTestCase(unittest.TestCase):
         self.board.store_initial_possibilities([5, 6], WHITE)
         self.assertEqual([[PartialMove(20, 24)]], self.board.possible_full_moves_with_initial_dice)
 
+    def test_compact_position(self):
+        self.board.setup_initial_position()
+        self.assertEqual(self.board.position[0], -2)
+        self.assertEqual(self.board.position[5], 5)
+        self.assertEqual(self.board.position[OFF_SLOT[WHITE]], 0)
+
+        # Changes through the list views end up in the position array
+        self.board.checkers_on_field[0].pop()
+        self.board.checkers_on_bar.append(WHITE)
+        self.assertEqual(self.board.position[0], -1)
+        self.assertEqual(self.board.position[BAR_SLOT[WHITE]], -1)
+        self.assertEqual(self.board.checkers_on_bar, [WHITE])
+
+        self.board.make_partial_move(PartialMove(5, 0))
+        self.assertEqual(self.board.checkers_on_field[0], [BLACK])
+        self.assertEqual(self.board.checkers_on_bar.count(WHITE), 2)
+
+    def test_from_position(self):
+        position = [0] * 26
+        position[3] = 2
+        position[20] = -1
+        position[BAR_SLOT[WHITE]] = -1
+        board = Board.from_position(position)
+
+        self.assertEqual(len(board.borne_off), 13 + 13)
+        self.assertEqual(board.checkers_on_field[3], [BLACK, BLACK])
+        self.assertEqual(board.checkers_on_bar, [WHITE])
+        board.check_board_state()
+
+    def test_summaries(self):
+        self.board.setup_initial_position()
+        self.assertEqual(self.board.outside_home, {BLACK: 10, WHITE: 10})
+        self.assertEqual(self.board.highest_point(BLACK), 23)
+        self.assertEqual(self.board.highest_point(WHITE), 23)
+
+        # A checker entering the home no longer counts as outside
+        self.board.make_partial_move(PartialMove(7, 3))
+        self.assertEqual(self.board.outside_home[BLACK], 9)
+        self.assertTrue(self.board.occupied[BLACK] & 1 << 3)
+        self.board.undo_partial_move()
+        self.assertEqual(self.board.outside_home[BLACK], 10)
+        self.assertFalse(self.board.occupied[BLACK] & 1 << 3)
+
+        # A hit checker on the bar counts as outside, too
+        self.board.checkers_on_field.update({20: [BLACK]})
+        self.board.make_partial_move(PartialMove(16, 20))
+        self.assertEqual(self.board.outside_home[BLACK], 11)
+        self.assertFalse(self.board.occupied[BLACK] & 1 << 20)
+        self.assertTrue(self.board.occupied[WHITE] & 1 << (23 - 20))
+        self.board.undo_partial_move()
+        self.assertEqual(self.board.outside_home[BLACK], 11)
+        self.assertTrue(self.board.occupied[BLACK] & 1 << 20)
+        self.board.checkers_on_field[20] = []
+
+        # The summaries kept up to date match the ones computed from scratch
+        for dice in product(range(1, 7), repeat=2):
+            for full_move in self.board.find_possible_moves(list(dice), WHITE):
+                for m in full_move:
+                    self.board.make_partial_move(m)
+                fresh = Board.from_position(self.board.position)
+                self.assertEqual(self.board.occupied, fresh.occupied)
+                self.assertEqual(self.board.outside_home, fresh.outside_home)
+                self.assertEqual(self.board.pips, fresh.pips)
+                for _ in full_move:
+                    self.board.undo_partial_move()
+
+    def test_pip_count_and_contact(self):
+        self.board.setup_initial_position()
+        self.assertEqual(self.board.pip_count(BLACK), 167)
+        self.assertEqual(self.board.pip_count(WHITE), 167)
+        self.assertTrue(self.board.has_contact())
+
+        self.board.make_partial_move(PartialMove(23, 17))
+        self.assertEqual(self.board.pip_count(BLACK), 161)
+        self.board.undo_partial_move()
+        self.assertEqual(self.board.pip_count(BLACK), 167)
+
+        # Checkers on the bar count 25 pips
+        self.board.set_board({3: [BLACK], 4: [WHITE], 20: [WHITE]}, [BLACK])
+        self.assertEqual(self.board.pip_count(BLACK), 29)
+        self.assertEqual(self.board.pip_count(WHITE), 24)
+        self.assertTrue(self.board.has_contact())
+
+        self.board.set_board({3: [BLACK], 4: [WHITE], 20: [WHITE]})
+        self.assertFalse(self.board.has_contact())
+        self.board.set_board({5: [BLACK], 4: [WHITE]})
+        self.assertTrue(self.board.has_contact())
+        self.board.set_board({5: [BLACK]}, [WHITE])
+        self.assertTrue(self.board.has_contact())
+        self.board.set_board({5: [BLACK]})
+        self.assertFalse(self.board.has_contact())
+
+    def _resulting_position(self, full_move):
+        for m in full_move:
+            self.board.make_partial_move(m)
+        position = tuple(self.board.position)
+        for _ in full_move:
+            self.board.undo_partial_move()
+        return position
+
+    def test_find_distinct_moves(self):
+        self.board.setup_initial_position()
+        self.board.checkers_on_field.update({21: [BLACK], 2: [WHITE]})
+
+        for dice in product(range(1, 7), repeat=2):
+            dice = [dice[0]] * 4 if dice[0] == dice[1] else list(dice)
+            for color in (WHITE, BLACK):
+                all_moves = self.board.find_possible_moves(dice, color)
+                distinct = self.board.find_possible_moves(dice, color, distinct=True)
+
+                positions = [self._resulting_position(m) for m in distinct]
+                self.assertEqual(len(positions), len(set(positions)))
+                self.assertEqual(set(positions),
+                                 set(self._resulting_position(m) for m in all_moves))
+                self.assertEqual(set(map(len, distinct)), set(map(len, all_moves)))
+
+        # The short move finishing the game must not get lost. Both
+        # moves lead to the same position, so only one of them is kept.
+        self.board.set_board({18: [WHITE]})
+        distinct = self.board.find_possible_moves([6, 1], WHITE, distinct=True)
+        self.assertEqual(len(distinct), 1)
+        self.assertEqual(distinct[0][-1].target, 24)
+
+    def test_higher_die_rule(self):
+        # either die can be played, but not both, so the 5 must be played
+        self.board.set_board({12: [BLACK], 4: [WHITE, WHITE], 0: [WHITE]})
+        for distinct in (False, True):
+            moves = self.board.find_possible_moves([5, 3], BLACK, distinct=distinct)
+            self.assertEqual(moves, [[PartialMove(12, 7)]])
+
+    def test_position_key(self):
+        self.board.setup_initial_position()
+        initial_key = self.board.position_key()
+        self.assertEqual(initial_key, Board.from_position(self.board.position).position_key())
+        self.assertNotEqual(self.board.position_key(WHITE), self.board.position_key(BLACK))
+
+        self.board.checkers_on_field.update({4: [WHITE]})
+        for move in (PartialMove(5, 4), PartialMove(4, 1), PartialMove(-1, 3)):
+            expected = self.board.position_key_after(move, WHITE)
+            self.board.make_partial_move(move)
+            self.assertEqual(self.board.position_key(WHITE), expected)
+            self.assertEqual(self.board.position_key(),
+                             Board.from_position(self.board.position).position_key())
+
+        for _ in range(3):
+            self.board.undo_partial_move()
+        self.board.checkers_on_field[4] = []
+        self.assertEqual(self.board.position_key(), initial_key)
+
+    def test_move_cache(self):
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        # "b" was the least recently used entry
+        self.assertEqual(cache.get("b"), None)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+        self.board.setup_initial_position()
+        self.board.move_cache.clear()
+        first = self.board.find_possible_moves([3, 1], WHITE)
+        second = self.board.find_possible_moves([1, 3], WHITE)
+        self.assertEqual(first, second)
+        self.assertEqual(self.board.move_cache.stats()["hits"], 1)
+
+        # Other positions, dice or colors are separate entries
+        self.board.find_possible_moves([3, 1], BLACK)
+        self.board.make_partial_move(PartialMove(0, 1))
+        self.board.find_possible_moves([3, 1], WHITE)
+        self.assertEqual(self.board.move_cache.stats()["misses"], 3)
+
+        # changing the moves returned leaves the cached ones alone
+        self.board.undo_partial_move()
+        expected = [list(m) for m in second]
+        second[0].append(PartialMove(0, 1))
+        second.pop()
+        self.assertEqual(self.board.find_possible_moves([3, 1], WHITE), expected)
+
+    def test_move_trie(self):
+        trie = MoveTrie([[PartialMove(10, 5), PartialMove(5, 4)],
+                         [PartialMove(10, 5), PartialMove(10, 9)],
+                         [PartialMove(10, 4)]])
+        self.assertTrue([PartialMove(10, 4)] in trie)
+        self.assertFalse([PartialMove(10, 5)] in trie)
+        self.assertEqual(trie.node_for([PartialMove(10, 9)]), None)
+        self.assertEqual(set(trie.node_for([PartialMove(10, 5)]).continuations()),
+                         set([(PartialMove(5, 4),), (PartialMove(10, 9),)]))
+
+        self.board.checkers_on_field.update({10: [BLACK, BLACK], 20: [WHITE]})
+        self.board.store_initial_possibilities([5, 6], BLACK)
+        self.assertFalse(self.board.early_commit_possible())
+        self.assertTrue(self.board.is_legal_partial_move(PartialMove(10, 5)))
+        self.assertFalse(self.board.is_legal_partial_move(PartialMove(10, 3)))
+
+        self.board.make_partial_move(PartialMove(10, 5))
+        self.assertEqual(self.board.next_partial_moves(), [PartialMove(10, 4)])
+        self.assertEqual(self.board.get_remaining_possible_moves(),
+                         set([(PartialMove(10, 4),)]))
+        self.assertFalse(self.board.is_legal_partial_move(PartialMove(5, 0)))
+
+        self.board.make_partial_move(PartialMove(10, 4))
+        self.assertTrue(self.board.early_commit_possible())
+        self.assertEqual(self.board.get_remaining_possible_moves(), set())
+
     def test_digest_move(self):
         self.board.checkers_on_field.update({10: [BLACK, BLACK]})
         m = PartialMove(10, 4)
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import unittest
+from meowbg.core.board import WHITE, BLACK
+from meowbg.core.match import Match
+
+try:
+    import numpy
+    from meowbg.core.cube import MatchEquityTable, generate, analyze, analyze_match
+except ImportError:
+    numpy = None
+
+
+NO_GAMMONS = (0.0, 0.0, 0.0, 0.0)
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class CubeTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        path = os.path.join(cls.directory, "met.npy")
+        MatchEquityTable(generate(max_away=11)).save(path)
+        cls.table = MatchEquityTable.load(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def test_save(self):
+        # written next to its path and renamed, leaving nothing else
+        directory = os.path.join(self.directory, "data")
+        path = os.path.join(directory, "met.npy")
+        MatchEquityTable(generate(max_away=3)).save(path)
+        self.assertEqual(os.listdir(directory), ["met.npy"])
+        self.assertEqual(MatchEquityTable.load(path).max_away, 3)
+
+    def test_table(self):
+        self.assertEqual(self.table.table.dtype, numpy.float32)
+        self.assertFalse(self.table.table.flags.writeable)
+
+        self.assertEqual(self.table.equity(0, 3), 1)
+        self.assertEqual(self.table.equity(3, 0), 0)
+        self.assertEqual(self.table.equity(1, 1), 0.5)
+        self.assertEqual(self.table.equity(7, 7), 0.5)
+        for a in range(1, 12):
+            for b in range(1, 12):
+                self.assertAlmostEqual(self.table.equity(a, b) + self.table.equity(b, a), 1, 5)
+                if b > 1:
+                    self.assertTrue(self.table.equity(a, b) > self.table.equity(a, b - 1))
+
+        # Crawford game at 1-away 2-away: the trailer needs any win
+        # of the Crawford game and the following double match point,
+        # or a gammon
+        self.assertAlmostEqual(self.table.equity(2, 1), 0.375 * 0.5 + 0.125, 5)
+        # post-Crawford the trailer at 2-away doubles at once
+        self.assertAlmostEqual(self.table.equity(2, 1, post_crawford=True), 0.5, 5)
+        # beyond the table
+        self.assertEqual(self.table.equity(30, 11), self.table.equity(11, 11))
+
+    def test_money(self):
+        no_double = analyze((0.6,) + NO_GAMMONS, 0, 0)
+        self.assertFalse(no_double.should_double)
+        self.assertTrue(no_double.should_take)
+        self.assertEqual(no_double.take_point, 0.25)
+
+        double_take = analyze((0.7,) + NO_GAMMONS, 0, 0)
+        self.assertAlmostEqual(double_take.double_take, 0.8)
+        self.assertTrue(double_take.should_double)
+        self.assertTrue(double_take.should_take)
+
+        double_pass = analyze((0.8,) + NO_GAMMONS, 0, 0)
+        self.assertTrue(double_pass.should_double)
+        self.assertFalse(double_pass.should_take)
+
+        # too good: the gammons are worth more than the cube
+        too_good = analyze((0.9, 0.6, 0.0, 0.0, 0.0), 0, 0)
+        self.assertTrue(too_good.no_double > too_good.double_pass)
+        self.assertFalse(too_good.should_double)
+
+    def test_match(self):
+        # at 2-away 2-away the cube takes the match
+        decision = analyze((0.65,) + NO_GAMMONS, 2, 2, table=self.table)
+        self.assertAlmostEqual(decision.double_take, 0.65, 5)
+        self.assertAlmostEqual(decision.double_pass, self.table.equity(1, 2), 5)
+        self.assertAlmostEqual(decision.take_point, 1 - self.table.equity(1, 2), 5)
+        self.assertTrue(decision.should_double)
+        self.assertTrue(decision.should_take)
+
+        crawford = analyze((0.7,) + NO_GAMMONS, 2, 1, crawford=True, table=self.table)
+        self.assertFalse(crawford.should_double)
+
+    def test_match_state(self):
+        probabilities = (0.5, 0.1, 0.0, 0.1, 0.0)
+        match = Match()
+        match.length = 5
+        match.score = {WHITE: 4, BLACK: 2}
+        self.assertFalse(analyze_match(match, BLACK, probabilities, self.table).should_double)
+
+        # after the Crawford game the leader has nothing to lose by taking
+        match.crawford_played = True
+        decision = analyze_match(match, BLACK, probabilities, self.table)
+        self.assertEqual(decision, analyze(probabilities, 3, 1, post_crawford=True,
+                                           table=self.table))
+        self.assertEqual(decision.take_point, 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
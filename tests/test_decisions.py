@@ -0,0 +1,126 @@
+import gc
+import threading
+import time
+import unittest
+from meowbg.core.board import Board, BLACK
+from meowbg.core.bot import search_move
+from meowbg.core.decisions import DecisionExecutor
+
+
+def deliver_now(func, *args):
+    func(*args)
+
+
+def square(x):
+    return x * x
+
+
+class Owner(object):
+    pass
+
+
+class DecisionExecutorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.results = []
+        self.delivered = threading.Event()
+
+    def on_result(self, result):
+        self.results.append(result)
+        self.delivered.set()
+
+    def on_error(self, error):
+        self.results.append("failed")
+        self.delivered.set()
+
+    def test_thread_pool(self):
+        executor = DecisionExecutor(deliver=deliver_now)
+        executor.submit(self, square, (3,), self.on_result)
+        self.delivered.wait(5)
+        executor.shutdown()
+        self.assertEqual(self.results, [9])
+
+    def test_stale_requests_are_dropped(self):
+        executor = DecisionExecutor(deliver=deliver_now)
+        started, proceed = threading.Event(), threading.Event()
+
+        def slow(x):
+            started.set()
+            proceed.wait(5)
+            return x
+
+        executor.submit(self, slow, (1,), self.on_result)
+        started.wait(5)
+        # queued behind the running one and made stale by the next
+        executor.submit(self, slow, (2,), self.on_result)
+        executor.submit(self, slow, (3,), self.on_result)
+        proceed.set()
+        self.delivered.wait(5)
+        executor.shutdown()
+        self.assertEqual(self.results, [3])
+
+    def test_cancel(self):
+        executor = DecisionExecutor(deliver=deliver_now)
+        proceed = threading.Event()
+
+        def slow(x):
+            proceed.wait(5)
+            return x
+
+        request = executor.submit(self, slow, (1,), self.on_result)
+        executor.cancel(self)
+        self.assertFalse(request.is_current())
+        proceed.set()
+        executor.shutdown()
+        self.assertEqual(self.results, [])
+
+    def test_failing_decision(self):
+        executor = DecisionExecutor(deliver=deliver_now)
+        executor.submit(self, square, (None,), self.on_result)
+        executor.submit(Owner(), square, (2,), self.on_result)
+        self.delivered.wait(5)
+        self.assertEqual(self.results, [4])
+
+        self.delivered.clear()
+        executor.submit(self, square, (None,), self.on_result, self.on_error)
+        self.delivered.wait(5)
+        executor.shutdown()
+        self.assertEqual(self.results, [4, "failed"])
+
+    def test_owners_are_not_kept_alive(self):
+        executor = DecisionExecutor(deliver=deliver_now)
+        owner = Owner()
+        executor.submit(owner, square, (3,), self.on_result)
+        self.delivered.wait(5)
+        self.assertEqual(len(executor.generations), 1)
+
+        # the worker may still be returning from the task
+        del owner
+        for _ in range(100):
+            gc.collect()
+            if not len(executor.generations):
+                break
+            time.sleep(0.01)
+        self.assertEqual(len(executor.generations), 0)
+        executor.shutdown()
+
+    def test_failing_process_decision(self):
+        executor = DecisionExecutor(processes=True, deliver=deliver_now)
+        executor.submit(self, square, (None,), self.on_result, self.on_error)
+        self.delivered.wait(30)
+        executor.shutdown()
+        self.assertEqual(self.results, ["failed"])
+
+    def test_process_pool(self):
+        executor = DecisionExecutor(processes=True, deliver=deliver_now)
+        board = Board()
+        board.setup_initial_position()
+        moves = board.find_possible_moves([6, 5], BLACK)
+        executor.submit(self, search_move,
+                        (list(board.position), BLACK, moves, 60, 1), self.on_result)
+        self.delivered.wait(60)
+        executor.shutdown()
+        self.assertEqual(len(self.results), 1)
+        self.assertTrue(self.results[0] in moves)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from meowbg.core.board import Board, BLACK, WHITE
+from meowbg.core.dice import Dice
+from meowbg.core.selfplay import SelfPlayEngine
+
+try:
+    import numpy
+    from meowbg.core.evaluation import (NeuralNet, encode_board, evaluate_moves,
+                                        best_move, equity, outcome, train,
+                                        get_network, reload_network, TDPolicy,
+                                        NUM_INPUTS, NUM_OUTPUTS)
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class EvaluationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.board = Board()
+        self.board.setup_initial_position()
+        self.net = NeuralNet.random(hidden=10, seed=1)
+
+    def test_encoding(self):
+        inputs = encode_board(self.board, BLACK)
+        self.assertEqual(inputs.shape, (1, NUM_INPUTS))
+        # Initial position looks the same for both sides
+        self.assertTrue((inputs == encode_board(self.board, WHITE)).all())
+        # 2, 3 and twice 5 checkers: 2 + 3 + 2 * (3 + (5 - 3) / 2)
+        self.assertEqual(inputs[0, :96].sum(), 13)
+        self.assertEqual(inputs[0, 192:196].tolist(), [0, 0, 0, 0])
+        self.assertEqual(inputs[0, 196:].tolist(), [0, 1])
+
+        self.board.set_board({3: [BLACK]}, [WHITE])
+        inputs = encode_board(self.board, BLACK, on_roll=True)
+        self.assertTrue(numpy.allclose(inputs[0, 192:], [0, 0.5, 14 / 15.0, 14 / 15.0, 1, 0]))
+
+    def test_evaluate_moves(self):
+        moves = self.board.find_possible_moves([6, 5], BLACK, distinct=True)
+        outputs = evaluate_moves(self.net, self.board, BLACK, moves)
+        self.assertEqual(outputs.shape, (len(moves), NUM_OUTPUTS))
+        self.assertTrue(((outputs > 0) & (outputs < 1)).all())
+        self.assertTrue(best_move(self.net, self.board, BLACK, moves) in moves)
+        self.assertEqual(self.board.move_stack, [])
+
+        self.assertEqual(equity(outcome(True, 2)), 2)
+        self.assertEqual(equity(outcome(False, 3)), -3)
+
+    def test_save(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "weights.npz")
+            self.net.save(path)
+            loaded = NeuralNet.load(path)
+            for a, b in zip(self.net.parameters(), loaded.parameters()):
+                self.assertTrue((a == b).all())
+        finally:
+            shutil.rmtree(directory)
+
+    def test_get_network(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "weights.npz")
+            self.assertEqual(get_network(path), None)
+
+            # the missing weights are not looked for again until reloaded
+            self.net.save(os.path.join(directory, "other.npz"))
+            shutil.copy(os.path.join(directory, "other.npz"), path)
+            self.assertEqual(get_network(path), None)
+            reload_network(path)
+            net = get_network(path)
+            self.assertTrue(isinstance(net, NeuralNet))
+            self.assertTrue(get_network(path) is net)
+
+            # saving weights replaces the network loaded before
+            self.net.save(path)
+            self.assertFalse(get_network(path) is net)
+            reload_network(path)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_train(self):
+        before = [p.copy() for p in self.net.parameters()]
+        train(self.net, 1, seed=3, max_moves=50)
+        self.assertTrue(any((a != b).any()
+                            for a, b in zip(before, self.net.parameters())))
+
+        # a short race is played to the end and learned from its outcome
+        policy = TDPolicy(self.net)
+        engine = SelfPlayEngine({WHITE: policy, BLACK: policy}, Dice(random.Random(4)))
+        self.board.set_board({5: [BLACK] * 3, 18: [WHITE] * 3})
+        winner, points = engine.play_game(position=list(self.board.position), color=BLACK)
+        self.assertTrue(2 <= policy.moves_played <= 6)
+        before = [p.copy() for p in self.net.parameters()]
+        policy.finish(winner, points)
+        self.assertTrue(any((a != b).any()
+                            for a, b in zip(before, self.net.parameters())))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from meowbg.core.eventqueue import SynchronizedTaskQueue
+
+
+class FakeFrames(object):
+    """
+    Collects the scheduled callbacks until the next frame is run
+    """
+
+    def __init__(self):
+        self.callbacks = []
+
+    def __call__(self, callback):
+        self.callbacks.append(callback)
+
+    def run(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+class SynchronizedTaskQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.frames = FakeFrames()
+        self.queue = SynchronizedTaskQueue(schedule=self.frames)
+        self.calls = []
+
+    def immediate(self, e, on_finish):
+        self.calls.append(e)
+        on_finish()
+
+    def test_tasks_run_in_one_frame(self):
+        handler = self.queue.synced_call(self.immediate)
+        for i in range(4):
+            handler(i)
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.queue.depth, 4)
+
+        self.frames.run()
+        self.assertEqual(self.calls, [0, 1, 2, 3])
+        self.assertEqual(self.frames.callbacks, [])
+        self.assertEqual(self.queue.metrics.executed, 4)
+        self.assertEqual(self.queue.metrics.max_depth, 4)
+
+    def test_blocked_until_finished(self):
+        finish = []
+
+        def animated(e, on_finish):
+            self.calls.append(e)
+            finish.append(on_finish)
+
+        self.queue.synced_call(animated)("move")
+        self.queue.synced_call(self.immediate)("roll")
+        self.frames.run()
+        self.assertEqual(self.calls, ["move"])
+
+        # the successor follows as soon as the animation is done
+        finish.pop()()
+        self.assertEqual(self.calls, ["move", "roll"])
+
+    def test_coalescing(self):
+        sync = self.queue.synced_call(self.immediate, coalesce=True)
+        other = self.queue.synced_call(self.immediate)
+        sync("first state")
+        sync("second state")
+        other("move")
+        sync("third state")
+        self.frames.run()
+        self.assertEqual(self.calls, ["second state", "move", "third state"])
+        self.assertEqual(self.queue.metrics.coalesced, 1)
+
+    def test_post(self):
+        self.queue.post(self.calls.append, "result")
+        self.frames.run()
+        self.assertEqual(self.calls, [])
+        self.frames.run()
+        self.assertEqual(self.calls, ["result"])
+
+if __name__ == '__main__':
+    unittest.main()
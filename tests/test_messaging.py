@@ -0,0 +1,77 @@
+import gc
+import unittest
+from meowbg.core.messaging import Dispatcher
+from meowbg.gui.guievents import Attempt, CommitAttemptEvent, RollAttemptEvent
+
+
+class Subscriber(object):
+    def __init__(self):
+        self.received = []
+
+    def receive(self, event):
+        self.received.append(event)
+
+
+class DispatcherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dispatcher = Dispatcher()
+
+    def test_event_class_hierarchy(self):
+        attempts, commits = Subscriber(), Subscriber()
+        self.dispatcher.register(attempts.receive, Attempt)
+        self.dispatcher.register(commits.receive, CommitAttemptEvent)
+
+        commit, roll = CommitAttemptEvent(), RollAttemptEvent()
+        self.dispatcher.broadcast(commit)
+        self.dispatcher.broadcast(roll)
+        self.assertEqual(attempts.received, [commit, roll])
+        self.assertEqual(commits.received, [commit])
+
+    def test_unregister(self):
+        subscriber = Subscriber()
+        self.dispatcher.register(subscriber.receive, RollAttemptEvent)
+        self.dispatcher.broadcast(RollAttemptEvent())
+        self.dispatcher.unregister(subscriber.receive, RollAttemptEvent)
+        self.dispatcher.broadcast(RollAttemptEvent())
+        self.assertEqual(len(subscriber.received), 1)
+
+        # unknown subscribers are ignored
+        self.dispatcher.unregister(subscriber.receive, Attempt)
+
+    def test_registration_order(self):
+        calls = []
+        for i in range(3):
+            self.dispatcher.register(lambda e, i=i: calls.append(i), RollAttemptEvent)
+        self.dispatcher.broadcast(RollAttemptEvent())
+        self.assertEqual(calls, [0, 1, 2])
+
+    def test_weak_references(self):
+        subscriber = Subscriber()
+        self.dispatcher.register(subscriber.receive, RollAttemptEvent)
+        self.dispatcher.broadcast(RollAttemptEvent())
+        self.assertEqual(len(subscriber.received), 1)
+
+        del subscriber
+        gc.collect()
+        self.assertEqual(self.dispatcher.subscriptions, {})
+        self.dispatcher.broadcast(RollAttemptEvent())
+
+    def test_functions_are_kept(self):
+        received = []
+
+        def make_callback():
+            return lambda e: received.append(e)
+
+        self.dispatcher.register(make_callback(), RollAttemptEvent)
+        gc.collect()
+        self.dispatcher.broadcast(RollAttemptEvent())
+        self.assertEqual(len(received), 1)
+
+    def test_separate_dispatchers(self):
+        subscriber = Subscriber()
+        self.dispatcher.register(subscriber.receive, RollAttemptEvent)
+        Dispatcher().broadcast(RollAttemptEvent())
+        self.assertEqual(subscriber.received, [])
+
+if __name__ == '__main__':
+    unittest.main()
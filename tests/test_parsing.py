@@ -3,7 +3,10 @@ import unittest
 from meowbg.network.translation import FIBSTranslator, translate_move_to_indexes, translate_indexes_to_move
 from meowbg.core.match import Match
 from meowbg.core.board import BLACK, WHITE
-from meowbg.core.player import HumanPlayer
+from meowbg.core.player import HumanPlayer, PlayerRegistry
+from meowbg.core.events import (MessageEvent, DiceEvent, IncomingInvitationEvent,
+                                MatchEndEvent, PlayerStatusEvent, MatchEvent, PlayerLoginEvent)
+from meowbg.gui.guievents import MoveAttemptEvent
 
 TESTLINE_STATUS_1 = ("5 someplayer evil_guy - 0 0 1418.61 23 1914 1041272421 192.168.40.3 "
                      "meowBG someplayer@somewhere.com")
@@ -15,6 +18,19 @@ TESTLINE_STATUS_3 = ("5 michael_romeo russell_allen - 0 0 1418.61 23 1914 104127
 TESTLINE_MOVE_1 = "opponent moves 12-3 4-off 3-off"
 TESTLINE_MOVE_2 = "opponent moves bar-23"
 
+TESTLINE_BOARD = ("board:You:opponent:3:0:0:0:-2:0:0:0:0:5:0:3:0:0:0:-5:5:0:0:0:-3:0:-5:0:0:0:0:"
+                  "2:0:1:0:0:0:0:1:1:1:0:1:-1:0:25:0:0:0:0:0:0:0:0")
+
+
+def board_line(**fields):
+    """
+    TESTLINE_BOARD with the given fields changed, e.g. f33=3
+    """
+    parts = TESTLINE_BOARD.split(":")
+    for name, value in fields.items():
+        parts[int(name[1:])] = str(value)
+    return ":".join(parts)
+
 class MyTestCase(unittest.TestCase):
     def setUp(self):
         self.parser = FIBSTranslator()
@@ -54,6 +70,98 @@ class MyTestCase(unittest.TestCase):
         self.assertEqual(third["name"], "michael_romeo")
         self.assertEqual(third["opponent"], "russell_allen")
 
+    def test_feed_partial_lines(self):
+        self.assertEqual(self.parser.feed("12 joe Hel"), [])
+        events = self.parser.feed("lo\r\n" + TESTLINE_BOARD[:40])
+        self.assertEqual([e.msg for e in events], ["joe Hello"])
+
+        events = self.parser.feed(TESTLINE_BOARD[40:] + "\r\n" + TESTLINE_STATUS_1 + "\r\n")
+        self.assertEqual(len(events), 1)
+        self.assertTrue(isinstance(events[0], MatchEvent))
+        self.assertEqual(events[0].match.length, 3)
+
+        # the status block ends in the next chunk, without a line end
+        self.assertEqual(self.parser.feed("6"), [])
+        events = self.parser.flush()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].status_dicts[0]["name"], "someplayer")
+
+    def test_text_lines(self):
+        lines = ["> opponent rolls 3 and 5",
+                 TESTLINE_MOVE_1,
+                 "joe wants to play a 5 point match with you.",
+                 "jim wants to play an unlimited match with you.",
+                 "7 someone logged in",
+                 "opponent wins the 3 point match 1-3 .",
+                 "Something entirely different"]
+        events = self.parser.parse_events("\r\n".join(lines))
+        self.assertEqual([e.__class__ for e in events],
+                         [DiceEvent, MoveAttemptEvent, MoveAttemptEvent, MoveAttemptEvent,
+                          IncomingInvitationEvent, IncomingInvitationEvent, PlayerLoginEvent,
+                          MatchEndEvent])
+        self.assertEqual(events[0].dice, [3, 5])
+        self.assertEqual((events[1].origin, events[1].target), (11, 2))
+        self.assertEqual(events[4].length, "5")
+        self.assertEqual(events[5].player_name, "jim")
+        self.assertEqual(events[6].name, "someone")
+        self.assertEqual(events[7].score, {BLACK: "1", WHITE: "3"})
+
+    def test_update_match_in_place(self):
+        match = self.parser.update_match(TESTLINE_BOARD)
+        board = match.board
+        self.assertEqual(match.initial_dice, [])
+        self.assertEqual(match.color_to_move_next, BLACK)
+
+        # the dice of a roll are known before the next board line
+        events = self.parser.parse_events("You roll 3 and 1")
+        self.assertEqual(events[0].dice, [3, 1])
+        self.assertEqual(match.remaining_dice, [3, 1])
+        possibilities = board.possible_full_moves_with_initial_dice
+        self.assertTrue(possibilities)
+
+        # ... so the board line confirming them changes nothing
+        self.assertTrue(self.parser.update_match(board_line(f35=3, f36=1)) is match)
+        self.assertTrue(board.possible_full_moves_with_initial_dice is possibilities)
+
+        # a new position on the same board, and a new score
+        self.parser.update_match(board_line(f4=2, f7=-1, f8=-1, f32=-1))
+        self.assertTrue(match.board is board)
+        self.assertEqual(match.score[BLACK], 2)
+        self.assertEqual(match.color_to_move_next, WHITE)
+        self.assertEqual(match.initial_dice, [])
+        self.assertEqual(board.position[0], -1)
+
+        # other players make another match
+        other = self.parser.update_match(board_line(f2="stranger"))
+        self.assertFalse(other is match)
+
+    def test_update_match_resets_local_moves(self):
+        match = self.parser.update_match(board_line(f35=3, f36=1))
+        position = list(match.board.position)
+        move = match.board.possible_full_moves_with_initial_dice[0][0]
+        match.execute_move(move.origin, move.target)
+        self.assertNotEqual(list(match.board.position), position)
+
+        # the server sends the unchanged board again, e.g. after refusing the move
+        self.assertTrue(self.parser.update_match(board_line(f35=3, f36=1)) is match)
+        self.assertEqual(list(match.board.position), position)
+        self.assertEqual(match.board.move_stack, [])
+        self.assertEqual(match.remaining_dice, [3, 1])
+        self.assertTrue(match.board.possible_full_moves_with_initial_dice)
+
+    def test_update_match_after_registry_cleared(self):
+        connection = object()
+        parser = FIBSTranslator(PlayerRegistry(connection=connection))
+        match = parser.update_match(TESTLINE_BOARD)
+        self.assertTrue(parser.update_match(TESTLINE_BOARD) is match)
+
+        # the proxies of the match were exited, e.g. on a lost connection
+        parser.players.clear()
+        other = parser.update_match(TESTLINE_BOARD)
+        self.assertFalse(other is match)
+        self.assertTrue(other.players[WHITE] is parser.players.players["opponent"])
+        self.assertTrue(other.players[WHITE].connection is connection)
+
     def test_translation(self):
         self.assertEquals(translate_move_to_indexes('20-14'), (19, 13))
         self.assertEquals(translate_move_to_indexes('21-off'), (20, 24))
@@ -0,0 +1,60 @@
+import unittest
+from meowbg.network.playerindex import PlayerIndex
+from meowbg.network.translation import FIBSTranslator
+from meowbg.core.events import PlayerLoginEvent, PlayerLogoutEvent
+
+
+def status(name, rating, experience, ready="0"):
+    return {"name": name, "opponent": "-", "watching": "-", "ready": ready, "away": "0",
+            "rating": rating, "experience": experience, "idle": "0", "login": "1041272421",
+            "hostname": "localhost", "client": "-", "email": "-"}
+
+
+class PlayerIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.index = PlayerIndex()
+        self.index.update([status("anna", "1650.20", "400", ready="1"),
+                           status("bert", "1480.00", "12"),
+                           status("carl", "1720.75", "3000", ready="1"),
+                           {}])
+
+    def names(self, **kwargs):
+        return [p["name"] for p in self.index.query(**kwargs)]
+
+    def test_sorting(self):
+        self.assertEqual(self.names(), ["carl", "anna", "bert"])
+        self.assertEqual(self.names(sort_by="experience", descending=False),
+                         ["bert", "anna", "carl"])
+        self.assertEqual(self.names(sort_by="name", descending=False),
+                         ["anna", "bert", "carl"])
+
+    def test_filters(self):
+        self.assertEqual(self.names(ready_only=True), ["carl", "anna"])
+        self.assertEqual(self.names(min_rating=1500, min_experience=1000), ["carl"])
+
+    def test_incremental_updates(self):
+        self.index.update([status("bert", "1800.00", "13")])
+        self.index.login("dora")
+        self.index.logout("anna")
+        self.assertEqual(len(self.index), 3)
+        self.assertFalse("anna" in self.index)
+
+        # no status known yet for dora
+        self.assertEqual(self.names(), ["bert", "carl", "dora"])
+
+    def test_server_updates(self):
+        parser = FIBSTranslator()
+        events = parser.parse_events("7 dora dora logs in.\r\n"
+                                     "8 anna anna drops connection.\r\n")
+        self.assertEqual([e.__class__ for e in events], [PlayerLoginEvent, PlayerLogoutEvent])
+        self.assertEqual([e.name for e in events], ["dora", "anna"])
+
+        for e in events:
+            if isinstance(e, PlayerLoginEvent):
+                self.index.login(e.name)
+            elif isinstance(e, PlayerLogoutEvent):
+                self.index.logout(e.name)
+        self.assertEqual(sorted(self.index.players), ["bert", "carl", "dora"])
+
+if __name__ == '__main__':
+    unittest.main()
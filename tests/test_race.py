@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+from meowbg.core.board import Board, BLACK, WHITE
+from meowbg.core.race import (RaceDatabase, generate, effective_pip_count,
+                              race_win_probability, best_race_move, get_database,
+                              reload_database)
+
+
+class RaceTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        path = os.path.join(cls.directory, "race.db")
+        generate(path, max_checkers=3)
+        cls.database = RaceDatabase(path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.database.close()
+        shutil.rmtree(cls.directory)
+
+    def test_get_database(self):
+        path = os.path.join(self.directory, "later.db")
+        self.assertEqual(get_database(path), None)
+
+        # the missing database is not looked for again until reloaded
+        shutil.copy(os.path.join(self.directory, "race.db"), path)
+        self.assertEqual(get_database(path), None)
+        reload_database(path)
+        database = get_database(path)
+        self.assertTrue(isinstance(database, RaceDatabase))
+        self.assertTrue(get_database(path) is database)
+        database.close()
+        reload_database(path)
+
+    def test_database(self):
+        self.assertEqual(self.database.win_probability((1, 0, 0, 0, 0, 0),
+                                                       (0, 0, 0, 0, 0, 3)), 1)
+        self.assertAlmostEqual(self.database.win_probability((0, 0, 0, 0, 0, 1),
+                                                              (1, 0, 0, 0, 0, 0)),
+                               27 / 36.0, 4)
+        # The side on roll wins all races of equal positions with at most
+        # two checkers on the low points
+        self.assertEqual(self.database.win_probability((2, 0, 0, 0, 0, 0),
+                                                       (2, 0, 0, 0, 0, 0)), 1)
+        self.assertTrue(0.5 < self.database.win_probability((0, 0, 0, 1, 1, 1),
+                                                            (0, 0, 0, 1, 1, 1)) < 1)
+        self.assertRaises(KeyError, self.database.win_probability,
+                          (4, 0, 0, 0, 0, 0), (1, 0, 0, 0, 0, 0))
+
+    def test_race_win_probability(self):
+        self.assertTrue(0.5 < race_win_probability(80, 80) < 0.7)
+        self.assertTrue(race_win_probability(80, 90) > race_win_probability(80, 80))
+        self.assertTrue(race_win_probability(90, 80) < 0.5)
+
+    def test_effective_pip_count(self):
+        board = Board()
+        board.set_board({0: [BLACK] * 3, 10: [BLACK], 23: [WHITE]})
+        # 14 pips and 7 average wastage, whatever the home board is
+        # like while a checker is still outside
+        self.assertEqual(effective_pip_count(board, BLACK), 21)
+
+    def test_best_race_move(self):
+        board = Board()
+        board.setup_initial_position()
+        moves = board.find_possible_moves([6, 5], BLACK)
+        self.assertEqual(best_race_move(board, BLACK, moves), None)
+
+        board.set_board({1: [BLACK], 7: [BLACK], 20: [WHITE] * 2})
+        moves = board.find_possible_moves([6, 2], BLACK)
+        best = best_race_move(board, BLACK, moves)
+        self.assertTrue(best in moves)
+        # Bearing off a checker from the two point beats keeping both
+        # checkers or leaving one on the six point
+        for m in best:
+            board.make_partial_move(m)
+        self.assertEqual(board.pip_count(BLACK), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import random
+import unittest
+from meowbg.core.board import Board, WHITE, BLACK
+from meowbg.core.dice import Dice
+from meowbg.core.rollout import RolloutResult, rollout
+
+
+class RolloutTestCase(unittest.TestCase):
+    def setUp(self):
+        board = Board()
+        board.setup_initial_position()
+        self.position = board.position
+
+    def test_seeded_dice(self):
+        rolls = [Dice(random.Random(3)).roll() for _ in range(2)]
+        self.assertEqual(rolls[0], rolls[1])
+
+    def test_result_merge(self):
+        result = RolloutResult(WHITE)
+        result.add_game(WHITE, 2)
+        other = RolloutResult(WHITE)
+        other.add_game(BLACK, 1)
+        other.add_game(WHITE, 3)
+        result.merge(other)
+
+        self.assertEqual(result.games, 3)
+        self.assertEqual(result.wins, {WHITE: 2, BLACK: 1})
+        self.assertEqual(result.gammons, {WHITE: 2, BLACK: 0})
+        self.assertEqual(result.backgammons, {WHITE: 1, BLACK: 0})
+        self.assertAlmostEqual(result.equity(), 4 / 3.0)
+        # sample variance of 2, -1 and 3 is 13 / 3
+        self.assertAlmostEqual(result.equity_variance(), 13 / 9.0)
+
+    def test_reproducible(self):
+        single = rollout(self.position, WHITE, 30, seed=5, processes=1, chunk_size=7)
+        pooled = rollout(self.position, WHITE, 30, seed=5, processes=2, chunk_size=7)
+        self.assertEqual(single.games, 30)
+        self.assertEqual(single.wins, pooled.wins)
+        self.assertEqual(single.points, pooled.points)
+        self.assertEqual(single.squared_points, pooled.squared_points)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from meowbg.core.board import Board, BLACK, WHITE
+from meowbg.core.move import PartialMove
+from meowbg.core.search import ExpectiminimaxSearch, HeuristicEvaluator, ROLLS
+
+
+class SearchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.board = Board()
+        self.search = ExpectiminimaxSearch(HeuristicEvaluator(), candidates=3)
+
+    def test_rolls(self):
+        self.assertEqual(len(ROLLS), 21)
+        self.assertEqual(sum(weight for _, weight in ROLLS), 36)
+
+    def test_choose_move(self):
+        self.board.setup_initial_position()
+        moves = self.board.find_possible_moves([6, 5], BLACK)
+        best = self.search.choose_move(self.board, BLACK, moves, time_budget=60, max_depth=1)
+        self.assertTrue(best in moves)
+        self.assertEqual(self.board.move_stack, [])
+        self.assertEqual(list(self.board.position),
+                         list(Board.from_position(self.board.position[:26]).position))
+
+        # The second search finds all values in the transposition table
+        hits = self.search.table.hits
+        self.assertEqual(self.search.choose_move(self.board, BLACK, moves, 60, 1), best)
+        self.assertTrue(self.search.table.hits > hits)
+
+        # Without time, the static evaluation decides
+        values = self.search.evaluator.evaluate_moves(self.board, BLACK, moves)
+        best = self.search.choose_move(self.board, BLACK, moves, time_budget=-1)
+        self.assertEqual(values[moves.index(best)], max(values))
+
+    def test_value(self):
+        # White bears off its last checker with any roll
+        self.board.set_board({23: [WHITE], 12: [BLACK, BLACK]})
+        self.assertEqual(self.search.value(self.board, BLACK, 1), -1)
+
+        # ... and black wins right away by bearing off
+        self.board.set_board({0: [BLACK], 12: [WHITE, WHITE]})
+        moves = self.board.find_possible_moves([2, 1], BLACK)
+        best = self.search.choose_move(self.board, BLACK, moves, 60, 2)
+        self.assertEqual(best[-1].target, -1)
+        self.assertEqual(self.search.value_after(self.board, BLACK, best, 2), 1)
+
+    def test_dancing(self):
+        # White cannot enter against a closed board, so the value of a
+        # ply is the value of the unchanged position from black's side
+        self.board.set_board(dict((i, [BLACK, BLACK]) for i in range(6)), [WHITE])
+        self.assertEqual(self.board.find_possible_moves([3, 1], WHITE), [])
+        self.assertAlmostEqual(self.search.value(self.board, BLACK, 1),
+                               -self.search.value(self.board, WHITE, 0))
+
+if __name__ == '__main__':
+    unittest.main()
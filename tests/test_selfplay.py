@@ -0,0 +1,63 @@
+import random
+import unittest
+from meowbg.core.board import WHITE, BLACK
+from meowbg.core.match import Match
+from meowbg.core.selfplay import SelfPlayEngine, RandomPolicy
+
+
+class DoublingPolicy(RandomPolicy):
+    def __init__(self, take=True):
+        RandomPolicy.__init__(self, random.Random(7))
+        self.take = take
+
+    def offer_double(self, board, color, match):
+        return True
+
+    def accept_double(self, board, color, match):
+        return self.take
+
+
+class SelfPlayTestCase(unittest.TestCase):
+    def setUp(self):
+        random.seed(42)
+
+    def test_play_game(self):
+        engine = SelfPlayEngine({WHITE: RandomPolicy(random.Random(1)),
+                                 BLACK: RandomPolicy(random.Random(2))})
+        for _ in range(5):
+            winner, points = engine.play_game()
+            self.assertTrue(winner in (WHITE, BLACK))
+            self.assertTrue(points in (1, 2, 3))
+            engine.board.check_board_state()
+            self.assertEqual(engine.board.get_winner()[0], winner)
+            self.assertEqual(engine.board.move_stack, [])
+
+    def test_play_match(self):
+        engine = SelfPlayEngine({WHITE: DoublingPolicy(), BLACK: DoublingPolicy()})
+        match = engine.play_match(5)
+        self.assertTrue(match.finished)
+        self.assertTrue(max(match.score.values()) >= 5)
+
+    def test_dropped_double(self):
+        engine = SelfPlayEngine({WHITE: DoublingPolicy(take=False),
+                                 BLACK: DoublingPolicy(take=False)})
+        match = Match()
+        match.length = 7
+        winner, points = engine.play_game(match)
+        self.assertEqual(points, 1)
+        self.assertEqual(match.score[winner], 1)
+
+    def test_no_double_in_crawford_game(self):
+        engine = SelfPlayEngine({WHITE: DoublingPolicy(), BLACK: DoublingPolicy()})
+        match = Match()
+        match.length = 3
+        match.score = {WHITE: 2, BLACK: 0}
+        self.assertTrue(match.is_crawford())
+        winner, points = engine.play_game(match)
+        self.assertEqual(match.cube, 1)
+        self.assertTrue(points in (1, 2, 3))
+        self.assertTrue(match.crawford_played)
+        self.assertFalse(match.is_crawford())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import sys
+import unittest
+from meowbg.core.board import BLACK, WHITE
+from meowbg.core.events import MessageEvent, MatchEvent
+from meowbg.gui.guievents import MoveAttemptEvent
+
+if sys.version_info >= (3,):
+    # the sessions are built on asyncio
+    import asyncio
+    from asyncfixtures import DroppingServer, ScriptedServer, FlakyServer, run_session
+    from meowbg.network.sessions import TokenBucket, Backoff, Session, ConnectionManager
+
+ASYNCIO_MISSING = "asyncio is not available before Python 3"
+
+# 'You' against 'joe', with the initial position and no dice
+BOARD_LINE = ":".join(["board", "You", "joe", "3", "0", "0",
+                       "0", "-2", "0", "0", "0", "0", "5", "0", "3", "0", "0", "0", "-5",
+                       "5", "0", "0", "0", "-3", "0", "-5", "0", "0", "0", "0", "2", "0",
+                       "1", "0", "0", "0", "0", "1", "1", "1", "0", "1", "-1", "0", "25",
+                       "0", "0", "0", "0", "0", "0", "0", "0"])
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@unittest.skipIf(sys.version_info < (3,), ASYNCIO_MISSING)
+class TokenBucketTestCase(unittest.TestCase):
+    def test_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+        self.assertEqual([bucket.delay() for _ in range(3)], [0, 0, 0])
+        self.assertEqual(bucket.delay(), 0.5)
+        self.assertEqual(bucket.delay(), 1.0)
+
+        # refilled, but never beyond the capacity
+        clock.now = 100
+        self.assertEqual([bucket.delay() for _ in range(3)], [0, 0, 0])
+        self.assertEqual(bucket.delay(), 0.5)
+
+
+@unittest.skipIf(sys.version_info < (3,), ASYNCIO_MISSING)
+class BackoffTestCase(unittest.TestCase):
+    def test_delays(self):
+        backoff = Backoff(initial=1, maximum=8)
+        delays = [backoff.next_delay() for _ in range(6)]
+        for delay, limit in zip(delays, [1, 2, 4, 8, 8, 8]):
+            self.assertTrue(limit / 2.0 <= delay <= limit)
+        backoff.reset()
+        self.assertTrue(backoff.next_delay() <= 1)
+
+
+@unittest.skipIf(sys.version_info < (3,), ASYNCIO_MISSING)
+class SessionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_separate_sessions(self):
+        manager = ConnectionManager()
+        first = manager.add(Session("first", "anna", "secret"))
+        second = manager.add(Session("second", "bert", "secret"))
+        self.assertRaises(ValueError, manager.add, Session("first", "carl", "secret"))
+
+        first_match = first.translator.parse_match(BOARD_LINE)
+        second_match = second.translator.parse_match(BOARD_LINE)
+        first_joe, second_joe = first_match.players[WHITE], second_match.players[WHITE]
+        self.assertEqual(first_joe.name, second_joe.name)
+        self.assertFalse(first_joe is second_joe)
+        self.assertTrue(first_joe.connection is first)
+        self.assertTrue(first_match.dispatcher is first.dispatcher)
+        self.assertEqual(first_match.players[BLACK].name, "You")
+
+    def test_reconnect(self):
+        server = DroppingServer()
+        messages = []
+
+        def make_session(address):
+            session = Session("bot", "anna", "secret", address=address,
+                              backoff=Backoff(initial=0.01, maximum=0.05))
+            session.dispatcher.register(messages.append, MessageEvent)
+            return session
+
+        session = self.loop.run_until_complete(
+            run_session(server, make_session, lambda session: session.connections >= 3))
+        self.assertTrue(session.connections >= 3)
+        self.assertTrue(server.logins[0].startswith("login meowBG 1008 anna secret"))
+        self.assertTrue(len(messages) >= 2)
+        self.assertEqual(messages[0].msg, "joe Welcome")
+
+    def test_commit_after_reconnect(self):
+        server = FlakyServer([BOARD_LINE])
+        matches = []
+
+        def make_session(address):
+            session = Session("bot", "anna", "secret", address=address,
+                              backoff=Backoff(initial=0.01, maximum=0.05))
+            session.dispatcher.register(lambda e: matches.append(e.match), MatchEvent)
+            return session
+
+        def committed(session):
+            if session.connections >= 2 and len(matches) == 2:
+                # the board line of the new connection has arrived
+                matches[-1].commit()
+                matches.append(None)
+            return any(cmd.startswith("move") for cmd in server.received)
+
+        self.loop.run_until_complete(run_session(server, make_session, committed))
+        self.assertEqual(server.logins, 2)
+        self.assertFalse(matches[0] is matches[1])
+        self.assertTrue(any(cmd.startswith("move") for cmd in server.received))
+
+    def test_opponent_moves(self):
+        server = ScriptedServer([BOARD_LINE, "joe moves 13-10 13-8"])
+        moves = []
+
+        def make_session(address):
+            session = Session("bot", "anna", "secret", address=address)
+            session.dispatcher.register(moves.append, MoveAttemptEvent)
+            return session
+
+        self.loop.run_until_complete(
+            run_session(server, make_session, lambda session: len(moves) >= 2))
+        self.assertEqual([(m.origin, m.target) for m in moves], [(12, 9), (12, 7)])
+
+if __name__ == '__main__':
+    unittest.main()